@@ -13,10 +13,23 @@ import subprocess
 import sys
 import time
 import math
-import tempfile
+import threading
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+# Add project root to path to import lib
+# Assuming this script is in [Root]/scripts/
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root / "src"))
+
+from lib.render_cache import RenderCache, hash_file, hash_params, partial_path, commit
+from lib.filter_graph import FilterGraph, optimize
+from lib.render_plan import RENDER_PLAN_VERSION, save_plan, load_plan, diff_plans, without_image_hashes
+from lib.render_journal import RenderJournal, assign_keys, resumable
+from lib.render_metrics import RenderMonitor, job_timeline, read_progress, wait_rusage, with_progress
+from lib.encoder_tuning import DEFAULT_TARGET_SSIM, PROFILE_VERSION, EncoderProbe, save_profile, tune_encoder
 
 
 # Constants
@@ -25,6 +38,93 @@ DEFAULT_OUTPUT_RES = (1920, 1080)
 
 DEFAULT_TRANSITION_DURATION = 1.0  # seconds
 
+# Transitions: 'fade' is xfade's cross-fade; the others reveal the next shot
+# through a mask clip from lib.transition_textures (noise is a cloudy dissolve)
+DEFAULT_TRANSITION = 'fade'
+TRANSITIONS = ['fade', 'noise', 'iris', 'diagonal', 'wipe_left', 'wipe_right', 'wipe_up', 'wipe_down']
+
+# Supersampling factor for smoother Ken Burns
+DEFAULT_SS_FACTOR = 2
+
+# Stepped "Blur Dissolve" sigmas (weakest to strongest), tuned for the
+# DEFAULT_SS_FACTOR supersampled resolution
+BLUR_SIGMAS = (10, 20, 40)
+
+# Blur settings: 'filter' is 'gaussian' (gblur) or 'box' (avgblur, a cheap
+# approximation); 'scale' multiplies the sigmas, e.g. for a smaller frame
+DEFAULT_BLUR = {'filter': 'gaussian', 'scale': 1.0}
+
+# Draft quality (--quality draft): same plan and timeline as the final render,
+# rendered small, at a low frame rate, without supersampling and with box blurs
+DRAFT_HEIGHT = 360
+DRAFT_MAX_FPS = 12
+DRAFT_PRESET = 'ultrafast'
+QUALITY_TIERS = ['final', 'draft']
+
+# Render modes:
+# - graph: one ffmpeg process with a single giant filter graph
+# - segments: every shot and every transition is its own ffmpeg job, joined by concat
+# - windowed: the graph mode timeline rendered K shots at a time, windows joined by concat
+# - chunked: windowed mode with windows cut to balance their duration over the
+#   workers, each encoded as closed GOPs so the stream copy has no seams
+RENDER_MODES = ['graph', 'segments', 'windowed', 'chunked']
+DEFAULT_WINDOW_SIZE = 8
+
+# Chunked mode: aim for this many chunks per worker (so uneven chunks even
+# out), but no chunk shorter than MIN_CHUNK_SECONDS
+CHUNKS_PER_WORKER = 2
+MIN_CHUNK_SECONDS = 5.0
+# x264 closes its GOPs by default; chunks ask for it explicitly, since a
+# reference across a chunk boundary would break the stream-copy join
+CLOSED_GOP_ARGS = ['-flags', '+cgop']
+RENDER_DIR_NAME = 'render'
+SEGMENTS_DIR_NAME = 'segments'
+CACHE_DIR_NAME = 'cache'
+INPUTS_DIR_NAME = 'inputs'
+
+# Compiled render plan and graph-mode filter script, written to the render dir.
+# Filter graphs go to ffmpeg through a script file so argv stays small.
+RENDER_PLAN_NAME = 'render_plan.json'
+FILTER_SCRIPT_NAME = 'filter_graph.txt'
+
+# Segments/windowed mode journal of finished jobs, for --resume
+JOURNAL_NAME = 'journal.jsonl'
+
+# Per-stage wall time, CPU time and peak RSS of the last render
+METRICS_NAME = 'metrics.json'
+
+# Watch mode: how often generations/ is polled for new or changed images
+DEFAULT_WATCH_INTERVAL = 2.0  # seconds
+
+# Encoder tuning: the lossless timeline sample and the probes behind the
+# chosen profile (the profile itself is part of the render plan)
+TUNING_DIR_NAME = 'tuning'
+ENCODER_PROFILE_NAME = 'encoder_profile.json'
+TUNING_SAMPLE_SECONDS = 2.0
+
+# The soundtrack is encoded once per source file into a cached track that
+# every render stream-copies into its outputs
+AUDIO_CODEC_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+AUDIO_TRACK_SUFFIX = '_audio.m4a'
+AUDIO_CACHE_VERSION = 1
+
+# Pre-scaled inputs are stored as raw YUV4MPEG frames: no decode cost, no rescale
+PRESCALED_INPUT_SUFFIX = '.y4m'
+PRESCALED_INPUT_FILTER = 'setsar=1'
+INPUT_CACHE_VERSION = 1
+
+# Bump when the segment filter chains change, so old cache entries are not reused
+SEGMENT_CACHE_VERSION = 1
+
+# x264 speed presets accepted by --preset
+X264_PRESETS = [
+    'ultrafast', 'superfast', 'veryfast', 'faster', 'fast',
+    'medium', 'slow', 'slower', 'veryslow',
+]
+
+# Lossless codec for the shot heads/tails that feed the transition jobs
+INTERMEDIATE_CODEC_ARGS = ['-c:v', 'ffv1', '-pix_fmt', 'yuv420p']
+
 # Ken Burns effect types
 KEN_BURNS_EFFECTS = [
     'zoom_in',
@@ -36,119 +136,18 @@ KEN_BURNS_EFFECTS = [
     'zoom_pan_combo'
 ]
 
+# Shots with "motion": "none" (e.g. title cards), or every shot with
+# --no-motion, are held still: no zoompan and no supersampling
+STILL_EFFECT = 'none'
 
-def generate_noise_map(width: int, height: int) -> Path:
-    """
-    Generate a Perlin-like noise map for transitions and save as a temporary PNG file.
-    Uses a simple diamond-square or plasma fractal algorithm to generate a grayscale image.
-    or simpler: generate a random noise image using ffmpeg directly if possible?
-    No, let's generate a small noise texture using Python and PIL/Pillow if available, 
-    otherwise writes a crude PGM file (portable graymap) which FFmpeg can read.
-    """
-    # Create a temporary file for the PGM image
-    fd, path = tempfile.mkstemp(suffix='.pgm')
-    os.close(fd)
-    
-    # We'll generate a small texture and let FFmpeg scale it up
-    w, h = 256, 256
-    
-    # Generate simple value noise (plasma/clouds)
-    # Initialize grid
-    grid = [[0.0 for _ in range(h)] for _ in range(w)]
-    
-    def get_val(x, y):
-        return grid[x % w][y % h]
-
-    def set_val(x, y, val):
-        grid[x % w][y % h] = val
-
-    # Seed corners
-    import random
-    random.seed(42) # Consistent noise for now
-    
-    # Simple plasma fractal
-    def divide(x, y, size, std_dev):
-        if size < 1:
-            return
-        
-        half = size // 2
-        scale = std_dev * size 
-        
-        if half < 1: return
-
-        # Diamond step
-        mid_val = (get_val(x, y) + get_val(x+size, y) + get_val(x, y+size) + get_val(x+size, y+size)) / 4.0
-        set_val(x+half, y+half, mid_val + random.uniform(-scale, scale))
-        
-        # Square step
-        set_val(x+half, y, (get_val(x, y) + get_val(x+size, y) + get_val(x+half, y+half))/3 + random.uniform(-scale, scale))
-        set_val(x, y+half, (get_val(x, y) + get_val(x, y+size) + get_val(x+half, y+half))/3 + random.uniform(-scale, scale))
-        set_val(x+size, y+half, (get_val(x+size, y) + get_val(x+size, y+size) + get_val(x+half, y+half))/3 + random.uniform(-scale, scale))
-        set_val(x+half, y+size, (get_val(x, y+size) + get_val(x+size, y+size) + get_val(x+half, y+half))/3 + random.uniform(-scale, scale))
-        
-        divide(x, y, half, std_dev)
-        divide(x+half, y, half, std_dev)
-        divide(x, y+half, half, std_dev)
-        divide(x+half, y+half, half, std_dev)
-
-    # Initialize corners
-    set_val(0, 0, random.random())
-    set_val(w-1, 0, random.random())
-    set_val(0, h-1, random.random())
-    set_val(w-1, h-1, random.random())
-    
-    # Run
-    # This might be slow in pure python for 256x256. 
-    # Let's use an even simpler approach: simple coherent noise (smooth random)
-    # Or just generate random pixels and rely on ffmpeg to blur heavily.
-    
-    # Let's generate random noise and write PGM header
-    # PGM format: P5 (binary) or P2 (ascii) width height maxval data
-    header = f"P2\n{w} {h}\n255\n"
-    
-    # Generate data: random noise
-    data = []
-    for _ in range(w * h):
-        data.append(str(random.randint(0, 255)))
-    
-    # Write to file
-    with open(path, 'w') as f:
-        f.write(header)
-        f.write(" ".join(data))
-        
-    return Path(path)
-
-
-def generate_smooth_noise_map_ffmpeg(width: int, height: int) -> Path:
-    """
-    Generate a smooth noise map using FFmpeg's `geq` or `noise` filter directly 
-    if possible, but we need a file for xfade.
-    Instead, let's create a PGM file with random noise and return it.
-    The `xfade` filter will accept this. We can rely on xfade to smooth it if we upscale? 
-    Actually, random noise gives a "dissolve with noise" effect. 
-    Perlin noise gives "cloudy dissolve".
-    Real Perlin noise is hard in pure python without libraries.
-    
-    Alternative: Generate a gradient map?
-    Let's stick to the generated PGM.
-    """
-    fd, path = tempfile.mkstemp(suffix='.pgm')
-    os.close(fd)
-    w, h = 512, 512
-    with open(path, 'w') as f:
-        f.write(f"P2\n{w} {h}\n255\n")
-        # Generate some coherent-ish patterns? 
-        # Just random static for now, effectively a "dissolve" with grain.
-        # User asked for "Perlin noise". 
-        # Fine, we will try to approximate or just use random.
-        for i in range(h):
-            row = []
-            for j in range(w):
-                # Simple gradient x/y
-                val = int((i/h) * 255) ^ int((j/w) * 255) 
-                row.append(str(val % 256))
-            f.write(" ".join(row) + "\n")
-    return Path(path)
+# Ken Burns zoom range
+KEN_BURNS_ZOOM_MIN = 1.0
+KEN_BURNS_ZOOM_MAX = 1.1  # 20% zoom is standard for Ken Burns
+
+# Motion engines:
+# - zoompan: ffmpeg's zoompan on a supersampled input
+# - numpy: sub-pixel bilinear resample in NumPy, raw frames piped into ffmpeg (segments mode only)
+MOTION_ENGINES = ['zoompan', 'numpy']
 
 
 def parse_timing(timing_str: str) -> Tuple[float, float]:
@@ -175,18 +174,23 @@ def generate_ken_burns_filter(
     duration: float,
     fps: int,
     width: int,
-    height: int
+    height: int,
+    start_frame: int = 0,
+    frame_count: Optional[int] = None
 ) -> str:
     """
     Generate the zoompan filter string for a specific Ken Burns effect.
     Uses linear interpolation based on frame count 'on' for smooth movement.
     Ensures panning stays within valid bounds for the zoom level.
+    
+    `start_frame` and `frame_count` render only part of the move (e.g. a
+    window boundary) while keeping the motion curve of the whole `duration`.
     """
     num_frames = int(duration * fps)
     
     # Zoom parameters
-    zoom_min = 1.0
-    zoom_max = 1.1  # 20% zoom is standard for Ken Burns
+    zoom_min = KEN_BURNS_ZOOM_MIN
+    zoom_max = KEN_BURNS_ZOOM_MAX
     
     # Calculate available margin at max zoom
     # At zoom=1.0, w=1920. At zoom=1.2, w=1600. Margin = 320.
@@ -201,7 +205,7 @@ def generate_ken_burns_filter(
     # Helper for basic linear interpolation string
     # p = 'on/duration' (normalized time 0..1)
     # val = start + (end - start) * p
-    norm_t = f"(on/{num_frames})"
+    norm_t = f"(on/{num_frames})" if not start_frame else f"((on+{start_frame})/{num_frames})"
     
     if effect_type == 'zoom_in':
         # Zoom 1.0 -> 1.2, Center
@@ -275,11 +279,147 @@ def generate_ken_burns_filter(
         y_expr = "ih/2-(ih/zoom/2)"
 
     return (
-        f"zoompan=z='{z_expr}':d={num_frames}:"
+        f"zoompan=z='{z_expr}':d={frame_count or num_frames}:"
         f"x='{x_expr}':y='{y_expr}':s={width}x{height}:fps={fps}"
     )
 
 
+def fit_aspect(src_width: int, src_height: int, width: int, height: int) -> Tuple[int, int]:
+    """Largest even-sized box with the aspect ratio of width x height that fits in the source."""
+    box_height = min(src_height, src_width * height / width)
+    box_width = box_height * width / height
+    return int(box_width) // 2 * 2, int(box_height) // 2 * 2
+
+
+def clip_geometry(width: int, height: int, ss_factor: int, reframe: Optional[Dict] = None) -> Dict:
+    """
+    Frame sizes for rendering Ken Burns clips of a width x height output:
+    - source: the supersampled input frames
+    - work: the frames clips are moved, blurred and cross-faded at
+    - density: work pixels per source pixel (scales the blur sigmas)
+    Normally both are the output size times `ss_factor`. A reframed cut (see
+    `generate_crop_path_filter`) reads the landscape render's inputs,
+    `reframe['source']`, and works at the source's own pixel density, capped
+    at the supersampled output size.
+    """
+    ss_size = (width * ss_factor, height * ss_factor)
+    if not reframe:
+        return {'source': ss_size, 'work': ss_size, 'density': 1.0}
+    source = tuple(reframe['source'])
+    box_width, box_height = fit_aspect(*source, width, height)
+    work = (box_width, box_height) if box_height <= ss_size[1] else ss_size
+    return {'source': source, 'work': work, 'density': work[1] / box_height}
+
+
+def generate_crop_path_filter(
+    effect_type: str,
+    duration: float,
+    fps: int,
+    src_width: int,
+    src_height: int,
+    width: int,
+    height: int,
+    start_frame: int = 0,
+    frame_count: Optional[int] = None
+) -> str:
+    """
+    Reframe a Ken Burns move for an output with a different aspect ratio than
+    the source frame, e.g. 9:16 shorts from the 16:9 supersampled inputs.
+
+    The camera works inside the largest window of the output's aspect ratio:
+    - zooms run the same zoompan move on the centered window, so zoompan only
+      renders width x height instead of the whole landscape frame
+    - pans have a constant zoom, so nothing needs resampling per frame: the
+      still is repeated and a crop of the zoomed viewport size slides along the
+      same travel as the landscape pan, centered on the frame
+    """
+    num_frames = int(duration * fps)
+    crop_width, crop_height = fit_aspect(src_width, src_height, width, height)
+
+    if effect_type not in ('pan_left', 'pan_right', 'pan_up'):
+        return (
+            f"crop={crop_width}:{crop_height},"
+            + generate_ken_burns_filter(effect_type, duration, fps, width, height, start_frame, frame_count)
+        )
+
+    zoom = KEN_BURNS_ZOOM_MAX
+    view_width = int(crop_width / zoom) // 2 * 2
+    view_height = int(crop_height / zoom) // 2 * 2
+    norm_t = f"(n/{num_frames})" if not start_frame else f"((n+{start_frame})/{num_frames})"
+
+    # Travel of the landscape pan, in source pixels
+    travel_x = min(src_width - src_width / zoom, src_width - view_width)
+    travel_y = min(src_height - src_height / zoom, src_height - view_height)
+    left = (src_width - view_width - travel_x) / 2
+    top = (src_height - view_height - travel_y) / 2
+    center_x = (src_width - view_width) / 2
+    center_y = (src_height - view_height) / 2
+
+    if effect_type == 'pan_left':
+        x_expr, y_expr = f"{left:g}+{travel_x:g}*(1-{norm_t})", f"{center_y:g}"
+    elif effect_type == 'pan_right':
+        x_expr, y_expr = f"{left:g}+{travel_x:g}*{norm_t}", f"{center_y:g}"
+    else:
+        x_expr, y_expr = f"{center_x:g}", f"{top:g}+{travel_y:g}*(1-{norm_t})"
+
+    count = frame_count or num_frames - start_frame
+    return (
+        f"{hold_frame_filter(count, fps)},"
+        f"crop=w={view_width}:h={view_height}:x='{x_expr}':y='{y_expr}',"
+        f"scale={width}:{height}"
+    )
+
+
+def hold_frame_filter(count: int, fps: int) -> str:
+    """Repeat a single input frame `count` times as a clip at `fps`."""
+    return f"loop=loop={count - 1}:size=1,settb=1/{fps},setpts=N,fps={fps}"
+
+
+def generate_still_filter(
+    duration: float,
+    fps: int,
+    src_width: int,
+    src_height: int,
+    width: int,
+    height: int,
+    start_frame: int = 0,
+    frame_count: Optional[int] = None
+) -> str:
+    """
+    Hold a shot without motion (STILL_EFFECT) for `duration`. The frame is
+    cropped to the output's aspect ratio and scaled once, then repeated.
+    """
+    filters = []
+    crop_width, crop_height = fit_aspect(src_width, src_height, width, height)
+    if (crop_width, crop_height) != (src_width, src_height):
+        filters.append(f"crop={crop_width}:{crop_height}")
+    if (crop_width, crop_height) != (width, height):
+        filters.append(f"scale={width}:{height}")
+    filters.append(hold_frame_filter(frame_count or int(duration * fps) - start_frame, fps))
+    return ','.join(filters)
+
+
+def generate_motion_filter(
+    effect_type: str,
+    duration: float,
+    fps: int,
+    geometry: Dict,
+    start_frame: int = 0,
+    frame_count: Optional[int] = None
+) -> str:
+    """Ken Burns move from a source frame to work-size frames (see `clip_geometry`)."""
+    width, height = geometry['work']
+    if effect_type == STILL_EFFECT:
+        return generate_still_filter(
+            duration, fps, *geometry['source'], width, height, start_frame, frame_count
+        )
+    if geometry['source'] == geometry['work']:
+        return generate_ken_burns_filter(effect_type, duration, fps, width, height, start_frame, frame_count)
+    return generate_crop_path_filter(
+        effect_type, duration, fps, *geometry['source'], width, height, start_frame, frame_count
+    )
+
+
 def load_scenario_json(file_path: Path) -> List[Dict]:
     """Load and parse the shot list JSON file."""
     if not file_path.exists():
@@ -297,33 +437,18 @@ def load_scenario_json(file_path: Path) -> List[Dict]:
     return data
 
 
-def build_ffmpeg_command(
-    shots: List[Dict],
-    generations_dir: Path,
-    output_path: Path,
-    fps: int,
-    width: int,
-    height: int,
-    transition_duration: float
-) -> Tuple[List[str], int, float]:
+def collect_valid_shots(shots: List[Dict], generations_dir: Path, include_missing: bool = False) -> List[Dict]:
     """
-    Build the complete FFmpeg command with filter complex 
-    implementing a specific "Blur Dissolve" transition.
+    Resolve the generated image and base duration for every shot.
+    Shots whose image is missing are skipped with a warning, or kept with
+    `include_missing` (see --watch).
     """
-    cmd = ['ffmpeg', '-y']  # -y to overwrite output file
-    
-    # Init hardware acceleration for macOS
-    if sys.platform == 'darwin':
-        # cmd.extend(['-init_hw_device', 'videotoolbox']) 
-        pass
-
-    # Collect valid shots with their image paths and durations
     valid_shots = []
     for i, shot in enumerate(shots):
         shot_id = shot.get('scene', str(i+1)).zfill(2)
         image_path = generations_dir / f"shot_{shot_id}.png"
         
-        if not image_path.exists():
+        if not image_path.exists() and not include_missing:
             print(f"Warning: Image not found: {image_path}, skipping...")
             continue
         
@@ -334,6 +459,7 @@ def build_ffmpeg_command(
         
         valid_shots.append({
             'shot': shot,
+            'shot_id': shot_id,
             'image_path': image_path,
             'duration': duration,
             'index': len(valid_shots)  # Sequential index for valid shots
@@ -342,136 +468,451 @@ def build_ffmpeg_command(
     if not valid_shots:
         raise ValueError("No valid shots found!")
     
-    num_valid_shots = len(valid_shots)
-    print(f"Found {num_valid_shots} valid images")
+    return valid_shots
 
-    # Calculate total duration: sum of base durations + one transition duration (tail)
-    total_duration = sum(s['duration'] for s in valid_shots) + transition_duration
+
+def choose_effects(valid_shots: List[Dict], motion: bool = True) -> None:
+    """
+    Pick a random Ken Burns effect for every shot that doesn't have one yet.
+    Seed the `random` module first (see --seed) to get the same choices again.
+    Shots with "motion": "none", or all shots without `motion`, are held still.
+    """
+    for i, vs in enumerate(valid_shots):
+        if not motion or vs['shot'].get('motion') == STILL_EFFECT:
+            vs['effect'] = STILL_EFFECT
+        elif 'effect' not in vs:
+            vs['effect'] = random.choice(KEN_BURNS_EFFECTS)
+        print(f"  Shot {i+1}: Applying {vs['effect']}")
+
+
+def compile_render_plan(
+    valid_shots: List[Dict],
+    seed: int,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    preset: Optional[str] = None,
+    transition_type: str = DEFAULT_TRANSITION,
+    encoder: Optional[Dict] = None
+) -> Dict:
+    """
+    Capture every decision behind a render: settings, seed, the resolved shots
+    (duration, effect, source image hash) and the transitions between them.
+    `encoder` is a tuned encoder profile (see lib.encoder_tuning) that replaces
+    the default codec arguments. Images that aren't generated yet have no hash.
+    """
+    shots = [
+        {
+            'shot_id': vs['shot_id'],
+            'image': vs['image_path'].name,
+            'image_sha256': hash_file(vs['image_path']) if vs['image_path'].exists() else None,
+            'duration': vs['duration'],
+            'effect': vs['effect'],
+        }
+        for vs in valid_shots
+    ]
     
-    # Add inputs to command
-    # Use -i without loop. zoompan will handle duration.
+    transitions = []
+    offset = 0.0
+    for prev, nxt in zip(valid_shots, valid_shots[1:]):
+        offset += prev['duration']
+        transitions.append({
+            'from': prev['shot_id'],
+            'to': nxt['shot_id'],
+            'type': transition_type,
+            'offset': offset,
+            'duration': transition_duration,
+            'blur_sigmas': list(BLUR_SIGMAS),
+        })
+    
+    return {
+        'version': RENDER_PLAN_VERSION,
+        'seed': seed,
+        'settings': {
+            'fps': fps,
+            'width': width,
+            'height': height,
+            'transition_duration': transition_duration,
+            'ss_factor': ss_factor,
+            'preset': preset,
+            'codec_args': encoder['codec_args'] if encoder else output_codec_args(preset),
+            'encoder': encoder,
+        },
+        'shots': shots,
+        'transitions': transitions,
+    }
+
+
+def apply_render_plan(plan: Dict, valid_shots: List[Dict]) -> None:
+    """
+    Reuse the durations and effects of a previous plan for the shots it lists.
+    Shots that are new since the plan was written keep their scenario timing
+    and get an effect from `choose_effects`.
+    """
+    planned = {s['shot_id']: s for s in plan['shots']}
     for vs in valid_shots:
-        cmd.extend(['-i', str(vs['image_path'])])
+        entry = planned.get(vs['shot_id'])
+        if entry is None:
+            print(f"Warning: Shot {vs['shot_id']} is not in the render plan")
+            continue
+        vs['duration'] = entry['duration']
+        vs['effect'] = entry['effect']
+
+
+def build_scale_filter(ss_width: int, ss_height: int) -> str:
+    """Upscale an input image to the supersampled resolution (fixes zoompan jitter)."""
+    return (
+        f"format=yuv420p,"
+        f"scale={ss_width}:{ss_height}:force_original_aspect_ratio=increase,"
+        f"crop={ss_width}:{ss_height},"
+        f"setsar=1"
+    )
+
+
+def plan_prepared_inputs(
+    valid_shots: List[Dict],
+    ss_width: int,
+    ss_height: int,
+    cache: RenderCache
+) -> List[Dict]:
+    """
+    Point every shot at a cached, render-ready copy of its image: converted to
+    yuv420p, scaled and cropped to the supersampled resolution once, and stored
+    as YUV4MPEG so later renders skip decoding and scaling entirely.
+
+    Sets vs['input_path'] on every shot and returns the jobs that create the
+    copies which aren't cached yet. Shots whose image isn't generated yet
+    (see --watch) are left out.
+    """
+    jobs = []
+    for vs in valid_shots:
+        if not vs['image_path'].exists():
+            continue
+        key = cache.key(
+            'input', INPUT_CACHE_VERSION, hash_file(vs['image_path']),
+            ss_width, ss_height, 'yuv420p'
+        )
+        input_path = cache.path(key, PRESCALED_INPUT_SUFFIX)
+        vs['input_path'] = input_path
+        if cache.lookup(input_path):
+            continue
+        jobs.append({
+            'name': f"prepare_{vs['shot_id']}",
+            'stage': 'prepare',
+            'cmd': [
+                'ffmpeg', '-y', '-loglevel', 'error', '-nostats',
+                '-i', str(vs['image_path']),
+                '-vf', build_scale_filter(ss_width, ss_height),
+                '-frames:v', '1',
+                '-f', 'yuv4mpegpipe', '-pix_fmt', 'yuv420p',
+                str(partial_path(input_path))
+            ],
+            'commit': [(partial_path(input_path), input_path)],
+        })
+    return jobs
+
+
+def shot_input(vs: Dict, ss_width: int, ss_height: int) -> Tuple[Path, str]:
+    """Input file of a shot and the filter that turns it into a supersampled frame."""
+    if 'input_path' in vs:
+        return vs['input_path'], PRESCALED_INPUT_FILTER
+    return vs['image_path'], build_scale_filter(ss_width, ss_height)
+
+
+def build_blur_filters(
+    index: int,
+    num_shots: int,
+    base_duration: float,
+    transition_duration: float,
+    sigma_scale: float = 1.0,
+    time_offset: float = 0,
+    blur_filter: str = 'gaussian'
+) -> str:
+    """
+    Build the stepped blur chain for the "Blur Dissolve" effect of one clip.
+    Returns an empty string when the clip takes part in no transition.
+    The sigmas are tuned for the supersampled resolution; pass `sigma_scale`
+    (see `blur_sigma_scale`) when blurring at another resolution.
+    `time_offset` is where the rendered stream starts within the clip, for
+    streams that skip the beginning of the clip.
+    `blur_filter` 'box' swaps gblur for avgblur with a matching radius.
+    """
+    # Outgoing (Start of transition): Blur ramps UP at the end
+    # Incoming (End of transition): Blur ramps DOWN at the start
+    
+    # We process each clip to handle its specific blur needs.
+    # Clip i serves as:
+    # - Incoming for transition (i-1 -> i) [Start of clip]
+    # - Outgoing for transition (i -> i+1) [End of clip]
+    
+    # Overlap duration is `transition_duration`.
+    # End of clip (Outgoing): t from `base_duration` to `base_duration + transition_duration`??
+    # ZOOMPAN DURATION logic:
+    # We requested `gen_duration = base + trans`.
+    # Overlap happens at the END setup of xfade chains.
+    # xfade offset = current_offset.
+    # xfade consumes the stream.
+    # 
+    # Actually simpler: Apply filters to the *stream* based on time.
+    # Stream `v{i}` has length `base + trans`.
+    # 
+    # RAMP UP BLUR (At End of Stream):
+    # Time range: [base, base + trans]
+    # We split this into 3 steps.
+    td = transition_duration
+    bd = base_duration - time_offset
+    head = -time_offset if time_offset else 0  # Start of the clip in stream time
+    step = td / 3.0
+    
+    # Blur Sigmas
+    if blur_filter == 'box':
+        # A box of radius r has a standard deviation of about r/sqrt(3)
+        s1, s2, s3 = (f"avgblur=sizeX={max(1, round(s * sigma_scale * math.sqrt(3)))}" for s in BLUR_SIGMAS)
+    else:
+        s1, s2, s3 = (f"gblur=sigma={s * sigma_scale:g}" for s in BLUR_SIGMAS)
+    
+    # Outgoing Blur (Tail) - applied to ALL clips except maybe very last (but consistent is fine)
+    # Starts at `bd`.
+    blur_out = (
+        f"{s1}:enable='between(t,{bd},{bd+step})',"
+        f"{s2}:enable='between(t,{bd+step},{bd+2*step})',"
+        f"{s3}:enable='between(t,{bd+2*step},{bd+3*step})'"
+    )
+    
+    # Incoming Blur (Head) - applied to ALL clips except first?
+    # Starts at 0.
+    # Logic: Transition from Prev happens during [0, td] of THIS clip?
+    # Wait, XFADE logic:
+    # A (0..off+td)  and B (0..td+...)
+    # xfade offset `off`.
+    # Overlap is A[off..off+td] AND B[0..td].
+    # So yes, we blur the *beginning* of the clip B from 0 to td.
+    
+    if index > 0:
+        blur_in = (
+            f"{s3}:enable='between(t,{head},{head+step})',"
+            f"{s2}:enable='between(t,{head+step},{head+2*step})',"
+            f"{s1}:enable='between(t,{head+2*step},{head+3*step})'"
+        )
+    else:
+        blur_in = "" # First clip doesn't fade in from previous
         
-    # Build filter complex
-    filters = []
-    zoompan_labels = []
+    # Combine filters
+    # Note: We must be careful with commas in filter strings!
+    
+    filters_str = ""
+    if index < num_shots - 1: # Apply blur out to all except last? 
+        # Actually last clip fades out? No.
+        # Only apply blur out if it's involved in a transition.
+        filters_str += blur_out
+        
+    if index > 0 and filters_str:
+        filters_str += "," + blur_in
+    elif index > 0:
+        filters_str += blur_in
+    
+    return filters_str
+
+
+def blur_sigma_scale(ss_factor: int, blur: Optional[Dict] = None) -> float:
+    """Sigma scale for blurring a frame supersampled by `ss_factor` (1 = output resolution)."""
+    return (blur or DEFAULT_BLUR)['scale'] * ss_factor / DEFAULT_SS_FACTOR
+
+
+def draft_settings(width: int, height: int, fps: int) -> Dict:
+    """
+    Render settings of the draft stand-in for a width x height @ fps render:
+    DRAFT_HEIGHT lines at the same aspect ratio, at most DRAFT_MAX_FPS, no
+    supersampling and box blurs scaled to look like the final render's blurs.
+    """
+    draft_height = min(height, DRAFT_HEIGHT)
+    draft_width = int(round(width * draft_height / height / 2)) * 2
+    return {
+        'width': draft_width,
+        'height': draft_height,
+        'fps': min(fps, DRAFT_MAX_FPS),
+        'ss_factor': 1,
+        'preset': DRAFT_PRESET,
+        # Same blur relative to the frame size as the final render
+        'blur': {'filter': 'box', 'scale': draft_height / height},
+    }
+
+
+def output_codec_args(preset: Optional[str] = None) -> List[str]:
+    """
+    Video encoder settings shared by every final output.
+    `preset` is an x264 speed preset; the VideoToolbox encoder has none.
+    """
+    codec = 'libx264'
+    if sys.platform == 'darwin':
+        codec = 'h264_videotoolbox'
+        
+    args = [
+        '-c:v', codec, 
+        '-b:v', '5M' if codec == 'h264_videotoolbox' else '2M', 
+        '-pix_fmt', 'yuv420p',
+    ]
+    if preset and codec == 'libx264':
+        args.extend(['-preset', preset])
+    return args
+
+
+def parse_rendition(spec: str, output_path: Path, codec_args: List[str]) -> Dict:
+    """
+    Parse a `--rendition` spec, WxH[:BITRATE[:PRESET]] (e.g. 1280x720:3M), into
+    a rendition rendered from the same composed stream as the main output.
+    It is written next to the main output as <stem>_<H>p<suffix>.
+    """
+    size, _, rest = spec.partition(':')
+    bitrate, _, preset = rest.partition(':')
+    try:
+        w, h = (int(v) for v in size.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Invalid rendition '{spec}', expected WxH[:BITRATE[:PRESET]]")
+    if w <= 0 or h <= 0 or w % 2 or h % 2:
+        raise ValueError(f"Invalid rendition '{spec}': width and height must be positive and even")
+    if preset and preset not in X264_PRESETS:
+        raise ValueError(f"Invalid rendition '{spec}': unknown preset '{preset}'")
+
+    args = list(codec_args)
+    if bitrate and '-crf' in args:
+        # A tuned constant-quality profile: the rendition asks for a bitrate instead
+        i = args.index('-crf')
+        args[i:i + 2] = ['-b:v', bitrate]
+    elif bitrate and '-b:v' in args:
+        args[args.index('-b:v') + 1] = bitrate
+    if preset and 'libx264' in args:
+        if '-preset' in args:
+            args[args.index('-preset') + 1] = preset
+        else:
+            args.extend(['-preset', preset])
+
+    output_path = Path(output_path)
+    return {
+        'width': w,
+        'height': h,
+        'codec_args': args,
+        'output': output_path.with_name(f"{output_path.stem}_{h}p{output_path.suffix}"),
+    }
+
+
+def add_rendition_outputs(
+    graph: FilterGraph,
+    source: str,
+    renditions: List[Dict],
+    keep_source: bool = True,
+    **meta
+) -> List[str]:
+    """
+    Split the composed stream `source` into one scaled copy per rendition and,
+    with `keep_source`, the main output. Returns the output labels, main output first.
+    """
+    labels = [f"out{k}" for k in range(len(renditions) + int(keep_source))]
+    if len(labels) > 1:
+        graph.add([source], f"split={len(labels)}", labels, **meta)
+    else:
+        labels = [source]
+    outputs = labels[:1] if keep_source else []
+    for k, (label, rendition) in enumerate(zip(labels[len(outputs):], renditions), 1):
+        graph.add(
+            [label], f"scale={rendition['width']}:{rendition['height']},setsar=1", [f"rendition{k}"], **meta
+        )
+        outputs.append(f"rendition{k}")
+    return outputs
+
+
+def shot_clip(vs: Dict, ss_width: int, ss_height: int, **extra) -> Dict:
+    """Describe a shot as a clip for `build_timeline_graph`."""
+    input_path, input_filter = shot_input(vs, ss_width, ss_height)
+    clip = {
+        'index': vs['index'],
+        'shot_id': vs['shot_id'],
+        'effect': vs['effect'],
+        'duration': vs['duration'],
+        'input_path': input_path,
+        'input_filter': input_filter,
+        'prescaled': 'input_path' in vs,
+    }
+    clip.update(extra)
+    return clip
+
+
+def build_timeline_graph(
+    graph: FilterGraph,
+    clips: List[Dict],
+    num_shots: int,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    total_frames: int,
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    blur: Optional[Dict] = None,
+    reframe: Optional[Dict] = None,
+    masks: Optional[List[str]] = None
+) -> None:
+    """
+    Add the Ken Burns clips and their xfade chain to `graph`, ending in the
+    pad labelled 'final' at the output resolution.
     
+    Clip i reads input pad i (see `shot_clip`). Optional 'start_frame' and
+    'frame_count' render only part of the clip, as windowed mode does at
+    window boundaries. `blur` selects the blur settings (see DEFAULT_BLUR).
+    With `reframe`, the moves become crop paths over the landscape inputs
+    (see `clip_geometry`). With `masks`, one input pad per transition, the
+    transitions reveal the next clip through mask clips (see `add_mask_transition`).
+    """
+    blur = blur or DEFAULT_BLUR
     # Supersampling factor for smoother Ken Burns
-    ss_factor = 2
-    ss_width = width * ss_factor
-    ss_height = height * ss_factor
+    geometry = clip_geometry(width, height, ss_factor, reframe)
+    ss_width, ss_height = geometry['work']
+    
+    zoompan_labels = []
     
     # Step 1: Scale inputs to supersampled resolution AND Apply Ken Burns
-    for i, vs in enumerate(valid_shots):
-        base_duration = vs['duration']
+    for i, clip in enumerate(clips):
+        base_duration = clip['duration']
         # We extend the clip generation by transition_duration to facilitate the overlap
         gen_duration = base_duration + transition_duration
+        start_frame = clip.get('start_frame', 0)
+        num_frames = clip.get('frame_count') or int(gen_duration * fps) - start_frame
         
         # 1. Prepare Input: Upscale to high res (supersampling) to fix jitter
-        input_label = f"[{i}:v]"
-        scaled_label = f"[sc{i}]"
-        
-        scale_filter = (
-            f"format=yuv420p,"
-            f"scale={ss_width}:{ss_height}:force_original_aspect_ratio=increase,"
-            f"crop={ss_width}:{ss_height},"
-            f"setsar=1"
-        )
-        filters.append(f"{input_label}{scale_filter}{scaled_label}")
+        input_label = f"{i}:v"
+        scaled_label = f"sc{i}"
         
-        # 2. Apply Ken Burns on high-res input
-        effect_type = random.choice(KEN_BURNS_EFFECTS)
-        print(f"  Shot {i+1}: Applying {effect_type}")
+        scale_filter = clip['input_filter']
+        input_size = geometry['source'] if clip['prescaled'] else None
+        graph.add([input_label], scale_filter, [scaled_label], size=input_size)
         
-        ken_burns = generate_ken_burns_filter(effect_type, gen_duration, fps, ss_width, ss_height)
+        # 2. Apply Ken Burns on high-res input
+        effect_type = clip['effect']
+        ken_burns = generate_motion_filter(
+            effect_type, gen_duration, fps, geometry, start_frame, clip.get('frame_count')
+        )
         
-        raw_output_label = f"[v{i}_raw]"
-        filters.append(f"{scaled_label}{ken_burns}{raw_output_label}")
+        raw_output_label = f"v{i}_raw"
+        graph.add([scaled_label], ken_burns, [raw_output_label], size=(ss_width, ss_height))
         
         # 3. Apply Stepped Blur for "Blur Dissolve" Effect
-        # Outgoing (Start of transition): Blur ramps UP at the end
-        # Incoming (End of transition): Blur ramps DOWN at the start
-        
-        # We process each clip to handle its specific blur needs.
-        # Clip i serves as:
-        # - Incoming for transition (i-1 -> i) [Start of clip]
-        # - Outgoing for transition (i -> i+1) [End of clip]
-        
-        # Overlap duration is `transition_duration`.
-        # End of clip (Outgoing): t from `base_duration` to `base_duration + transition_duration`??
-        # ZOOMPAN DURATION logic:
-        # We requested `gen_duration = base + trans`.
-        # Overlap happens at the END setup of xfade chains.
-        # xfade offset = current_offset.
-        # xfade consumes the stream.
-        # 
-        # Actually simpler: Apply filters to the *stream* based on time.
-        # Stream `v{i}` has length `base + trans`.
-        # 
-        # RAMP UP BLUR (At End of Stream):
-        # Time range: [base, base + trans]
-        # We split this into 3 steps.
-        td = transition_duration
-        bd = base_duration
-        step = td / 3.0
-        
-        # Blur Sigmas
-        s1, s2, s3 = 10, 20, 40
-        
-        # Outgoing Blur (Tail) - applied to ALL clips except maybe very last (but consistent is fine)
-        # Starts at `bd`.
-        blur_out = (
-            f"gblur=sigma={s1}:enable='between(t,{bd},{bd+step})',"
-            f"gblur=sigma={s2}:enable='between(t,{bd+step},{bd+2*step})',"
-            f"gblur=sigma={s3}:enable='between(t,{bd+2*step},{bd+3*step})'"
+        filters_str = build_blur_filters(
+            clip['index'], num_shots, base_duration, transition_duration,
+            blur_sigma_scale(ss_factor, blur) * geometry['density'], start_frame / fps, blur['filter']
         )
-        
-        # Incoming Blur (Head) - applied to ALL clips except first?
-        # Starts at 0.
-        # Logic: Transition from Prev happens during [0, td] of THIS clip?
-        # Wait, XFADE logic:
-        # A (0..off+td)  and B (0..td+...)
-        # xfade offset `off`.
-        # Overlap is A[off..off+td] AND B[0..td].
-        # So yes, we blur the *beginning* of the clip B from 0 to td.
-        
-        if i > 0:
-            blur_in = (
-                f"gblur=sigma={s3}:enable='between(t,0,{step})',"
-                f"gblur=sigma={s2}:enable='between(t,{step},{2*step})',"
-                f"gblur=sigma={s1}:enable='between(t,{2*step},{3*step})'"
-            )
-        else:
-            blur_in = "" # First clip doesn't fade in from previous
-            
-        # Combine filters
-        # Note: We must be careful with commas in filter strings!
-        
-        filters_str = ""
-        if i < num_valid_shots - 1: # Apply blur out to all except last? 
-            # Actually last clip fades out? No.
-            # Only apply blur out if it's involved in a transition.
-            filters_str += blur_out
             
-        if i > 0 and filters_str:
-            filters_str += "," + blur_in
-        elif i > 0:
-            filters_str += blur_in
-            
-        output_label = f"[v{i}]"
+        output_label = f"v{i}"
         
-        if filters_str:
-            filters.append(f"{raw_output_label}{filters_str}{output_label}")
-        else:
-            # No blur needed (e.g. single clip?)
-            output_label = raw_output_label # Use raw as output, careful with label naming
+        # No blur needed (e.g. single clip): passthrough to unify naming
+        graph.add(
+            [raw_output_label], filters_str or 'null', [output_label],
+            size=(ss_width, ss_height), frames=num_frames, fps=fps
+        )
         
-        # Wait, if i=0 (first clip), we might rename raw->v0.
-        if not filters_str:
-             filters.append(f"{raw_output_label}null{output_label}") # Passthrough to unify naming
-             
-        zoompan_labels.append((output_label, base_duration))
+        # How far this clip moves the xfade offset: its visible length before the next transition
+        advance = base_duration - start_frame / fps if start_frame else base_duration
+        zoompan_labels.append((output_label, advance))
     
     # Step 2: Chain transitions using xfade (at high res)
     if len(zoompan_labels) > 1:
@@ -483,15 +924,27 @@ def build_ffmpeg_command(
             next_base_duration = zoompan_labels[i][1]
             
             offset = current_offset
-            # Use 'fade' transition which behaves like Dissolve
-            # combined with our pre-applied blur, this matches 'Blur Dissolve'
-            transition = 'fade' 
-            output_label = f"[vt{i}]"
+            output_label = f"vt{i}"
             
-            filters.append(
-                f"{current_label}{next_label}xfade=transition={transition}:"
-                f"duration={transition_duration}:offset={offset}{output_label}"
-            )
+            if masks:
+                add_mask_transition(
+                    graph, current_label, next_label, masks[i - 1], output_label,
+                    int(round(offset * fps)), int(round(transition_duration * fps)),
+                    (ss_width, ss_height), fps
+                )
+            else:
+                # Use 'fade' transition which behaves like Dissolve
+                # combined with our pre-applied blur, this matches 'Blur Dissolve'
+                transition = 'fade' 
+                graph.add(
+                    [current_label, next_label],
+                    f"xfade=transition={transition}:"
+                    f"duration={transition_duration}:offset={offset}",
+                    [output_label],
+                    size=(ss_width, ss_height),
+                    frames=int((offset + next_base_duration + transition_duration) * fps),
+                    fps=fps
+                )
             
             current_label = output_label
             current_offset += next_base_duration
@@ -501,34 +954,1094 @@ def build_ffmpeg_command(
         highres_output = zoompan_labels[0][0]
         
     # Step 3: Downscale to final resolution
-    final_output = "[final]"
-    filters.append(f"{highres_output}scale={width}:{height}{final_output}")
+    graph.add(
+        [highres_output], f"scale={width}:{height}", ["final"],
+        size=(ss_width, ss_height), frames=total_frames, fps=fps
+    )
+
+
+def add_mask_transition(
+    graph: FilterGraph,
+    outgoing: str,
+    incoming: str,
+    mask: str,
+    output: str,
+    offset_frames: int,
+    transition_frames: int,
+    size: Tuple[int, int],
+    fps: int
+) -> None:
+    """
+    Add a mask transition, the counterpart of an xfade at `offset_frames`:
+    the overlapping frames of both clips are cut out, the incoming clip is
+    laid over the outgoing one with the mask clip as its alpha, and the
+    pieces are joined again. The mask is scaled up to the clip size here.
+    """
+    width, height = size
+    meta = {'size': size, 'fps': fps}
+    a_body, a_tail, b_head, b_rest = (f"{output}{part}" for part in ('ab', 'at', 'bh', 'br'))
+    graph.add([outgoing], 'split', [f"{a_body}s", f"{a_tail}s"], **meta)
+    graph.add([f"{a_body}s"], f"trim=end_frame={offset_frames}", [a_body], frames=offset_frames, **meta)
+    # concat expects every part to start at 0. Its output has no frame rate
+    # (setpts drops it), so commands rendering this graph must set -r.
+    retime = 'setpts=PTS-STARTPTS'
+    graph.add(
+        [f"{a_tail}s"], f"trim=start_frame={offset_frames},{retime}", [a_tail],
+        frames=transition_frames, **meta
+    )
+    graph.add([incoming], 'split', [f"{b_head}s", f"{b_rest}s"], **meta)
+    graph.add([f"{b_head}s"], f"trim=end_frame={transition_frames}", [b_head], frames=transition_frames, **meta)
+    graph.add([f"{b_rest}s"], f"trim=start_frame={transition_frames},{retime}", [b_rest], **meta)
+    graph.add([mask], f"scale={width}:{height}", [f"{output}m"], frames=transition_frames, **meta)
+    graph.add([b_head, f"{output}m"], 'alphamerge', [f"{output}bm"], frames=transition_frames, **meta)
+    graph.add([a_tail, f"{output}bm"], 'overlay=shortest=1', [f"{output}mix"], frames=transition_frames, **meta)
+    graph.add([a_body, f"{output}mix", b_rest], 'concat=n=3:v=1:a=0', [output], **meta)
+
+
+def add_mask_inputs(cmd: List[str], transition: Optional[Dict], first_input: int, count: int) -> Optional[List[str]]:
+    """Add the mask clip of a mask transition once per transition; returns their input pads."""
+    if not transition or count <= 0:
+        return None
+    for _ in range(count):
+        cmd.extend(['-i', str(transition['mask'])])
+    return [f"{first_input + k}:v" for k in range(count)]
+
+
+def transition_key(transition: Optional[Dict]) -> object:
+    """What a cache key needs to know about the transition type."""
+    if not transition:
+        return DEFAULT_TRANSITION
+    return [transition['type'], hash_file(transition['mask'])]
+
+
+def print_optimization_report(report: List[Dict]) -> None:
+    """Print what the filter-graph optimizer changed and what it saved."""
+    total_saved = sum(entry['saved'] for entry in report if entry['saved'] is not None)
+    print("Filter graph optimizer:")
+    for entry in report:
+        if entry['saved'] is None:
+            print(f"  {entry['pass']}: {entry['rewrites']} rewrites (fewer filters, same pixel work)")
+            continue
+        print(f"  {entry['pass']}: {entry['rewrites']} rewrites, "
+              f"~{entry['saved'] / 1e9:.2f} Gpixel-ops saved")
+    print(f"  Total: ~{total_saved / 1e9:.2f} Gpixel-ops saved")
+
+
+def build_ffmpeg_command(
+    shots: List[Dict],
+    generations_dir: Path,
+    output_path: Path,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    valid_shots: Optional[List[Dict]] = None,
+    optimize_graph: bool = False,
+    filter_script: Optional[Path] = None,
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    codec_args: Optional[List[str]] = None,
+    blur: Optional[Dict] = None,
+    renditions: Optional[List[Dict]] = None,
+    reframe: Optional[Dict] = None,
+    transition: Optional[Dict] = None,
+    threads: Optional[int] = None
+) -> Tuple[List[str], int, float]:
+    """
+    Build the complete FFmpeg command with filter complex 
+    implementing a specific "Blur Dissolve" transition.
+    Pass `valid_shots` (see `collect_valid_shots`) to reuse shots that were
+    already resolved, e.g. with effects chosen and pre-scaled inputs assigned.
+    With `optimize_graph`, the rewrite passes of lib.filter_graph are applied.
+    With `filter_script`, the graph is written to that file and passed with
+    -filter_complex_script instead of on the command line.
+    `codec_args` default to `output_codec_args()`.
+    Each of `renditions` (see `parse_rendition`) is scaled from the same
+    composed stream and written as an extra output of the same command.
+    `reframe` renders a cut of a different aspect ratio (see `clip_geometry`).
+    `transition` selects a mask transition ({'type', 'mask'}); None cross-fades.
+    `threads` sets the encoder threads of every output (ffmpeg's default without).
+    """
+    cmd = ['ffmpeg', '-y']  # -y to overwrite output file
     
+    # Init hardware acceleration for macOS
+    if sys.platform == 'darwin':
+        # cmd.extend(['-init_hw_device', 'videotoolbox']) 
+        pass
 
-    # Combine all filters
-    filter_complex = ';'.join(filters)
+    # Collect valid shots with their image paths and durations
+    if valid_shots is None:
+        valid_shots = collect_valid_shots(shots, generations_dir)
+        print(f"Found {len(valid_shots)} valid images")
+        choose_effects(valid_shots)
     
-    # Add filter complex to command
-    cmd.extend(['-filter_complex', filter_complex])
+    num_valid_shots = len(valid_shots)
+
+    # Calculate total duration: sum of base durations + one transition duration (tail)
+    total_duration = sum(s['duration'] for s in valid_shots) + transition_duration
     
-    # Map final output video
-    cmd.extend(['-map', final_output])
+    # Supersampled input frames for smoother Ken Burns
+    source_width, source_height = clip_geometry(width, height, ss_factor, reframe)['source']
     
-    # Output settings
-    codec = 'libx264'
-    if sys.platform == 'darwin':
-        codec = 'h264_videotoolbox'
+    # Add inputs to command
+    # Use -i without loop. zoompan will handle duration.
+    clips = [shot_clip(vs, source_width, source_height) for vs in valid_shots]
+    for clip in clips:
+        cmd.extend(['-i', str(clip['input_path'])])
+    masks = add_mask_inputs(cmd, transition, len(clips), len(clips) - 1)
         
-    cmd.extend([
-        '-c:v', codec, 
-        '-b:v', '5M' if codec == 'h264_videotoolbox' else '2M', 
-        '-pix_fmt', 'yuv420p',
-        str(output_path)
-    ])
+    # Build filter complex
+    graph = FilterGraph()
+    build_timeline_graph(
+        graph, clips, num_valid_shots, fps, width, height,
+        transition_duration, int(total_duration * fps), ss_factor, blur, reframe, masks
+    )
+    final_output = "final"
+    
+    if optimize_graph:
+        report = optimize(graph)
+        print_optimization_report(report)
+
+    # Renditions are split off after optimizing so the passes only see the composition
+    outputs = [(final_output, codec_args or output_codec_args(), output_path)]
+    if renditions:
+        labels = add_rendition_outputs(
+            graph, final_output, renditions,
+            size=(width, height), frames=int(total_duration * fps), fps=fps
+        )
+        outputs = [(labels[0], outputs[0][1], output_path)] + [
+            (label, r['codec_args'], r['output']) for label, r in zip(labels[1:], renditions)
+        ]
+
+    # Add filter complex to command
+    if filter_script:
+        cmd.extend(['-filter_complex_script', str(graph.write_script(filter_script))])
+    else:
+        cmd.extend(['-filter_complex', graph.render()])
+    
+    for label, output_args, path in outputs:
+        # Map output video
+        cmd.extend(['-map', f"[{label}]"])
+        
+        # Output settings
+        cmd.extend(output_args)
+        if masks:
+            cmd.extend(['-r', str(fps)])
+        if threads:
+            cmd.extend(['-threads', str(threads)])
+        cmd.append(str(path))
     
     return cmd, num_valid_shots, total_duration
 
 
+def plan_segment_render(
+    valid_shots: List[Dict],
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    work_dir: Path,
+    cache: Optional[RenderCache] = None,
+    engine: str = 'zoompan',
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    codec_args: Optional[List[str]] = None,
+    blur: Optional[Dict] = None,
+    reframe: Optional[Dict] = None,
+    transition: Optional[Dict] = None
+) -> Dict:
+    """
+    Split the timeline into independently renderable segments.
+
+    Every shot is rendered once and cut into up to three parts:
+    - head: the first transition window (blurred in), input of the previous transition
+    - body: the part that is shown on its own, encoded with the final codec
+    - tail: the last transition window (blurred out), input of the next transition
+    The first shot has no head and the last shot has no tail; both are kept in the body.
+
+    Transitions cross-fade tail(i) with head(i+1), or reveal head(i+1) through
+    the mask clip of `transition`. The final video is the concatenation
+    body(0), transition(0), body(1), ..., body(n-1).
+
+    With a cache, segment files are named by a hash of everything that affects
+    their pixels, and segments whose files already exist are marked 'cached'.
+    Shots whose image isn't generated yet (see --watch), and the transitions
+    next to them, are marked 'pending'.
+    The supersampling factor, encoder, blur and reframe settings are kept in the plan.
+    """
+    codec_args = codec_args or output_codec_args()
+    blur = blur or DEFAULT_BLUR
+    num_shots = len(valid_shots)
+    transition_frames = int(round(transition_duration * fps))
+    
+    shot_segments = []
+    for i, vs in enumerate(valid_shots):
+        gen_duration = vs['duration'] + transition_duration
+        num_frames = int(gen_duration * fps)
+        
+        body_start = transition_frames if i > 0 else 0
+        body_end = num_frames - transition_frames if i < num_shots - 1 else num_frames
+        if body_end <= body_start:
+            raise ValueError(
+                f"Shot {vs['shot_id']} ({vs['duration']}s) is too short for "
+                f"a {transition_duration}s transition in segment mode."
+            )
+        
+        pending = not vs['image_path'].exists()
+        key = None
+        if cache and not pending:
+            key = cache.key(
+                'shot', SEGMENT_CACHE_VERSION, hash_file(vs['image_path']),
+                vs['effect'], engine, vs['duration'], transition_duration, fps,
+                width, height, ss_factor, BLUR_SIGMAS, blur, reframe,
+                i > 0, i < num_shots - 1,
+                codec_args, INTERMEDIATE_CODEC_ARGS
+            )
+        
+        def part_path(suffix: str) -> Path:
+            if key:
+                return cache.path(key, suffix)
+            return work_dir / f"shot_{vs['shot_id']}{suffix}"
+        
+        parts = []
+        if i > 0:
+            parts.append(('head', 0, transition_frames, part_path('_head.mkv')))
+        parts.append(('body', body_start, body_end, part_path('_body.mp4')))
+        if i < num_shots - 1:
+            parts.append(('tail', body_end, num_frames, part_path('_tail.mkv')))
+        
+        outputs = {name: path for name, _, _, path in parts}
+        shot_segments.append({
+            'name': f"shot_{vs['shot_id']}",
+            'shot': vs,
+            'key': key,
+            'num_frames': num_frames,
+            'parts': parts,
+            'outputs': outputs,
+            'pending': pending,
+            'cached': bool(key) and cache.lookup(*outputs.values()),
+        })
+    
+    transitions = []
+    for i in range(num_shots - 1):
+        prev_seg = shot_segments[i]
+        next_seg = shot_segments[i + 1]
+        name = f"transition_{prev_seg['shot']['shot_id']}_{next_seg['shot']['shot_id']}"
+        pending = prev_seg['pending'] or next_seg['pending']
+        key = None
+        if cache and not pending:
+            key = cache.key(
+                'transition', SEGMENT_CACHE_VERSION, prev_seg['key'], next_seg['key'],
+                transition_key(transition), transition_frames, fps, codec_args
+            )
+            output = cache.path(key, '_transition.mp4')
+        else:
+            output = work_dir / f"{name}.mp4"
+        transitions.append({
+            'name': name,
+            'label': f"{prev_seg['shot']['shot_id']}>{next_seg['shot']['shot_id']}",
+            'inputs': [prev_seg['outputs']['tail'], next_seg['outputs']['head']],
+            'duration': transition_frames / fps,
+            'mask': transition['mask'] if transition else None,
+            'size': (width, height),
+            'output': output,
+            'pending': pending,
+            'cached': bool(key) and cache.lookup(output),
+        })
+    
+    concat_list = []
+    for i, seg in enumerate(shot_segments):
+        concat_list.append(seg['outputs']['body'])
+        if i < len(transitions):
+            concat_list.append(transitions[i]['output'])
+    
+    return {
+        'work_dir': work_dir,
+        'cache': cache,
+        'shots': shot_segments,
+        'transitions': transitions,
+        'concat_list': concat_list,
+        'ss_factor': ss_factor,
+        'codec_args': codec_args,
+        'blur': blur,
+        'reframe': reframe,
+    }
+
+
+def build_shot_segment_command(
+    segment: Dict,
+    num_shots: int,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    threads: int,
+    engine: str = 'zoompan',
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    codec_args: Optional[List[str]] = None,
+    blur: Optional[Dict] = None,
+    reframe: Optional[Dict] = None
+) -> List[str]:
+    """
+    Build the FFmpeg command that renders one shot's Ken Burns clip
+    and cuts it into its head/body/tail parts.
+    With the numpy engine the command reads raw rgb24 frames from stdin
+    (see `feed_numpy_frames`) instead of running zoompan. Still shots
+    (STILL_EFFECT) are held at the final resolution with either engine.
+    """
+    vs = segment['shot']
+    blur_settings = blur or DEFAULT_BLUR
+    geometry = clip_geometry(width, height, ss_factor, reframe)
+    gen_duration = vs['duration'] + transition_duration
+    
+    if vs['effect'] == STILL_EFFECT:
+        # A still needs no supersampling: scale it once, hold it and blur only
+        # the transition windows, all at the final resolution
+        input_path, input_filter = shot_input(vs, *geometry['source'])
+        input_args = ['-i', str(input_path)]
+        chain = [
+            input_filter,
+            generate_still_filter(gen_duration, fps, *geometry['source'], width, height),
+        ]
+        # Same blur as the clip would get at the work size and then downscaled
+        sigma_scale = blur_sigma_scale(ss_factor, blur_settings) * geometry['density']
+        blur = build_blur_filters(
+            vs['index'], num_shots, vs['duration'], transition_duration,
+            sigma_scale=sigma_scale * height / geometry['work'][1],
+            blur_filter=blur_settings['filter']
+        )
+        if blur:
+            chain.append(blur)
+    elif engine == 'numpy':
+        # Frames arrive at the final resolution; blur at the matching sigma
+        input_args = [
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{width}x{height}",
+            '-r', str(fps), '-i', 'pipe:0',
+        ]
+        chain = ['format=yuv420p']
+        blur = build_blur_filters(
+            vs['index'], num_shots, vs['duration'], transition_duration,
+            sigma_scale=blur_sigma_scale(1, blur_settings), blur_filter=blur_settings['filter']
+        )
+        if blur:
+            chain.append(blur)
+    else:
+        input_path, input_filter = shot_input(vs, *geometry['source'])
+        input_args = ['-i', str(input_path)]
+        chain = [
+            input_filter,
+            generate_motion_filter(vs['effect'], gen_duration, fps, geometry),
+        ]
+        blur = build_blur_filters(
+            vs['index'], num_shots, vs['duration'], transition_duration,
+            sigma_scale=blur_sigma_scale(ss_factor, blur_settings) * geometry['density'],
+            blur_filter=blur_settings['filter']
+        )
+        if blur:
+            chain.append(blur)
+        # Downscale per clip: xfade is a linear blend, so fading at the final
+        # resolution gives the same result as fading at the supersampled one.
+        if geometry['work'] != (width, height):
+            chain.append(f"scale={width}:{height}")
+    
+    parts = segment['parts']
+    split_labels = ''.join(f"[s{j}]" for j in range(len(parts)))
+    filters = [f"[0:v]{','.join(chain)},split={len(parts)}{split_labels}"]
+    for j, (name, start, end, _) in enumerate(parts):
+        filters.append(
+            f"[s{j}]trim=start_frame={start}:end_frame={end},setpts=PTS-STARTPTS[{name}]"
+        )
+    
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error', '-nostats',
+        *input_args,
+        '-filter_complex', ';'.join(filters),
+    ]
+    # Body first: ffmpeg's progress report counts the frames of the first output
+    for name, _, _, path in sorted(parts, key=lambda part: part[0] != 'body'):
+        part_codec_args = (codec_args or output_codec_args()) if name == 'body' else INTERMEDIATE_CODEC_ARGS
+        cmd.extend([
+            '-map', f"[{name}]", *part_codec_args, '-r', str(fps),
+            '-threads', str(threads), str(partial_path(path))
+        ])
+    return cmd
+
+
+def feed_numpy_frames(segment: Dict, fps: int, width: int, height: int, transition_duration: float):
+    """Return a callable that streams a shot's NumPy-rendered frames into an encoder's stdin."""
+    from lib.ken_burns_numpy import stream_frames
+    
+    vs = segment['shot']
+    
+    def feed(sink):
+        stream_frames(
+            vs['image_path'], vs['effect'], segment['num_frames'], width, height, sink,
+            KEN_BURNS_ZOOM_MIN, KEN_BURNS_ZOOM_MAX
+        )
+    return feed
+
+
+def build_transition_command(
+    transition: Dict,
+    fps: int,
+    threads: int,
+    codec_args: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Build the FFmpeg command that cross-fades a shot tail into the next shot
+    head, or reveals the head through the transition's mask clip.
+    """
+    tail_path, head_path = transition['inputs']
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error', '-nostats',
+        '-i', str(tail_path),
+        '-i', str(head_path),
+    ]
+    if transition['mask']:
+        width, height = transition['size']
+        cmd.extend([
+            '-i', str(transition['mask']),
+            '-filter_complex',
+            f"[2:v]scale={width}:{height}[m];[1:v][m]alphamerge[h];[0:v][h]overlay=shortest=1[v]",
+        ])
+    else:
+        cmd.extend([
+            '-filter_complex',
+            f"[0:v][1:v]xfade=transition=fade:duration={transition['duration']}:offset=0[v]",
+        ])
+    return cmd + [
+        '-map', '[v]',
+        *(codec_args or output_codec_args()),
+        '-r', str(fps),
+        '-threads', str(threads),
+        str(partial_path(transition['output']))
+    ]
+
+
+def build_concat_command(
+    concat_list: List[Path],
+    list_path: Path,
+    output_path: Path
+) -> List[str]:
+    """
+    Build the FFmpeg command that joins rendered segments with the concat demuxer.
+    Segments are stream-copied; audio is added by the mux step (see `build_mux_job`).
+    The list file itself is written by `write_concat_list`.
+    """
+    return [
+        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(list_path),
+        '-map', '0:v', '-c:v', 'copy', str(output_path)
+    ]
+
+
+def plan_audio_track(
+    audio_path: Path,
+    render_dir: Path,
+    cache: Optional[RenderCache] = None
+) -> Tuple[Path, Optional[Dict]]:
+    """
+    Encode the soundtrack once into the outputs' audio codec, so that video
+    renders only stream-copy it (see `build_mux_job`).
+
+    With a cache, the track is keyed by the hash of the source file and reused
+    until the file changes. Returns the track path and the job that encodes
+    it, or None if it is cached.
+    """
+    if cache:
+        key = cache.key('audio', AUDIO_CACHE_VERSION, hash_file(audio_path), AUDIO_CODEC_ARGS)
+        track = cache.path(key, AUDIO_TRACK_SUFFIX)
+        if cache.lookup(track):
+            return track, None
+    else:
+        track = render_dir / f"audio{AUDIO_TRACK_SUFFIX}"
+    job = {
+        'name': 'audio',
+        'stage': 'prepare',
+        'cmd': [
+            'ffmpeg', '-y', '-loglevel', 'error', '-nostats',
+            '-i', str(audio_path),
+            '-map', '0:a:0', *AUDIO_CODEC_ARGS,
+            str(partial_path(track))
+        ],
+        'commit': [(partial_path(track), track)],
+    }
+    return track, job
+
+
+def build_mux_job(video_path: Path, audio_track: Path, output_path: Path, duration: float) -> Dict:
+    """Job that adds the prepared audio track to a finished video, both stream-copied."""
+    return {
+        'name': f"mux_{output_path.stem}",
+        'stage': 'mux',
+        'cmd': [
+            'ffmpeg', '-y', '-loglevel', 'error', '-nostats',
+            '-i', str(video_path),
+            '-i', str(audio_track),
+            '-map', '0:v', '-map', '1:a', '-c', 'copy',
+            # Cut the soundtrack to the video
+            '-t', str(duration),
+            str(partial_path(output_path))
+        ],
+        'commit': [(partial_path(output_path), output_path)],
+    }
+
+
+def build_renditions_job(source_path: Path, renditions: List[Dict], total_frames: int) -> Dict:
+    """
+    Job that derives every rendition from the assembled video in one decode:
+    the frames are split and scaled per rendition.
+    """
+    graph = FilterGraph()
+    labels = add_rendition_outputs(graph, '0:v', renditions, keep_source=False)
+    cmd = ['ffmpeg', '-y', '-i', str(source_path), '-filter_complex', graph.render()]
+    for label, rendition in zip(labels, renditions):
+        cmd.extend(['-map', f"[{label}]", *rendition['codec_args'], str(rendition['output'])])
+    return {
+        'name': 'renditions',
+        'stage': 'renditions',
+        'cmd': cmd,
+        'frames': total_frames,
+    }
+
+
+def write_concat_list(concat_list: List[Path], list_path: Path) -> None:
+    """Write an input list for FFmpeg's concat demuxer."""
+    list_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(list_path, 'w') as f:
+        for segment_path in concat_list:
+            # ffmpeg requires safe filenames or absolute paths
+            f.write(f"file '{segment_path.absolute()}'\n")
+
+
+def build_segment_jobs(
+    plan: Dict,
+    output_path: Path,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    workers: int,
+    engine: str = 'zoompan',
+    threads: Optional[int] = None
+) -> List[List[Dict]]:
+    """
+    Turn a segment plan into job stages. Jobs inside a stage are independent
+    and may run in parallel; stages run one after another. Pending segments
+    are skipped, and the concat is left out until none are. `threads` is the
+    encoder thread count of a tuned profile.
+    """
+    # Share the cores between the concurrent ffmpeg processes
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    num_shots = len(plan['shots'])
+    
+    # Cached segments are skipped; jobs write partial files that are committed on success
+    shot_jobs = []
+    for seg in plan['shots']:
+        if seg['cached'] or seg['pending']:
+            continue
+        body_start, body_end = next((start, end) for name, start, end, _ in seg['parts'] if name == 'body')
+        job = {
+            'name': seg['name'],
+            'stage': 'shots',
+            'cmd': build_shot_segment_command(
+                seg, num_shots, fps, width, height, transition_duration, threads, engine,
+                plan['ss_factor'], plan['codec_args'], plan['blur'], plan['reframe']
+            ),
+            'commit': [(partial_path(path), path) for path in seg['outputs'].values()],
+            'frames': body_end - body_start,
+            'effect': seg['shot']['effect'],
+            'shots': [(0, seg['shot']['shot_id'])],
+        }
+        if engine == 'numpy' and seg['shot']['effect'] != STILL_EFFECT:
+            job['feed'] = feed_numpy_frames(seg, fps, width, height, transition_duration)
+            job['sources'] = [seg['shot']['image_path']]
+        shot_jobs.append(job)
+    transition_jobs = [
+        {
+            'name': tr['name'],
+            'stage': 'transitions',
+            'cmd': build_transition_command(tr, fps, threads, plan['codec_args']),
+            'commit': [(partial_path(tr['output']), tr['output'])],
+            'frames': int(round(tr['duration'] * fps)),
+            'shots': [(0, tr['label'])],
+        }
+        for tr in plan['transitions'] if not (tr['cached'] or tr['pending'])
+    ]
+    stages = [stage for stage in (shot_jobs, transition_jobs) if stage]
+    if any(seg['pending'] for seg in plan['shots']):
+        return stages
+    
+    list_path = plan['work_dir'] / 'concat.txt'
+    concat_job = {
+        'name': 'concat',
+        'stage': 'concat',
+        'cmd': build_concat_command(plan['concat_list'], list_path, output_path),
+        'before': lambda: write_concat_list(plan['concat_list'], list_path),
+    }
+    stages.append([concat_job])
+    return stages
+
+
+def plan_windows(
+    valid_shots: List[Dict],
+    window_size: int,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    work_dir: Path,
+    cache: Optional[RenderCache] = None,
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    codec_args: Optional[List[str]] = None,
+    blur: Optional[Dict] = None,
+    reframe: Optional[Dict] = None,
+    transition: Optional[Dict] = None,
+    cuts: Optional[List[int]] = None
+) -> List[Dict]:
+    """
+    Split the timeline into windows of `window_size` shots for windowed mode,
+    or at the shot indices `cuts` (see `chunk_cuts`).
+    
+    Consecutive windows overlap by one shot. A window ends with only the head
+    of its overlap shot, so it contains the whole transition into it; the next
+    window starts that shot right after its head. Cutting both at the end of
+    the transition makes the windows join seamlessly, and every ffmpeg process
+    holds at most window_size + 1 inputs no matter how long the video is.
+    """
+    codec_args = codec_args or output_codec_args()
+    blur = blur or DEFAULT_BLUR
+    num_shots = len(valid_shots)
+    transition_frames = int(round(transition_duration * fps))
+    source_width, source_height = clip_geometry(width, height, ss_factor, reframe)['source']
+    
+    if cuts is None:
+        cuts = [0]
+        while cuts[-1] < num_shots - 1:
+            cuts.append(min(cuts[-1] + window_size, num_shots - 1))
+    
+    windows = []
+    for first, last in list(zip(cuts, cuts[1:])) or [(0, num_shots - 1)]:
+        clips = []
+        for j in range(first, last + 1):
+            extra = {}
+            if j == first and first > 0:
+                extra['start_frame'] = transition_frames
+            if j == last and last < num_shots - 1:
+                extra['frame_count'] = transition_frames
+            clips.append(shot_clip(valid_shots[j], source_width, source_height, **extra))
+        
+        name = f"window_{valid_shots[first]['shot_id']}_{valid_shots[last]['shot_id']}"
+        if cache:
+            key = cache.key(
+                'window', SEGMENT_CACHE_VERSION,
+                [
+                    (hash_file(valid_shots[c['index']]['image_path']), c['effect'], c['duration'],
+                     c['index'] > 0, c['index'] < num_shots - 1,
+                     c.get('start_frame', 0), c.get('frame_count'))
+                    for c in clips
+                ],
+                transition_duration, fps, width, height, ss_factor, BLUR_SIGMAS, blur, reframe,
+                transition_key(transition), codec_args
+            )
+            output = cache.path(key, '_window.mp4')
+        else:
+            output = work_dir / f"{name}.mp4"
+        
+        windows.append({
+            'name': name,
+            'clips': clips,
+            'output': output,
+            'filter_script': work_dir / f"{name}_filter.txt",
+            'ss_factor': ss_factor,
+            'codec_args': codec_args,
+            'blur': blur,
+            'reframe': reframe,
+            'transition': transition,
+            'cached': bool(cache) and cache.lookup(output),
+        })
+    return windows
+
+
+def chunk_cuts(valid_shots: List[Dict], chunk_seconds: float, max_shots: int) -> List[int]:
+    """
+    Shot indices to cut the timeline at for chunked mode (see `plan_windows`):
+    a chunk ends at the first shot boundary after `chunk_seconds` of shots, or
+    after `max_shots` shots, whichever comes first. A shot of `chunk_seconds`
+    or more starts a chunk of its own, so the longest chunk isn't made longer
+    by the shots before it.
+    """
+    last_shot = len(valid_shots) - 1
+    cuts = [0]
+    seconds = 0.0
+    for i, vs in enumerate(valid_shots[:-1]):
+        seconds += vs['duration']
+        long_shot_next = valid_shots[i + 1]['duration'] >= chunk_seconds
+        if i + 1 < last_shot and (seconds >= chunk_seconds or long_shot_next or i + 1 - cuts[-1] >= max_shots):
+            cuts.append(i + 1)
+            seconds = 0.0
+    if last_shot > 0:
+        cuts.append(last_shot)
+    return cuts
+
+
+def window_frame_count(window: Dict, fps: int, transition_duration: float) -> int:
+    """Number of frames a window renders."""
+    clips = window['clips']
+    clip_frames = [
+        c.get('frame_count') or int((c['duration'] + transition_duration) * fps) - c.get('start_frame', 0)
+        for c in clips
+    ]
+    return sum(clip_frames) - (len(clips) - 1) * int(round(transition_duration * fps))
+
+
+def build_window_command(
+    window: Dict,
+    num_shots: int,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    threads: int
+) -> List[str]:
+    """
+    Build the FFmpeg command that renders one window of the timeline.
+    The window's filter graph is written to its script file.
+    """
+    clips = window['clips']
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-nostats']
+    for clip in clips:
+        cmd.extend(['-i', str(clip['input_path'])])
+    masks = add_mask_inputs(cmd, window['transition'], len(clips), len(clips) - 1)
+    
+    graph = FilterGraph()
+    build_timeline_graph(
+        graph, clips, num_shots, fps, width, height, transition_duration,
+        window_frame_count(window, fps, transition_duration), window['ss_factor'], window['blur'],
+        window['reframe'], masks
+    )
+    
+    cmd.extend([
+        '-filter_complex_script', str(graph.write_script(window['filter_script'])),
+        '-map', '[final]',
+        *window['codec_args'],
+        '-r', str(fps),
+        '-threads', str(threads),
+        str(partial_path(window['output']))
+    ])
+    return cmd
+
+
+def tuning_sample_shots(valid_shots: List[Dict]) -> List[Dict]:
+    """The shots the encoder tuning sample is cut from: the two around the middle transition."""
+    if len(valid_shots) == 1:
+        return valid_shots
+    middle = (len(valid_shots) - 1) // 2
+    return valid_shots[middle:middle + 2]
+
+
+def plan_tuning_sample(
+    valid_shots: List[Dict],
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    ss_factor: int,
+    work_dir: Path,
+    reframe: Optional[Dict] = None,
+    seconds: float = TUNING_SAMPLE_SECONDS
+) -> Dict:
+    """
+    A window (see `plan_windows`) with `seconds` of the two shots around the
+    middle transition plus the transition itself, rendered losslessly as the
+    sample for encoder probes. A single shot is sampled from its start.
+    Like the render, the sample reads the shots' pre-scaled inputs if they
+    have them (see `tuning_sample_shots`) and is cut as `reframe` says.
+    """
+    source_width, source_height = clip_geometry(width, height, ss_factor, reframe)['source']
+    transition_frames = int(round(transition_duration * fps))
+    half = int(seconds * fps) // 2
+    
+    def clip_frames(vs: Dict) -> int:
+        return int((vs['duration'] + transition_duration) * fps)
+    
+    sampled = tuning_sample_shots(valid_shots)
+    if len(sampled) == 1:
+        vs = sampled[0]
+        clips = [shot_clip(vs, source_width, source_height, frame_count=min(2 * half, clip_frames(vs)))]
+    else:
+        outgoing, incoming = sampled
+        clips = [
+            shot_clip(
+                outgoing, source_width, source_height,
+                start_frame=max(0, clip_frames(outgoing) - transition_frames - half)
+            ),
+            shot_clip(
+                incoming, source_width, source_height,
+                frame_count=min(clip_frames(incoming), transition_frames + half)
+            ),
+        ]
+    return {
+        'name': 'tuning_sample',
+        'clips': clips,
+        'output': work_dir / 'sample.mkv',
+        'filter_script': work_dir / 'sample_filter.txt',
+        'ss_factor': ss_factor,
+        'codec_args': INTERMEDIATE_CODEC_ARGS,
+        'blur': DEFAULT_BLUR,
+        'reframe': reframe,
+        'transition': None,
+    }
+
+
+def build_window_jobs(
+    windows: List[Dict],
+    num_shots: int,
+    work_dir: Path,
+    output_path: Path,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    workers: int,
+    threads: Optional[int] = None
+) -> List[List[Dict]]:
+    """
+    Turn planned windows into job stages: all windows, then the concat.
+    `threads` is the encoder thread count of a tuned profile.
+    """
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    window_jobs = [
+        {
+            'name': window['name'],
+            'stage': 'windows',
+            'cmd': build_window_command(
+                window, num_shots, fps, width, height, transition_duration, threads
+            ),
+            'commit': [(partial_path(window['output']), window['output'])],
+            'frames': window_frame_count(window, fps, transition_duration),
+            'shots': job_timeline(
+                [c['duration'] - c.get('start_frame', 0) / fps for c in window['clips']],
+                [c['shot_id'] for c in window['clips']],
+                fps
+            ),
+        }
+        for window in windows if not window['cached']
+    ]
+    concat_list = [window['output'] for window in windows]
+    list_path = work_dir / 'concat.txt'
+    concat_job = {
+        'name': 'concat',
+        'stage': 'concat',
+        'cmd': build_concat_command(concat_list, list_path, output_path),
+        'before': lambda: write_concat_list(concat_list, list_path),
+    }
+    stages = [window_jobs] if window_jobs else []
+    stages.append([concat_job])
+    return stages
+
+
+def run_job(
+    job: Dict,
+    journal: Optional[RenderJournal] = None,
+    monitor: Optional[RenderMonitor] = None
+) -> str:
+    """
+    Run a single render job. Raises CalledProcessError on failure.
+    Finished jobs are checkpointed in `journal`, and progress and resource
+    usage are reported to `monitor`, if given.
+    """
+    for _, final in job.get('commit', []):
+        final.parent.mkdir(parents=True, exist_ok=True)
+    if 'before' in job:
+        job['before']()
+    
+    def on_progress(block: Dict[str, str]) -> None:
+        if monitor:
+            monitor.job_progress(job, block)
+    
+    if monitor:
+        monitor.job_started(job)
+    start = time.monotonic()
+    feed_cpu = 0.0
+    proc = subprocess.Popen(
+        with_progress(job['cmd']),
+        stdin=subprocess.PIPE if 'feed' in job else None,
+        stdout=subprocess.PIPE
+    )
+    if 'feed' in job:
+        # Frames are produced in Python and piped into the encoder;
+        # progress is read on a separate thread meanwhile
+        reader = threading.Thread(target=read_progress, args=(proc.stdout, on_progress), daemon=True)
+        reader.start()
+        feed_start = time.thread_time()
+        # If ffmpeg exits early (bad arguments, full disk, interrupted), writing
+        # to its stdin breaks; its exit status is reported instead
+        broken_pipe = False
+        try:
+            job['feed'](proc.stdin)
+        except BrokenPipeError:
+            broken_pipe = True
+        finally:
+            feed_cpu = time.thread_time() - feed_start
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                broken_pipe = True
+            reader.join()
+            usage = wait_rusage(proc)
+    else:
+        broken_pipe = False
+        read_progress(proc.stdout, on_progress)
+        usage = wait_rusage(proc)
+    if proc.returncode != 0 or broken_pipe:
+        raise subprocess.CalledProcessError(proc.returncode, job['cmd'])
+    if monitor:
+        monitor.job_finished(job, time.monotonic() - start, usage, feed_cpu)
+    
+    for partial, final in job.get('commit', []):
+        commit(partial, final)
+    if resumable(job, journal):
+        journal.record(job)
+    return job['name']
+
+
+def run_job_stages(
+    stages: List[List[Dict]],
+    workers: int,
+    journal: Optional[RenderJournal] = None,
+    monitor: Optional[RenderMonitor] = None
+) -> None:
+    """
+    Run job stages in order, fanning each stage out over a worker pool.
+    Jobs the journal has verified as finished are skipped.
+    """
+    if journal:
+        assign_keys(stages)
+    stages = [
+        [job for job in stage if not (resumable(job, journal) and journal.is_done(job))]
+        for stage in stages
+    ]
+    stages = [stage for stage in stages if stage]
+    if monitor:
+        for stage in stages:
+            monitor.expect(stage)
+    log = monitor.log if monitor else print
+    
+    # Each job is its own ffmpeg process; threads only wait on them.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for stage in stages:
+            stage_start = time.monotonic()
+            futures = [pool.submit(run_job, job, journal, monitor) for job in stage]
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    name = future.result()
+                    if len(stage) > 1:
+                        log(f"  [{done}/{len(stage)}] {name} done")
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            if monitor:
+                monitor.stage_finished(stage[0].get('stage', 'render'), time.monotonic() - stage_start)
+
+
+def image_state(valid_shots: List[Dict]) -> Dict[str, Tuple[int, int]]:
+    """Modification time and size of every shot image that exists, by shot id."""
+    state = {}
+    for vs in valid_shots:
+        try:
+            stat = vs['image_path'].stat()
+        except FileNotFoundError:
+            continue
+        state[vs['shot_id']] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+def watch_ready(
+    state: Dict[str, Tuple[int, int]],
+    previous: Optional[Dict[str, Tuple[int, int]]],
+    rendered: Dict[str, Tuple[int, int]]
+) -> bool:
+    """
+    Whether watch mode should render after a poll (see `image_state`): no image
+    changed since the previous poll, so none is still being written, and an
+    image appeared, changed or disappeared since the last render.
+    """
+    return state == previous and state != rendered
+
+
+def watch_generations(
+    valid_shots: List[Dict],
+    interval: float,
+    fps: int,
+    width: int,
+    height: int,
+    transition_duration: float,
+    work_dir: Path,
+    cache: RenderCache,
+    input_cache: Optional[RenderCache],
+    source_width: int,
+    source_height: int,
+    engine: str = 'zoompan',
+    ss_factor: int = DEFAULT_SS_FACTOR,
+    codec_args: Optional[List[str]] = None,
+    blur: Optional[Dict] = None,
+    reframe: Optional[Dict] = None,
+    transition: Optional[Dict] = None,
+    workers: int = 1,
+    threads: Optional[int] = None
+) -> None:
+    """
+    Render segments while the images are still being generated: poll the shot
+    images every `interval` seconds and, whenever one appears or changes, render
+    the shot segments and transitions whose images are all there. Returns once
+    every image exists and has been rendered; the cached segments then only
+    need to be stitched.
+
+    An image is picked up once it is unchanged over a poll, so files that are
+    still being written are not read. Segments are cached by image content, so
+    a regenerated image replaces its segments and leaves the others alone.
+    """
+    rendered, previous = {}, None
+    while True:
+        state = image_state(valid_shots)
+        if watch_ready(state, previous, rendered):
+            ready = len(state)
+            print(f"Watch: {ready}/{len(valid_shots)} images, rendering their segments")
+            stages = []
+            if input_cache:
+                prepare_jobs = plan_prepared_inputs(valid_shots, source_width, source_height, input_cache)
+                stages = [prepare_jobs] if prepare_jobs else []
+            plan = plan_segment_render(
+                valid_shots, fps, width, height, transition_duration, work_dir, cache, engine,
+                ss_factor, codec_args, blur, reframe, transition
+            )
+            stages.extend(build_segment_jobs(
+                plan, work_dir / 'watch.mp4', fps, width, height, transition_duration, workers, engine,
+                threads
+            ))
+            # The concat is left to the caller, with the audio and renditions
+            stages = [stage for stage in stages if stage[0]['stage'] != 'concat']
+            run_job_stages(stages, workers)
+            rendered = state
+            if ready == len(valid_shots):
+                return
+            print(f"Watch: {len(valid_shots) - ready} images to go...")
+        previous = state
+        time.sleep(interval)
+
+
+
+
+def print_stage_metrics(metrics: Dict) -> None:
+    """Print wall time, CPU time and peak memory per stage and per effect."""
+    print("Stages:")
+    for stage in metrics['stages']:
+        print(f"  {stage['stage']}: {stage['wall']:.1f}s wall, {stage['cpu']:.1f}s CPU, "
+              f"peak RSS {stage['peak_rss_mb']:.0f} MB ({stage['jobs']} jobs)")
+    if metrics['effects']:
+        print("Effects:")
+        for effect, summary in metrics['effects'].items():
+            fps = summary['frames'] / summary['job_wall'] if summary['job_wall'] else 0.0
+            print(f"  {effect}: {summary['cpu']:.1f}s CPU over {summary['frames']} frames ({fps:.0f} fps per job)")
 
 
 def main():
@@ -555,14 +2068,68 @@ def main():
     parser.add_argument(
         '--fps',
         type=int,
-        default=DEFAULT_FPS,
-        help=f"Frames per second (default: {DEFAULT_FPS})."
+        help=f"Frames per second (default: from --plan, else {DEFAULT_FPS})."
     )
     parser.add_argument(
         '--resolution',
         type=str,
-        default='1920x1080',
-        help="Output resolution (default: 1920x1080)."
+        help="Output resolution (default: from --plan, else 1920x1080)."
+    )
+    parser.add_argument(
+        '--ss-factor',
+        type=int,
+        help="Supersampling factor for the zoompan Ken Burns (1 = off; "
+             f"default: from --plan, else {DEFAULT_SS_FACTOR})."
+    )
+    parser.add_argument(
+        '--preset',
+        choices=X264_PRESETS,
+        help="x264 speed preset for the final encode (default: from --plan, else x264's own). "
+             "Ignored by the macOS VideoToolbox encoder."
+    )
+    parser.add_argument(
+        '--tune-encoder',
+        action='store_true',
+        help="Pick x264 preset, CRF, tune and threads with short probe encodes of a sample "
+             "of this timeline and record the profile in the render plan (final quality only). "
+             "--plan reuses a recorded profile unless --preset is given."
+    )
+    parser.add_argument(
+        '--encode-budget',
+        type=float,
+        metavar='SECONDS',
+        help="Encoder tuning: wall-clock budget for encoding the whole video; picks the "
+             "slowest preset that fits (implies --tune-encoder, default: the medium preset)."
+    )
+    parser.add_argument(
+        '--target-ssim',
+        type=float,
+        help="Encoder tuning: quality target; picks the highest CRF whose SSIM against the "
+             f"lossless sample reaches it (implies --tune-encoder, default: {DEFAULT_TARGET_SSIM})."
+    )
+    parser.add_argument(
+        '--quality',
+        choices=QUALITY_TIERS,
+        default='final',
+        help=f"'draft' renders a fast review copy of the same plan: {DRAFT_HEIGHT}p, at most "
+             f"{DRAFT_MAX_FPS} fps, no supersampling, box blurs, x264 {DRAFT_PRESET}. "
+             "The output name gets a '_draft' suffix (default: final)."
+    )
+    parser.add_argument(
+        '--reframe',
+        type=str,
+        metavar='WxH',
+        help="Render a cut with another aspect ratio from the same plan, e.g. 1080x1920 for "
+             "9:16 shorts. Ken Burns moves become crop paths over the landscape render's "
+             "pre-scaled inputs. The output name gets a '_WxH' suffix."
+    )
+    parser.add_argument(
+        '--rendition',
+        action='append',
+        default=[],
+        metavar='WxH[:BITRATE[:PRESET]]',
+        help="Also write this rendition (e.g. 1280x720:3M) from the same composed video, "
+             "as <output>_<H>p.mp4. Repeat for several renditions."
     )
     parser.add_argument(
         '--audio',
@@ -572,17 +2139,188 @@ def main():
     parser.add_argument(
         '--dry-run',
         action='store_true',
-        help="Print FFmpeg command without executing."
+        help="Print FFmpeg command without executing. The render plan and "
+             "filter scripts are still written so they can be inspected."
+    )
+    parser.add_argument(
+        '--plan',
+        type=str,
+        help=f"Reuse a render plan from an earlier run (e.g. render/{RENDER_PLAN_NAME}): "
+             "its seed, settings, shot durations and effects. Explicit flags still win."
+    )
+    parser.add_argument(
+        '--mode',
+        choices=RENDER_MODES,
+        default='graph',
+        help="Render mode: 'graph' builds one filter graph for the whole video, "
+             "'segments' renders every shot and transition as a separate job, "
+             "'windowed' renders the graph a few shots at a time, 'chunked' renders "
+             "windows of balanced duration as closed-GOP chunks (default: graph)."
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of parallel ffmpeg jobs in segments/windowed/chunked mode (default: CPU count)."
+    )
+    parser.add_argument(
+        '--window-size',
+        type=int,
+        default=DEFAULT_WINDOW_SIZE,
+        help=f"Windowed mode: shots per window; bounds memory per ffmpeg process. Chunked "
+             f"mode: most shots per chunk (default: {DEFAULT_WINDOW_SIZE})."
+    )
+    parser.add_argument(
+        '--chunk-seconds',
+        type=float,
+        help="Chunked mode: target chunk duration, cut at the next shot boundary (default: "
+             f"the video split into {CHUNKS_PER_WORKER} chunks per worker, at least {MIN_CHUNK_SECONDS:g}s)."
+    )
+    parser.add_argument(
+        '--engine',
+        choices=MOTION_ENGINES,
+        default='zoompan',
+        help="Ken Burns motion engine: ffmpeg 'zoompan' on a supersampled input, or 'numpy' "
+             "sub-pixel resampling piped into the encoder (segments mode only, default: zoompan)."
+    )
+    parser.add_argument(
+        '--no-motion',
+        action='store_true',
+        help="Hold every shot still instead of applying Ken Burns effects. Single shots "
+             "can opt out with \"motion\": \"none\" in the shot list (e.g. title cards)."
+    )
+    parser.add_argument(
+        '--transition',
+        choices=TRANSITIONS,
+        help="Transition between shots: 'fade' cross-fades, 'noise' is a cloudy dissolve, "
+             "the others are wipes and an iris. Mask transitions need NumPy (default: the "
+             "plan's transition, else fade)."
+    )
+    parser.add_argument(
+        '--optimize-graph',
+        action='store_true',
+        help="Graph mode: run the filter-graph optimizer (drop no-ops, merge blurs, "
+             "downscale before transitions, no supersampling for still clips)."
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help="Random seed for Ken Burns effect choices. Reuse it to get the same effects "
+             "(and segment cache hits) on the next run (default: random)."
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Segments/windowed mode: continue an interrupted render. Segments recorded "
+             f"in render/{JOURNAL_NAME} are verified by hash and not rendered again."
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Don't reuse pre-scaled inputs or previously rendered segments."
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help="Segments mode: render shot segments as their images land in generations/ "
+             "(e.g. while generate_scenario_images.py runs) and stitch the video once all are there."
+    )
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        help=f"Watch mode: seconds between polls of generations/ (default: {DEFAULT_WATCH_INTERVAL:g})."
     )
     
     args = parser.parse_args()
     
+    if args.workers < 1:
+        print(f"Error: --workers must be at least 1")
+        sys.exit(1)
+    if args.window_size < 1:
+        print(f"Error: --window-size must be at least 1")
+        sys.exit(1)
+    if args.chunk_seconds is not None and args.chunk_seconds <= 0:
+        print(f"Error: --chunk-seconds must be positive")
+        sys.exit(1)
+    
+    if args.resume and args.mode == 'graph':
+        print("Error: --resume needs --mode segments, windowed or chunked (graph mode has no checkpoints)")
+        sys.exit(1)
+    
+    if args.watch:
+        if args.mode != 'segments':
+            print("Error: --watch requires --mode segments")
+            sys.exit(1)
+        if args.no_cache or args.dry_run or args.resume:
+            print("Error: --watch can't be combined with --no-cache, --dry-run or --resume")
+            sys.exit(1)
+        if args.tune_encoder or args.encode_budget or args.target_ssim:
+            print("Error: --watch can't tune the encoder before the images exist")
+            sys.exit(1)
+        if args.watch_interval <= 0:
+            print(f"Error: --watch-interval must be positive")
+            sys.exit(1)
+    
+    if args.engine == 'numpy':
+        if args.mode != 'segments':
+            print("Error: --engine numpy requires --mode segments")
+            sys.exit(1)
+        try:
+            import lib.ken_burns_numpy  # noqa: F401
+        except ImportError as e:
+            print(f"Error: The numpy engine needs NumPy and Pillow: {e}")
+            sys.exit(1)
+    
+    # Load a previous render plan to repeat its decisions
+    reused_plan = None
+    if args.plan:
+        try:
+            reused_plan = load_plan(Path(args.plan).resolve())
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not load render plan: {e}")
+            sys.exit(1)
+    plan_settings = reused_plan['settings'] if reused_plan else {}
+    
     # Parse resolution
-    try:
-        width, height = map(int, args.resolution.split('x'))
-    except ValueError:
-        print(f"Error: Invalid resolution format: {args.resolution}")
+    fps = args.fps or plan_settings.get('fps', DEFAULT_FPS)
+    if args.resolution:
+        try:
+            width, height = map(int, args.resolution.split('x'))
+        except ValueError:
+            print(f"Error: Invalid resolution format: {args.resolution}")
+            sys.exit(1)
+    else:
+        width = plan_settings.get('width', DEFAULT_OUTPUT_RES[0])
+        height = plan_settings.get('height', DEFAULT_OUTPUT_RES[1])
+    transition_duration = plan_settings.get('transition_duration', DEFAULT_TRANSITION_DURATION)
+    ss_factor = args.ss_factor or plan_settings.get('ss_factor', DEFAULT_SS_FACTOR)
+    if ss_factor < 1:
+        print(f"Error: --ss-factor must be at least 1")
         sys.exit(1)
+    preset = args.preset or plan_settings.get('preset')
+    codec_args = output_codec_args(preset)
+    transition_type = args.transition or DEFAULT_TRANSITION
+    if not args.transition and reused_plan and reused_plan['transitions']:
+        transition_type = reused_plan['transitions'][0]['type']
+    if transition_type != DEFAULT_TRANSITION:
+        try:
+            import lib.transition_textures  # noqa: F401
+        except ImportError as e:
+            print(f"Error: The {transition_type} transition needs NumPy: {e}")
+            sys.exit(1)
+    if args.reframe:
+        try:
+            reframe_width, reframe_height = map(int, args.reframe.split('x'))
+        except ValueError:
+            print(f"Error: Invalid --reframe format: {args.reframe}")
+            sys.exit(1)
+        if reframe_width % 2 or reframe_height % 2:
+            print(f"Error: --reframe width and height must be even")
+            sys.exit(1)
+        if args.quality == 'draft' or args.engine == 'numpy':
+            print("Error: --reframe can't be combined with --quality draft or --engine numpy")
+            sys.exit(1)
     
     # Load scenario
     scenario_file = Path(args.scenario_path).resolve()
@@ -594,6 +2332,16 @@ def main():
     
     print(f"Processing {len(shots)} shots...")
     
+    # Seed effect choices so runs are reproducible
+    if args.seed is not None:
+        seed = args.seed
+    elif reused_plan:
+        seed = reused_plan['seed']
+    else:
+        seed = random.randrange(2**31)
+    random.seed(seed)
+    print(f"Seed: {seed}")
+    
     # Set up paths
     scenario_dir = scenario_file.parent
     generations_dir = scenario_dir / 'generations'
@@ -611,56 +2359,381 @@ def main():
             print(f"Error: Audio file not found: {audio_path}")
             sys.exit(1)
             
-    # Build command
-    cmd, num_valid_shots, total_duration = build_ffmpeg_command(
-        shots,
-        generations_dir,
-        output_path,
-        args.fps,
-        width,
-        height,
-        DEFAULT_TRANSITION_DURATION
-    )
-    
-    # Add audio input if provided
-    if audio_path:
-        # Append audio input. It will be the last input index.
-        # build_ffmpeg_command adds inputs for each shot (0 to num_valid_shots-1)
-        audio_input_index = num_valid_shots 
-        
-        # Insert audio input before filter complex
+    # Watch mode plans the whole timeline up front and waits for the missing images
+    valid_shots = collect_valid_shots(shots, generations_dir, include_missing=args.watch)
+    num_valid_shots = len(valid_shots)
+    if args.watch:
+        print(f"Found {len(image_state(valid_shots))} of {num_valid_shots} images")
+    else:
+        print(f"Found {num_valid_shots} valid images")
+    if reused_plan:
+        apply_render_plan(reused_plan, valid_shots)
+    choose_effects(valid_shots, motion=not args.no_motion)
+    
+    # Compile the decisions into a plan file; diff it against the last run's
+    render_dir = scenario_dir / RENDER_DIR_NAME
+    plan_path = render_dir / RENDER_PLAN_NAME
+    
+    # Encoder profile: tuned with probe encodes of a sample of this timeline,
+    # or reused from --plan. Drafts keep their fixed fast settings.
+    encoder = None
+    if args.quality == 'final' and (args.tune_encoder or args.encode_budget or args.target_ssim):
+        if 'libx264' not in codec_args:
+            print("Encoder tuning: only libx264 can be tuned, keeping the default settings")
+        elif args.dry_run:
+            print("Encoder tuning: skipped in a dry run")
+        else:
+            tuning_dir = render_dir / TUNING_DIR_NAME
+            # Probe what the render encodes: the same pre-scaled inputs, reframed
+            # the same way (see the reframe and pre-scaled input steps below)
+            sample_width, sample_height, sample_reframe = width, height, None
+            if args.reframe:
+                sample_width, sample_height = reframe_width, reframe_height
+                sample_reframe = {'source': [width * ss_factor, height * ss_factor]}
+            sample_inputs = []
+            if not args.no_cache and args.engine == 'zoompan':
+                sample_inputs = plan_prepared_inputs(
+                    tuning_sample_shots(valid_shots),
+                    width * ss_factor,
+                    height * ss_factor,
+                    RenderCache(render_dir / INPUTS_DIR_NAME)
+                )
+            sample = plan_tuning_sample(
+                valid_shots, fps, sample_width, sample_height, transition_duration, ss_factor, tuning_dir,
+                sample_reframe
+            )
+            sample_frames = window_frame_count(sample, fps, transition_duration)
+            total_frames = int((sum(vs['duration'] for vs in valid_shots) + transition_duration) * fps)
+            print(f"Encoder tuning: {sample_frames / fps:.1f}s sample, "
+                  f"budget {f'{args.encode_budget:.0f}s' if args.encode_budget else 'none'}, "
+                  f"target SSIM {args.target_ssim or DEFAULT_TARGET_SSIM}")
+            # Segments, windows and chunks are encoded concurrently and share the cores
+            encoder_cores = os.cpu_count() or 1
+            if args.mode != 'graph':
+                encoder_cores = max(1, encoder_cores // args.workers)
+            try:
+                run_job_stages([sample_inputs, [{
+                    'name': sample['name'],
+                    'stage': 'tuning',
+                    'cmd': build_window_command(
+                        sample, num_valid_shots, fps, sample_width, sample_height, transition_duration,
+                        os.cpu_count() or 1
+                    ),
+                    'commit': [(partial_path(sample['output']), sample['output'])],
+                }]], 1)
+                probe = EncoderProbe(sample['output'], sample_frames, fps, total_frames, tuning_dir)
+                encoder = tune_encoder(
+                    probe, args.encode_budget, args.target_ssim or DEFAULT_TARGET_SSIM,
+                    encoder_cores, args.preset
+                )
+            except subprocess.CalledProcessError as e:
+                print(f"Error: Encoder tuning failed with ffmpeg error code {e.returncode}")
+                sys.exit(1)
+            print(f"Encoder profile: {encoder['preset']} crf {encoder['crf']}"
+                  f"{f' tune ' + encoder['tune'] if encoder['tune'] else ''}, {encoder['kbps']:.0f} kb/s, "
+                  f"SSIM {encoder['ssim']:.4f}, about {encoder['predicted_encode']:.0f}s to encode")
+            if not encoder['budget_met']:
+                print("Warning: Even the fastest preset is predicted to exceed the encode budget")
+            if not encoder['target_met']:
+                print(f"Warning: No probed CRF reaches SSIM {encoder['target_ssim']}")
+            print(f"Encoder probes: {save_profile(encoder, probe, render_dir / ENCODER_PROFILE_NAME)}")
+    elif not args.preset:
+        # Kept in a draft's plan too, for the final render from that plan
+        encoder = plan_settings.get('encoder')
+        if encoder and encoder.get('version') != PROFILE_VERSION:
+            print("Encoder profile: recorded by an older version, keeping the default settings")
+            encoder = None
+    encoder_threads = None
+    if encoder:
+        codec_args = encoder['codec_args']
+        encoder_threads = encoder['threads']
+    
+    render_plan = compile_render_plan(
+        valid_shots, seed, fps, width, height, transition_duration, ss_factor, preset, transition_type,
+        encoder
+    )
+    if plan_path.exists():
         try:
-            fc_index = cmd.index('-filter_complex')
-            cmd.insert(fc_index, str(audio_path))
-            cmd.insert(fc_index, '-i')
-        except ValueError:
-            print("Error: Could not find positions to insert audio input.")
+            changes = diff_plans(load_plan(plan_path), render_plan)
+        except (OSError, ValueError):
+            changes = ["previous plan unreadable"]
+        print(f"Render plan: {len(changes)} changes since the last run")
+        for change in changes:
+            print(f"  {change}")
+    save_plan(render_plan, plan_path)
+    print(f"Render plan: {plan_path}")
+    
+    # A draft renders the plan above with cheaper settings; the timeline and
+    # effects are the same, so the final render can reuse the plan file
+    blur = DEFAULT_BLUR
+    if args.quality == 'draft':
+        draft = draft_settings(width, height, fps)
+        width, height, fps = draft['width'], draft['height'], draft['fps']
+        ss_factor, blur = draft['ss_factor'], draft['blur']
+        codec_args = output_codec_args(draft['preset'])
+        encoder_threads = None
+        output_path = output_path.with_name(f"{output_path.stem}_draft{output_path.suffix}")
+        print(f"Draft: {width}x{height} @ {fps} fps, no supersampling, box blur, {draft['preset']}")
+        print(f"Render the final cut with: --plan {plan_path}")
+        if args.rendition:
+            print("Draft: --rendition ignored")
+        if args.tune_encoder or args.encode_budget or args.target_ssim:
+            print("Draft: encoder tuning ignored")
+    
+    # A reframed cut reads the same supersampled inputs as the landscape render
+    source_width, source_height = width * ss_factor, height * ss_factor
+    reframe = None
+    if args.reframe:
+        width, height = reframe_width, reframe_height
+        reframe = {'source': [source_width, source_height]}
+        output_path = output_path.with_name(f"{output_path.stem}_{width}x{height}{output_path.suffix}")
+        work_width, work_height = clip_geometry(width, height, ss_factor, reframe)['work']
+        print(f"Reframe: {width}x{height}, crop paths over {source_width}x{source_height} "
+              f"inputs, rendered at {work_width}x{work_height}")
+    
+    renditions = []
+    if args.quality == 'final':
+        try:
+            renditions = [parse_rendition(spec, output_path, codec_args) for spec in args.rendition]
+        except ValueError as e:
+            print(f"Error: {e}")
             sys.exit(1)
-            
-        # Map audio stream
-        output_file = cmd.pop() # Remove output filename
-        
-        cmd.extend(['-map', f'{audio_input_index}:a'])
-        cmd.extend(['-t', str(total_duration)])
+        for rendition in renditions:
+            print(f"Rendition: {rendition['width']}x{rendition['height']} -> {rendition['output'].name}")
+    
+    # Mask transitions share one mask clip at the output size, generated once
+    # per transition type and size
+    transition = None
+    if transition_type != DEFAULT_TRANSITION:
+        from lib.transition_textures import transition_mask
+        mask_cache = None if args.no_cache else RenderCache(render_dir / INPUTS_DIR_NAME)
+        mask = transition_mask(
+            transition_type, width, height, int(round(transition_duration * fps)), fps,
+            render_dir, mask_cache
+        )
+        transition = {'type': transition_type, 'mask': mask}
+        print(f"Transition: {transition_type} ({mask_cache.report() if mask_cache else mask.name})")
+    
+    # Render segments as the images are generated; the timeline below then
+    # finds them all in the cache
+    if args.watch:
+        print(f"Watch: polling {generations_dir} every {args.watch_interval:g}s")
+        try:
+            watch_generations(
+                valid_shots,
+                args.watch_interval,
+                fps,
+                width,
+                height,
+                transition_duration,
+                render_dir / SEGMENTS_DIR_NAME,
+                RenderCache(render_dir / CACHE_DIR_NAME),
+                RenderCache(render_dir / INPUTS_DIR_NAME) if args.engine == 'zoompan' else None,
+                source_width,
+                source_height,
+                args.engine,
+                ss_factor,
+                codec_args,
+                blur,
+                reframe,
+                transition,
+                args.workers,
+                encoder_threads
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"Error: Watch render failed with ffmpeg error code {e.returncode}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            print("\nWatch: stopped; rendered segments stay cached")
+            sys.exit(1)
+        # The plan was written before the images were all there
+        for entry, vs in zip(render_plan['shots'], valid_shots):
+            entry['image_sha256'] = hash_file(vs['image_path'])
+        save_plan(render_plan, plan_path)
+    
+    # Convert every image once into a cached, supersampled render input
+    # (the numpy engine decodes the images itself)
+    prepare_jobs = []
+    if not args.no_cache and args.engine == 'zoompan':
+        input_cache = RenderCache(render_dir / INPUTS_DIR_NAME)
+        prepare_jobs = plan_prepared_inputs(
+            valid_shots,
+            source_width,
+            source_height,
+            input_cache
+        )
+        print(f"Pre-scaled inputs: {input_cache.report()}")
+    
+    # The soundtrack is encoded once (and cached by its hash); the video is
+    # rendered without audio into the render directory and the final outputs
+    # are muxed from both with a stream copy
+    audio_track = None
+    video_output, video_renditions = output_path, renditions
+    if audio_path:
+        audio_cache = None if args.no_cache else RenderCache(render_dir / INPUTS_DIR_NAME)
+        audio_track, audio_job = plan_audio_track(audio_path, render_dir, audio_cache)
+        if audio_job:
+            prepare_jobs.append(audio_job)
+        if audio_cache:
+            print(f"Audio track: {audio_cache.report()}")
+        video_output = render_dir / f"{output_path.stem}_video{output_path.suffix}"
+        video_renditions = [
+            dict(r, output=render_dir / f"{r['output'].stem}_video{r['output'].suffix}")
+            for r in renditions
+        ]
+    
+    work_dir = render_dir / SEGMENTS_DIR_NAME
+    cache = None
+    if not args.no_cache:
+        cache = RenderCache(render_dir / CACHE_DIR_NAME)
+    
+    if args.mode in ('windowed', 'chunked'):
+        total_duration = sum(s['duration'] for s in valid_shots) + transition_duration
+        cuts = None
+        window_codec_args = codec_args
+        if args.mode == 'chunked':
+            chunk_seconds = args.chunk_seconds or max(
+                MIN_CHUNK_SECONDS, total_duration / (args.workers * CHUNKS_PER_WORKER)
+            )
+            cuts = chunk_cuts(valid_shots, chunk_seconds, args.window_size)
+            window_codec_args = codec_args + CLOSED_GOP_ARGS
+        windows = plan_windows(
+            valid_shots,
+            args.window_size,
+            fps,
+            width,
+            height,
+            transition_duration,
+            work_dir,
+            cache,
+            ss_factor,
+            window_codec_args,
+            blur,
+            reframe,
+            transition,
+            cuts
+        )
+        if cuts:
+            print(f"Chunks: {len(windows)} of about {chunk_seconds:.1f}s, closed GOP")
+        else:
+            print(f"Windows: {len(windows)} of up to {args.window_size} shots")
+        if cache:
+            print(f"Window cache: {cache.report()}")
+        stages = build_window_jobs(
+            windows,
+            num_valid_shots,
+            work_dir,
+            video_output,
+            fps,
+            width,
+            height,
+            transition_duration,
+            args.workers,
+            encoder_threads
+        )
+    elif args.mode == 'segments':
+        total_duration = sum(s['duration'] for s in valid_shots) + transition_duration
         
-        # Add output filename back
-        cmd.append(output_file)
+        plan = plan_segment_render(
+            valid_shots,
+            fps,
+            width,
+            height,
+            transition_duration,
+            work_dir,
+            cache,
+            args.engine,
+            ss_factor,
+            codec_args,
+            blur,
+            reframe,
+            transition
+        )
+        if cache:
+            print(f"Segment cache: {cache.report()}")
+        stages = build_segment_jobs(
+            plan,
+            video_output,
+            fps,
+            width,
+            height,
+            transition_duration,
+            args.workers,
+            args.engine,
+            encoder_threads
+        )
+    else:
+        # Build command
+        cmd, num_valid_shots, total_duration = build_ffmpeg_command(
+            shots,
+            generations_dir,
+            video_output,
+            fps,
+            width,
+            height,
+            transition_duration,
+            valid_shots,
+            args.optimize_graph,
+            render_dir / FILTER_SCRIPT_NAME,
+            ss_factor,
+            codec_args,
+            blur,
+            video_renditions,
+            reframe,
+            transition,
+            encoder_threads
+        )
         
+        stages = [[{
+            'name': 'render',
+            'stage': 'render',
+            'cmd': cmd,
+            'frames': int(total_duration * fps),
+            'shots': job_timeline(
+                [vs['duration'] for vs in valid_shots], [vs['shot_id'] for vs in valid_shots], fps
+            ),
+        }]]
+    
+    if renditions and args.mode != 'graph':
+        # The assembled video is stream-copied; the renditions decode it once more
+        stages.append([build_renditions_job(video_output, video_renditions, int(total_duration * fps))])
+    
+    if audio_path:
         print(f"Adding audio track: {audio_path}")
         print(f"Total video duration: {total_duration:.2f}s")
+        videos = [video_output] + [r['output'] for r in video_renditions]
+        finals = [output_path] + [r['output'] for r in renditions]
+        stages.append([
+            build_mux_job(video, audio_track, final, total_duration)
+            for video, final in zip(videos, finals)
+        ])
+    
+    if prepare_jobs:
+        stages.insert(0, prepare_jobs)
+    workers = args.workers
     
     # Print or execute
     if args.dry_run:
         print("\n" + "="*60)
         print("DRY RUN - FFmpeg command:")
         print("="*60)
-        print(' '.join(cmd))
+        for stage in stages:
+            for job in stage:
+                if 'feed' in job:
+                    print(f"# {job['name']}: frames piped from the {args.engine} engine")
+                print(' '.join(job['cmd']))
         print("="*60)
     else:
         print(f"\n{'='*60}")
         print(f"Generating video: {output_path}")
-        print(f"Resolution: {width}x{height} @ {args.fps} fps")
+        print(f"Resolution: {width}x{height} @ {fps} fps")
         print(f"Shots: {num_valid_shots}")
+        if args.mode == 'segments':
+            print(f"Mode: segments ({workers} workers, {args.engine} engine)")
+        elif args.mode == 'windowed':
+            print(f"Mode: windowed ({args.window_size} shots per window, {workers} workers)")
+        elif args.mode == 'chunked':
+            print(f"Mode: chunked ({len(windows)} chunks, {workers} workers)")
         if audio_path:
             print(f"Audio: {audio_path.name}")
             print(f"Duration: {total_duration:.2f}s")
@@ -669,8 +2742,32 @@ def main():
         
         start_time = time.time()
         
+        journal = None
+        if args.mode != 'graph':
+            work_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Checkpoint finished segments so an interrupted render can be resumed
+            journal = RenderJournal(render_dir / JOURNAL_NAME)
+            header = {
+                # Images are left out: a replaced image changes the keys of the jobs reading it
+                'plan': hash_params(without_image_hashes(render_plan)),
+                'mode': args.mode,
+                'engine': args.engine,
+                'window_size': args.window_size if args.mode == 'windowed' else None,
+                'cuts': cuts if args.mode == 'chunked' else None,
+                'cache': not args.no_cache,
+                'quality': args.quality,
+                'reframe': reframe,
+            }
+            if journal.start(header, args.resume):
+                print(f"Resuming from {journal.path} ({len(journal.done)} jobs checkpointed)")
+            elif args.resume:
+                print("No checkpoints for this render plan, starting from scratch")
+        
+        monitor = RenderMonitor(fps)
         try:
-            subprocess.run(cmd, check=True)
+            run_job_stages(stages, workers, journal, monitor)
+            monitor.done()
             end_time = time.time()
             elapsed_time = end_time - start_time
             
@@ -685,17 +2782,29 @@ def main():
             print(f"\n{'='*60}")
             print(f"✓ Video generated successfully!")
             print(f"Output: {output_path}")
+            for rendition in renditions:
+                print(f"Rendition: {rendition['output']}")
             print(f"Video Duration: {duration_minutes:02d}:{duration_seconds:02d}")
             print(f"Generation Time: {elapsed_minutes:02d}:{elapsed_seconds:02d}")
+            if journal and journal.resumed:
+                print(f"Resumed: {journal.resumed} jobs verified from checkpoints")
+            print_stage_metrics(monitor.metrics())
+            print(f"Metrics: {monitor.write(render_dir / METRICS_NAME)}")
             print(f"{'='*60}")
                     
         except subprocess.CalledProcessError as e:
+            monitor.done()
             print(f"\n{'='*60}")
             print(f"✗ FFmpeg failed with error code {e.returncode}")
+            if journal:
+                print("Finished segments are checkpointed; rerun with --resume to continue.")
             print(f"{'='*60}")
             sys.exit(1)
         except KeyboardInterrupt:
+            monitor.done()
             print(f"\n\n✗ Cancelled by user")
+            if journal:
+                print("Finished segments are checkpointed; rerun with --resume to continue.")
             sys.exit(130)
 
 if __name__ == '__main__':
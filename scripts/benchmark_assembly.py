@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Rendering benchmark for assemble_video.py.
+
+Generates a synthetic scenario offline (procedural PNGs made by FFmpeg's lavfi
+sources plus a shot_list.json), renders it across a matrix of shot counts,
+resolutions, frame rates, supersampling factors, encoder presets and render
+modes, and records wall time, frames/s, CPU time and peak memory of every run
+in a JSON results file. Pass an earlier results file with --compare to check
+for regressions.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add project root to path to import lib
+# Assuming this script is in [Root]/scripts/
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root / "src"))
+
+from lib.render_metrics import wait_rusage
+
+ASSEMBLE_SCRIPT = project_root / 'scripts' / 'assemble_video.py'
+
+DEFAULT_WORK_DIR = Path(tempfile.gettempdir()) / 'novaclips_benchmark'
+DEFAULT_IMAGE_SIZE = '1920x1080'
+RESULTS_VERSION = 1
+
+# Benchmark matrix axes: (CLI flag, result key, parser)
+MATRIX_AXES = [
+    ('--shots', 'shots', int),
+    ('--resolutions', 'resolution', str),
+    ('--fps', 'fps', int),
+    ('--ss-factors', 'ss_factor', int),
+    ('--presets', 'preset', str),
+    ('--modes', 'mode', str),
+]
+
+
+def parse_list(value: str, cast=str) -> List:
+    """Parse a comma-separated CLI list."""
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def format_timing(start: float, end: float) -> str:
+    """Format a shot's start/end seconds like the shot lists do ('00:00:00 - 00:00:06')."""
+    def hms(seconds: float) -> str:
+        seconds = int(round(seconds))
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{hms(start)} - {hms(end)}"
+
+
+def generate_scenario(scenario_dir: Path, num_shots: int, durations: List[int], image_size: str) -> Path:
+    """
+    Create `num_shots` procedural images (colour gradients, a grid and grain, so
+    both flat areas and hard edges are encoded) and a matching shot_list.json.
+    Images that already exist are reused. Returns the shot list path.
+    """
+    generations_dir = scenario_dir / 'generations'
+    generations_dir.mkdir(parents=True, exist_ok=True)
+
+    shots = []
+    start = 0
+    for i in range(num_shots):
+        shot_id = str(i + 1).zfill(2)
+        image_path = generations_dir / f"shot_{shot_id}.png"
+        if not image_path.exists():
+            subprocess.run([
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', f"gradients=s={image_size}:seed={i + 1}:n=5:speed=0",
+                '-vf', "drawgrid=w=iw/12:h=ih/8:t=3:c=white@0.35,noise=alls=20:allf=u,format=rgb24",
+                '-frames:v', '1', str(image_path)
+            ], check=True)
+
+        duration = durations[i % len(durations)]
+        shots.append({
+            'scene': str(i + 1),
+            'timing': format_timing(start, start + duration),
+            'subtitles': f"Synthetic shot {i + 1}",
+            'image_prompt': 'procedural benchmark image',
+        })
+        start += duration
+
+    shot_list = scenario_dir / 'shot_list.json'
+    with open(shot_list, 'w', encoding='utf-8') as f:
+        json.dump(shots, f, indent=2)
+    return shot_list
+
+
+def run_config(shot_list: Path, config: Dict, workers: int, use_cache: bool, log_path: Path) -> Dict:
+    """Render one benchmark configuration and measure it."""
+    output_path = shot_list.parent / 'benchmark_output.mp4'
+    cmd = [
+        sys.executable, str(ASSEMBLE_SCRIPT), str(shot_list),
+        '--limit', str(config['shots']),
+        '--resolution', config['resolution'],
+        '--fps', str(config['fps']),
+        '--ss-factor', str(config['ss_factor']),
+        '--preset', config['preset'],
+        '--mode', config['mode'],
+        '--workers', str(workers),
+        '--seed', '1',
+        '--output', output_path.name,
+    ]
+    if not use_cache:
+        cmd.append('--no-cache')
+
+    start = time.monotonic()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        # Includes the ffmpeg processes the assembler reaped
+        usage = wait_rusage(proc) or {}
+    wall = time.monotonic() - start
+
+    result = {'returncode': proc.returncode, 'wall': wall}
+    if proc.returncode != 0:
+        return result
+
+    metrics_path = shot_list.parent / 'render' / 'metrics.json'
+    with open(metrics_path, 'r', encoding='utf-8') as f:
+        metrics = json.load(f)
+    total = metrics['total']
+    result.update({
+        'frames': total['frames'],
+        'fps': total['frames'] / wall if wall else 0.0,
+        'cpu': usage.get('cpu_user', 0) + usage.get('cpu_system', 0),
+        'peak_rss_mb': max(total['peak_rss_mb'], usage.get('peak_rss_mb', 0)),
+        'stages': {stage['stage']: stage['wall'] for stage in metrics['stages']},
+    })
+    return result
+
+
+def summarize_runs(runs: List[Dict]) -> Dict:
+    """Median over the repeated runs of one configuration."""
+    ok = [run for run in runs if run['returncode'] == 0]
+    if not ok:
+        return {'failed': True, 'returncode': runs[-1]['returncode']}
+    median_run = sorted(ok, key=lambda run: run['wall'])[len(ok) // 2]
+    return {
+        'wall': statistics.median(run['wall'] for run in ok),
+        'wall_runs': [run['wall'] for run in ok],
+        'frames': median_run['frames'],
+        'fps': statistics.median(run['fps'] for run in ok),
+        'cpu': statistics.median(run['cpu'] for run in ok),
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in ok),
+        'stages': median_run['stages'],
+    }
+
+
+def config_key(config: Dict) -> str:
+    return ','.join(f"{key}={config[key]}" for _, key, _ in MATRIX_AXES)
+
+
+def describe_environment() -> Dict:
+    """Machine and tool versions, so results from different boxes aren't mixed up."""
+    def first_line(cmd: List[str]) -> Optional[str]:
+        try:
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return out.splitlines()[0] if out else None
+
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': first_line(['ffmpeg', '-version']),
+        'git_commit': first_line(['git', '-C', str(project_root), 'rev-parse', '--short', 'HEAD']),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare_results(results: List[Dict], baseline_path: Path, tolerance: float) -> int:
+    """Print the change against a baseline results file; return the number of regressions."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {config_key(r['config']): r for r in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    for result in results:
+        key = config_key(result['config'])
+        before = baseline.get(key)
+        if before is None or before.get('failed') or result.get('failed'):
+            continue
+        change = result['wall'] / before['wall'] - 1
+        rss_change = result['peak_rss_mb'] / before['peak_rss_mb'] - 1 if before['peak_rss_mb'] else 0.0
+        flag = ''
+        if change > tolerance or rss_change > tolerance:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"  {key}: wall {change:+.1%}, peak RSS {rss_change:+.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark assemble_video.py on synthetic scenarios."
+    )
+    parser.add_argument('--shots', default='4,12', help="Shot counts (default: 4,12).")
+    parser.add_argument('--resolutions', default='1280x720', help="Output resolutions (default: 1280x720).")
+    parser.add_argument('--fps', default='24', help="Frame rates (default: 24).")
+    parser.add_argument('--ss-factors', default='1,2', help="Supersampling factors (default: 1,2).")
+    parser.add_argument('--presets', default='medium', help="x264 presets (default: medium).")
+    parser.add_argument('--modes', default='graph', help="Render modes (default: graph).")
+    parser.add_argument(
+        '--durations',
+        default='4,6',
+        help="Shot durations in seconds, cycled over the shots (default: 4,6)."
+    )
+    parser.add_argument(
+        '--image-size',
+        default=DEFAULT_IMAGE_SIZE,
+        help=f"Size of the generated images (default: {DEFAULT_IMAGE_SIZE})."
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help="--workers passed to the assembler (default: CPU count)."
+    )
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per configuration; the median is kept (default: 1).")
+    parser.add_argument(
+        '--use-cache',
+        action='store_true',
+        help="Let the assembler reuse cached inputs/segments between runs (default: every run renders from scratch)."
+    )
+    parser.add_argument(
+        '--work-dir',
+        type=str,
+        default=str(DEFAULT_WORK_DIR),
+        help=f"Where the synthetic scenario and logs go (default: {DEFAULT_WORK_DIR})."
+    )
+    parser.add_argument(
+        '--results',
+        type=str,
+        help="Results file (default: <work-dir>/benchmark_results.json)."
+    )
+    parser.add_argument('--compare', type=str, help="Earlier results file to compare against.")
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.10,
+        help="Slowdown/memory growth counted as a regression with --compare (default: 0.10)."
+    )
+
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        print("Error: --repeat must be at least 1")
+        sys.exit(1)
+
+    try:
+        axes = [parse_list(getattr(args, flag[2:].replace('-', '_')), cast) for flag, _, cast in MATRIX_AXES]
+        durations = parse_list(args.durations, int)
+    except ValueError as e:
+        print(f"Error: Invalid list value: {e}")
+        sys.exit(1)
+
+    work_dir = Path(args.work_dir).resolve()
+    results_path = Path(args.results).resolve() if args.results else work_dir / 'benchmark_results.json'
+    logs_dir = work_dir / 'logs'
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    # One scenario with the largest shot count; smaller counts use --limit
+    print(f"Generating synthetic scenario ({max(axes[0])} shots, {args.image_size})...")
+    shot_list = generate_scenario(work_dir / 'scenario', max(axes[0]), durations, args.image_size)
+
+    configs = [
+        {key: value for (_, key, _), value in zip(MATRIX_AXES, combo)}
+        for combo in itertools.product(*axes)
+    ]
+    print(f"Running {len(configs)} configurations x {args.repeat}\n")
+
+    results = []
+    for n, config in enumerate(configs, start=1):
+        key = config_key(config)
+        runs = []
+        for r in range(args.repeat):
+            log_path = logs_dir / f"run_{n:03d}_{r + 1}.log"
+            runs.append(run_config(shot_list, config, args.workers, args.use_cache, log_path))
+        summary = summarize_runs(runs)
+        results.append({'config': config, **summary})
+
+        if summary.get('failed'):
+            print(f"[{n}/{len(configs)}] {key}: FAILED (exit {summary['returncode']}, see {log_path})")
+        else:
+            print(f"[{n}/{len(configs)}] {key}: {summary['wall']:.2f}s, "
+                  f"{summary['fps']:.1f} fps, {summary['cpu']:.1f}s CPU, "
+                  f"peak RSS {summary['peak_rss_mb']:.0f} MB")
+
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'environment': describe_environment(),
+            'settings': {
+                'durations': durations,
+                'image_size': args.image_size,
+                'workers': args.workers,
+                'repeat': args.repeat,
+                'use_cache': args.use_cache,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"\nResults: {results_path}")
+
+    if args.compare:
+        regressions = compare_results(results, Path(args.compare).resolve(), args.tolerance)
+        if regressions:
+            print(f"✗ {regressions} regressions")
+            sys.exit(1)
+        print("✓ No regressions")
+
+
+if __name__ == '__main__':
+    main()
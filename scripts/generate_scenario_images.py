@@ -10,8 +10,12 @@ import sys
 import re
 import os
 import json
+import time
+import heapq
+import itertools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Optional, Set
+from typing import Any, List, Dict, Optional, Set
 from dotenv import load_dotenv
 
 # Add project root to path to import lib
@@ -23,7 +27,14 @@ sys.path.append(str(project_root / "src"))
 # Load environment variables
 load_dotenv(project_root / '.env')
 
-from lib.google_imagen import GoogleImageGenerator
+from lib.google_imagen import GoogleImageGenerator, reference_parts
+from lib.fake_imagen import FakeImageGenerator
+from lib.generation_cache import GENERATION_CACHE_DIR_NAME, CachedImageGenerator, GenerationCache
+from lib.shot_variants import SHOT_ID_PADDING, shot_path, variant_path
+from lib.generation_journal import GENERATION_JOURNAL_NAME, GenerationJournal
+from lib.generation_scheduler import (
+    DEFAULT_MAX_ATTEMPTS, CircuitBreaker, RateLimitedGenerator, TokenBucket, backoff_delay, is_retryable
+)
 
 
 
@@ -34,7 +45,12 @@ DEFAULT_ASPECT_RATIO = "16:9"
 VALID_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 PICTURES_DIR_NAME = "pictures"
 GENERATIONS_DIR_NAME = "generations"
-SHOT_ID_PADDING = 2
+
+# Requests in flight at once; raise it up to what the provider's rate limit allows
+DEFAULT_CONCURRENCY = 1
+
+# --fake writes its placeholder images here, so real generations are never overwritten
+FAKE_GENERATIONS_DIR_NAME = "generations_fake"
 
 def load_scenario_json(file_path: Path) -> List[Dict[str, str]]:
     """
@@ -106,6 +122,64 @@ def clean_prompt(prompt: str) -> str:
     
     return prompt
 
+def generate_shots(jobs: List[Dict[str, Any]], generator: Any, concurrency: int, aspect_ratio: str, model_name: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, journal: Optional[GenerationJournal] = None) -> List[Dict[str, Any]]:
+    """
+    Generates the image of every job with up to `concurrency` requests in flight.
+    `generator` is anything with GoogleImageGenerator's generate_images (e.g. FakeImageGenerator).
+    Each image is saved by the generator as soon as its request completes, and
+    reported as it lands. Shots that fail with a retryable error (quota,
+    transient server or network errors) are re-queued after an exponential
+    backoff with jitter, up to `max_attempts` attempts in all; other shots keep
+    their slot meanwhile. Generated shots are recorded in `journal` (jobs need
+    an 'inputs' hash for it). A job with several 'output_paths' asks for that many
+    candidates at once (see --variants), journaled under its 'journal_ids'.
+    Returns the jobs with 'paths', 'error', 'attempts' and 'seconds' set.
+    """
+    def run(job: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            paths = generator.generate_images(
+                prompt=job["prompt"],
+                output_paths=[str(p) for p in job["output_paths"]],
+                style_reference_paths=job["reference_images"],
+                aspect_ratio=aspect_ratio,
+                model_name=model_name
+            )
+            if journal:
+                for journal_id, path in zip(job["journal_ids"], paths):
+                    journal.record(journal_id, job["inputs"], Path(path))
+            return dict(job, paths=paths, error=None, retryable=False, seconds=time.monotonic() - start)
+        except Exception as e:
+            return dict(job, paths=[], error=str(e), retryable=is_retryable(e), seconds=time.monotonic() - start)
+
+    results = []
+    # Re-queued jobs as (due time, sequence number, job)
+    delayed: List[Any] = []
+    sequence = itertools.count()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+        for job in jobs:
+            print(f"Generating Shot {job['shot_id']}...")
+            pending.add(pool.submit(run, dict(job, attempts=1)))
+        while pending or delayed:
+            while delayed and delayed[0][0] <= time.monotonic():
+                pending.add(pool.submit(run, heapq.heappop(delayed)[2]))
+            timeout = max(0.0, delayed[0][0] - time.monotonic()) if delayed else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result["error"] is not None and result["retryable"] and result["attempts"] < max_attempts:
+                    delay = backoff_delay(result["attempts"])
+                    print(f"Shot {result['shot_id']} RETRY in {delay:.1f}s (attempt {result['attempts']}/{max_attempts}): {result['error']}")
+                    heapq.heappush(delayed, (time.monotonic() + delay, next(sequence), dict(result, attempts=result["attempts"] + 1)))
+                    continue
+                results.append(result)
+                if result["error"] is None:
+                    print(f"[{len(results)}/{len(jobs)}] Shot {result['shot_id']} SUCCESS: Saved to {', '.join(result['paths'])} ({result['seconds']:.1f}s)")
+                else:
+                    print(f"[{len(results)}/{len(jobs)}] Shot {result['shot_id']} FAILED after {result['attempts']} attempts: {result['error']}")
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description="Generate images from a usage scenario JSON file.")
     parser.add_argument("scenario_path", type=str, help="Path to the scenario JSON file.")
@@ -113,8 +187,35 @@ def main():
     parser.add_argument("--execute", action="store_true", help="Execute the generation (calls API). Default is Dry Run.")
     parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help=f"Model name to use. Default matches lib: {DEFAULT_MODEL}")
     parser.add_argument("--aspect-ratio", type=str, default=DEFAULT_ASPECT_RATIO, choices=["1:1", "16:9", "4:3", "9:16", "3:4"], help=f"Aspect ratio of the generated image. Default is '{DEFAULT_ASPECT_RATIO}'.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Number of generation requests in flight at once. Default is {DEFAULT_CONCURRENCY}.")
+    parser.add_argument("--fake", action="store_true", help=f"Execute against a local fake client (no API calls, no credits); writes placeholder images to '{FAKE_GENERATIONS_DIR_NAME}'.")
+    parser.add_argument("--reference-max-side", type=int, help="Downsize style references to this many pixels on their longer side before sending them. Default is to send them as they are.")
+    parser.add_argument("--rate-limit", type=float, help="Requests per minute allowed by the API quota; requests are paced to stay under it. Default is no limit.")
+    parser.add_argument("--burst", type=int, default=1, help="With --rate-limit: requests that may go out back to back. Default is 1.")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help=f"Attempts per shot on quota and transient errors, with exponential backoff between them. Default is {DEFAULT_MAX_ATTEMPTS}.")
+    parser.add_argument("--variants", type=int, help="Generate this many candidates per shot, in as few requests as the model allows, as shot_XX_vK.png; pick one with select_variants.py. Default is a single shot_XX.png.")
+    parser.add_argument("--resume", action="store_true", help=f"Skip shots whose image was generated from the same prompt, references, model and aspect ratio and is unchanged since (see {GENERATIONS_DIR_NAME}/{GENERATION_JOURNAL_NAME}).")
+    parser.add_argument("--no-cache", action="store_true", help="Call the API even for shots whose prompt, references (and --reference-max-side), model and aspect ratio were generated before (the new images replace the cached ones).")
 
     args = parser.parse_args()
+
+    if args.concurrency < 1:
+        print("Error: --concurrency must be at least 1")
+        sys.exit(1)
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        print("Error: --rate-limit must be positive")
+        sys.exit(1)
+    if args.variants is not None and args.variants < 1:
+        print("Error: --variants must be at least 1")
+        sys.exit(1)
+    if args.burst < 1 or args.max_attempts < 1:
+        print("Error: --burst and --max-attempts must be at least 1")
+        sys.exit(1)
+    if args.reference_max_side is not None and args.reference_max_side < 1:
+        print("Error: --reference-max-side must be at least 1")
+        sys.exit(1)
+    if args.fake:
+        args.execute = True
     
     scenario_file = Path(args.scenario_path).resolve()
     if not scenario_file.exists():
@@ -141,17 +242,34 @@ def main():
         
     print(f"Found {len(shots)} shots.")
 
-    output_dir = scenario_dir / GENERATIONS_DIR_NAME
+    output_dir = scenario_dir / (FAKE_GENERATIONS_DIR_NAME if args.fake else GENERATIONS_DIR_NAME)
     if args.execute:
         output_dir.mkdir(parents=True, exist_ok=True)
     
-    generator: Optional[GoogleImageGenerator] = None
-    if args.execute:
+    generator: Optional[Any] = None
+    if args.fake:
+        generator = FakeImageGenerator()
+    elif args.execute:
         try:
-            generator = GoogleImageGenerator()
+            generator = GoogleImageGenerator(reference_max_side=args.reference_max_side)
         except Exception as e:
             print(f"Error initializing generator: {e}")
             sys.exit(1)
+
+    # Requests are paced to the quota and paused while the API keeps failing;
+    # cache hits skip both
+    scheduled_generator = RateLimitedGenerator(
+        generator,
+        TokenBucket(args.rate_limit, args.burst) if args.rate_limit else None,
+        CircuitBreaker()
+    )
+
+    # Images are cached next to the generations by a hash of everything sent to the API
+    cache = GenerationCache(output_dir / GENERATION_CACHE_DIR_NAME, bypass=args.no_cache)
+    cached_generator = CachedImageGenerator(scheduled_generator, cache, args.reference_max_side)
+
+    # Every generated shot is journaled with its input and image hashes, for --resume
+    journal = GenerationJournal(output_dir / GENERATION_JOURNAL_NAME)
             
     target_shots = set()
     if args.shot:
@@ -180,10 +298,22 @@ def main():
                 # Handle single ID
                 target_shots.add(clean_part.zfill(SHOT_ID_PADDING))
 
-    print(f"\nMode: {'EXECUTION (Calling API)' if args.execute else 'DRY RUN (Printing Prompts)'}")
+    if args.fake:
+        mode = "FAKE (Local Placeholder Images)"
+    elif args.execute:
+        mode = "EXECUTION (Calling API)"
+    else:
+        mode = "DRY RUN (Printing Prompts)"
+    print(f"\nMode: {mode}")
+    if args.execute:
+        print(f"Concurrency: {args.concurrency}")
+        if args.rate_limit:
+            print(f"Rate limit: {args.rate_limit:g} requests/min (burst {args.burst})")
     print("=" * 60)
 
     count = 0
+    up_to_date = 0
+    jobs = []
     
     for shot in shots:
         shot_id = shot.get("scene", "??")
@@ -199,31 +329,57 @@ def main():
         prompt_text = clean_prompt(raw_prompt)
         
         reference_images = get_reference_images(shot, pictures_dir)
-        
-        print(f"\n[Shot {shot_id}]")
-        
+        if args.variants:
+            output_paths = [variant_path(output_dir, shot_id, k) for k in range(1, args.variants + 1)]
+            journal_ids = [path.stem[len("shot_"):] for path in output_paths]
+        else:
+            output_paths = [shot_path(output_dir, shot_id)]
+            journal_ids = [shot_id]
+        inputs = cache.image_key(prompt_text, args.model, args.aspect_ratio, reference_images, args.reference_max_side)
+
+        if args.resume and all(journal.is_current(i, inputs, p) for i, p in zip(journal_ids, output_paths)):
+            print(f"\n[Shot {shot_id}] Up to date, skipping")
+            up_to_date += 1
+            continue
+
         if not args.execute:
+            print(f"\n[Shot {shot_id}]")
             print(f"Prompt:\n{prompt_text}")
             print(f"Style References: {[Path(p).name for p in reference_images]}")
-            print(f"Output Path: {output_dir / f'shot_{shot_id}.png'}")
+            print(f"Output Path: {', '.join(str(p) for p in output_paths)}")
+            cached = cache.lookup(*cached_generator.entries(prompt_text, reference_images, args.aspect_ratio, args.model, len(output_paths)))
+            print(f"Cached: {'yes' if cached else 'no'}")
         else:
-            print(f"Generating Shot {shot_id}...")
-            output_path = output_dir / f"shot_{shot_id}.png"
-            
-            try:
-                # Ensure generator is not None for static analysis and safety
-                assert generator is not None, "Generator not initialized even though execute mode is on"
-
-                result_path = generator.generate_image(
-                    prompt=prompt_text,
-                    output_path=str(output_path),
-                    style_reference_paths=reference_images,
-                    aspect_ratio=args.aspect_ratio,
-                    model_name=args.model
-                )
-                print(f"SUCCESS: Saved to {result_path}")
-            except Exception as e:
-                print(f"FAILED: {e}")
+            jobs.append({
+                "shot_id": shot_id,
+                "prompt": prompt_text,
+                "reference_images": reference_images,
+                "output_paths": output_paths,
+                "journal_ids": journal_ids,
+                "inputs": inputs,
+            })
+
+    if jobs:
+        # Ensure generator is not None for static analysis and safety
+        assert generator is not None, "Generator not initialized even though execute mode is on"
+
+        start = time.monotonic()
+        results = generate_shots(jobs, cached_generator, args.concurrency, args.aspect_ratio, args.model, args.max_attempts, journal)
+        elapsed = time.monotonic() - start
+        failed = [r["shot_id"] for r in results if r["error"] is not None]
+        print("=" * 60)
+        print(f"Generated {len(results) - len(failed)}/{len(results)} shots in {elapsed:.1f}s "
+              f"({len(results) / elapsed * 60:.1f} requests/min)")
+        if failed:
+            print(f"Failed shots: {', '.join(failed)}")
+        if not args.fake:
+            print(f"Style references: {reference_parts.report()}")
+        print(f"Scheduling: {sum(r['attempts'] - 1 for r in results)} retries, {scheduled_generator.report()}")
+
+    if args.resume:
+        print(f"Resume: {up_to_date}/{count} shots up to date")
+    if count:
+        print(f"Generation cache: {cache.report()}")
 
     if count == 0 and target_shots:
         print(f"Warning: No shots found matching {args.shot}")
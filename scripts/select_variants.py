@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Pick one of the candidates generated with `generate_scenario_images.py --variants N`
+for every shot, offline: list the candidates with a sharpness score, write
+contact sheets to compare them, and promote the chosen shot_XX_vK.png to the
+shot_XX.png the assembler uses.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict
+
+# Add src to path to import lib
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root / "src"))
+
+from lib.generation_journal import GENERATION_JOURNAL_NAME, GenerationJournal
+from lib.render_cache import hash_file
+from lib.shot_variants import SHOT_ID_PADDING, contact_sheet, find_variants, promote, sharpness, shot_path, variant_number
+
+GENERATIONS_DIR_NAME = "generations"
+SHEETS_DIR_NAME = "variant_sheets"
+
+
+def parse_picks(spec: str) -> Dict[str, int]:
+    """Parse '01=2,3=1' into {shot id: variant}; shot ids are zero-padded like the file names."""
+    picks = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        shot_id, _, variant = part.partition('=')
+        if not variant.isdigit():
+            raise ValueError(f"Invalid pick '{part}' (expected SHOT=VARIANT, e.g. 01=2)")
+        picks[shot_id.strip().zfill(SHOT_ID_PADDING)] = int(variant)
+    return picks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List, compare and promote generated shot variants.")
+    parser.add_argument("scenario_path", type=str, help="Path to the scenario JSON file.")
+    parser.add_argument("--generations-dir", type=str, help=f"Directory with the variants (default: '{GENERATIONS_DIR_NAME}' next to the scenario).")
+    parser.add_argument("--sheet", action="store_true", help=f"Write a contact sheet per shot to '{SHEETS_DIR_NAME}' next to the scenario.")
+    parser.add_argument("--pick", type=str, help="Promote these candidates, e.g. '01=2,03=1'.")
+    parser.add_argument("--auto", action="store_true", help="Promote the sharpest candidate of every shot that isn't picked with --pick.")
+    args = parser.parse_args()
+
+    scenario_file = Path(args.scenario_path).resolve()
+    scenario_dir = scenario_file.parent
+    generations_dir = Path(args.generations_dir).resolve() if args.generations_dir else scenario_dir / GENERATIONS_DIR_NAME
+    if not generations_dir.exists():
+        print(f"Error: Generations directory not found: {generations_dir}")
+        sys.exit(1)
+
+    try:
+        picks = parse_picks(args.pick) if args.pick else {}
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    variants = find_variants(generations_dir)
+    if not variants:
+        print(f"No shot variants found in {generations_dir}")
+        sys.exit(1)
+
+    # Variants by their number in the file name, which has gaps if a candidate is missing
+    numbered = {
+        shot_id: {variant_number(path): path for path in candidates}
+        for shot_id, candidates in variants.items()
+    }
+    for shot_id, variant in picks.items():
+        if variant not in numbered.get(shot_id, {}):
+            print(f"Error: Shot {shot_id} has no variant {variant}")
+            sys.exit(1)
+
+    # Promoted shots are journaled like generated ones, so --resume keeps them
+    journal = GenerationJournal(generations_dir / GENERATION_JOURNAL_NAME)
+
+    sheets_dir = scenario_dir / SHEETS_DIR_NAME
+    if args.sheet:
+        sheets_dir.mkdir(parents=True, exist_ok=True)
+
+    promoted = 0
+    for shot_id, candidates in variants.items():
+        target = shot_path(generations_dir, shot_id)
+        current = hash_file(target) if target.exists() else None
+        scores = [sharpness(path) for path in candidates]
+
+        print(f"\n[Shot {shot_id}]")
+        for path, score in zip(candidates, scores):
+            marker = " (promoted)" if current and hash_file(path) == current else ""
+            print(f"  v{variant_number(path)}: sharpness {score:.1f}  {path.name}{marker}")
+
+        if args.sheet:
+            print(f"  Sheet: {contact_sheet(candidates, sheets_dir / f'shot_{shot_id}_sheet.jpg')}")
+
+        choice = picks.get(shot_id)
+        if choice is None and args.auto:
+            choice = variant_number(candidates[scores.index(max(scores))])
+        if choice is not None:
+            promote(numbered[shot_id][choice], target, journal)
+            promoted += 1
+            print(f"  Promoted v{choice} -> {target.name}")
+
+    print(f"\n{len(variants)} shots with variants, {promoted} promoted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Encoder auto-tuning from probe encodes.
+
+The assembler renders a short lossless sample of the timeline and this module
+encodes it with candidate x264 settings to pick a profile for the render:
+
+- preset: the slowest preset whose encode speed, extrapolated to the whole
+  video, fits a wall-clock budget (DEFAULT_PRESET without a budget);
+- CRF: the highest CRF whose SSIM against the sample still meets the target;
+- tune: none or 'stillimage', whichever meets the target with fewer bits;
+- threads: the fastest encoder thread count, probed on multi-core machines.
+
+Constant quality lets slow, mostly static Ken Burns footage use far fewer bits
+than a fixed bitrate, while fast moves and transitions still get what they need.
+"""
+
+import json
+import re
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lib.render_cache import commit, partial_path
+
+PROFILE_VERSION = 2
+
+# Presets considered for a budget, fastest first
+TUNING_PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow']
+DEFAULT_PRESET = 'medium'
+
+# CRF search range (lower is better quality) and the default quality target
+CRF_RANGE = (16, 30)
+DEFAULT_TARGET_SSIM = 0.99
+TUNES = [None, 'stillimage']
+
+_SSIM_RE = re.compile(r'All:([0-9.]+)')
+
+
+def x264_args(preset: str, crf: int, tune: Optional[str] = None, threads: Optional[int] = None) -> List[str]:
+    """Constant-quality x264 output arguments (with `threads`, as probed)."""
+    args = ['-c:v', 'libx264', '-preset', preset, '-crf', str(crf)]
+    if tune:
+        args.extend(['-tune', tune])
+    args.extend(['-pix_fmt', 'yuv420p'])
+    if threads:
+        args.extend(['-threads', str(threads)])
+    return args
+
+
+def measure_ssim(encoded: Path, reference: Path) -> float:
+    """Mean SSIM of an encode against its (lossless) source."""
+    result = subprocess.run(
+        ['ffmpeg', '-nostats', '-i', str(encoded), '-i', str(reference), '-lavfi', 'ssim', '-f', 'null', '-'],
+        capture_output=True, text=True, check=True
+    )
+    match = _SSIM_RE.search(result.stderr)
+    if not match:
+        raise RuntimeError(f"ffmpeg reported no SSIM for {encoded}")
+    return float(match.group(1))
+
+
+class EncoderProbe:
+    """Probe encodes of one sample, memoized by their settings."""
+
+    def __init__(
+        self,
+        sample: Path,
+        sample_frames: int,
+        fps: int,
+        total_frames: int,
+        work_dir: Path,
+        log: Callable[[str], None] = print
+    ):
+        self.sample = Path(sample)
+        self.sample_frames = sample_frames
+        self.fps = fps
+        self.total_frames = total_frames
+        self.work_dir = Path(work_dir)
+        self.log = log
+        self.results: Dict[Tuple[str, ...], Dict] = {}
+
+    def run(self, preset: str, crf: int, tune: Optional[str] = None, threads: Optional[int] = None) -> Dict:
+        """Encode the sample with these settings; speed, bitrate and SSIM of the result."""
+        args = x264_args(preset, crf, tune, threads)
+        if tuple(args) in self.results:
+            return self.results[tuple(args)]
+
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        output = self.work_dir / f"probe_{len(self.results)}.mp4"
+        start = time.monotonic()
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-i', str(self.sample), *args, str(output)],
+            check=True
+        )
+        wall = time.monotonic() - start
+        result = {
+            'preset': preset,
+            'crf': crf,
+            'tune': tune,
+            'threads': threads,
+            'wall': wall,
+            'encode_fps': self.sample_frames / wall,
+            # The sample is decoded as well, so this slightly overestimates the encode
+            'predicted_encode': wall * self.total_frames / self.sample_frames,
+            'kbps': output.stat().st_size * 8 / 1000 / (self.sample_frames / self.fps),
+            'ssim': measure_ssim(output, self.sample),
+        }
+        output.unlink()
+        self.results[tuple(args)] = result
+        self.log(
+            f"  probe {preset} crf {crf}{f' tune {tune}' if tune else ''}"
+            f"{f' threads {threads}' if threads else ''}: {result['encode_fps']:.0f} fps, "
+            f"{result['kbps']:.0f} kb/s, SSIM {result['ssim']:.4f}"
+        )
+        return result
+
+
+def highest_crf(probe: EncoderProbe, preset: str, tune: Optional[str], target_ssim: float) -> Dict:
+    """
+    Binary-search the highest CRF that meets the SSIM target (SSIM falls as
+    CRF rises). Falls back to the lowest CRF if none does.
+    """
+    low, high = CRF_RANGE
+    best = None
+    while low <= high:
+        crf = (low + high) // 2
+        result = probe.run(preset, crf, tune)
+        if result['ssim'] >= target_ssim:
+            best, low = result, crf + 1
+        else:
+            high = crf - 1
+    return best or probe.run(preset, CRF_RANGE[0], tune)
+
+
+def tune_encoder(
+    probe: EncoderProbe,
+    budget: Optional[float] = None,
+    target_ssim: float = DEFAULT_TARGET_SSIM,
+    cpu_count: int = 1,
+    preset: Optional[str] = None
+) -> Dict:
+    """
+    Pick preset, CRF, tune and thread count with probe encodes (see the module
+    docstring). `budget` is the wall-clock seconds the whole video's encode may
+    take; a given `preset` is kept as is; `cpu_count` is the cores one encoder
+    gets. Returns the profile; its 'codec_args' replace the default encoder
+    settings and its 'threads' is passed to the render commands separately,
+    which set the thread count of every encode.
+    """
+    if not preset and not budget:
+        preset = DEFAULT_PRESET
+    elif not preset:
+        # Speed mostly depends on the preset, so the presets are timed at a mid CRF
+        mid_crf = sum(CRF_RANGE) // 2
+        preset = TUNING_PRESETS[0]
+        for candidate in TUNING_PRESETS:
+            if probe.run(candidate, mid_crf)['predicted_encode'] > budget:
+                break
+            preset = candidate
+
+    # Settings that meet the target first, then the fewest bits
+    best = min(
+        (highest_crf(probe, preset, tune, target_ssim) for tune in TUNES),
+        key=lambda r: (r['ssim'] < target_ssim, r['kbps'])
+    )
+
+    if cpu_count > 1:
+        candidates = sorted({1, max(1, cpu_count // 2), cpu_count})
+        best = min(
+            (probe.run(preset, best['crf'], best['tune'], threads) for threads in candidates),
+            key=lambda r: r['wall']
+        )
+
+    return {
+        'version': PROFILE_VERSION,
+        'preset': best['preset'],
+        'crf': best['crf'],
+        'tune': best['tune'],
+        'threads': best['threads'],
+        'codec_args': x264_args(best['preset'], best['crf'], best['tune']),
+        'ssim': best['ssim'],
+        'kbps': best['kbps'],
+        'predicted_encode': best['predicted_encode'],
+        'budget': budget,
+        'target_ssim': target_ssim,
+        'budget_met': budget is None or best['predicted_encode'] <= budget,
+        'target_met': best['ssim'] >= target_ssim,
+    }
+
+
+def save_profile(profile: Dict, probe: EncoderProbe, path: Path) -> Path:
+    """Write the chosen profile and every probe behind it as JSON (atomically)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = partial_path(path)
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump({'profile': profile, 'probes': list(probe.results.values())}, f, indent=2, sort_keys=True)
+        f.write('\n')
+    commit(partial, path)
+    return path
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+# Output size per aspect ratio, roughly what the image models return
+FAKE_IMAGE_SIZES = {
+    "1:1": (1024, 1024),
+    "16:9": (1344, 768),
+    "4:3": (1184, 864),
+    "9:16": (768, 1344),
+    "3:4": (864, 1184),
+}
+
+
+class FakeAPIError(RuntimeError):
+    """Simulated API error with an HTTP status code, like the SDK's errors."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeImageGenerator:
+    def __init__(self, latency: float = 2.0, jitter: float = 0.5, failure_rate: float = 0.0, seed: Optional[int] = None, quota_per_minute: Optional[float] = None):
+        """
+        Stand-in for GoogleImageGenerator that needs no network or credits.
+
+        Every call sleeps like an API round trip and writes a flat placeholder
+        PNG, so the generation pipeline (concurrency, reporting, retries) can be
+        exercised locally.
+
+        Args:
+            latency: Mean seconds per request.
+            jitter: Requests take latency +/- this share of it, uniformly.
+            failure_rate: Share of requests that fail with a transient 503.
+            seed: Seed for the latencies, failures and placeholder colors.
+            quota_per_minute: Requests over this many in the last minute fail with a 429.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.quota_per_minute = quota_per_minute
+        self.recent: deque = deque()
+        self.throttled = 0
+
+    def generate_image(
+        self,
+        prompt: str,
+        output_path: str,
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "fake"
+    ) -> str:
+        """Same signature and result as GoogleImageGenerator.generate_image."""
+        return self.generate_images(prompt, [output_path], style_reference_paths, aspect_ratio, model_name)[0]
+
+    def generate_images(
+        self,
+        prompt: str,
+        output_paths: List[str],
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "fake"
+    ) -> List[str]:
+        """Same as GoogleImageGenerator.generate_images: all candidates in one simulated request."""
+        from PIL import Image
+
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = self.latency * (1 + self.jitter * (2 * self.rng.random() - 1))
+            fail = self.rng.random() < self.failure_rate
+            colors = [tuple(self.rng.randrange(256) for _ in range(3)) for _ in output_paths]
+            now = time.monotonic()
+            while self.recent and self.recent[0] <= now - 60:
+                self.recent.popleft()
+            throttled = self.quota_per_minute is not None and len(self.recent) >= self.quota_per_minute
+            self.recent.append(now)
+            if throttled:
+                self.throttled += 1
+        try:
+            if throttled:
+                raise FakeAPIError(429, "RESOURCE_EXHAUSTED (simulated quota)")
+            time.sleep(max(0.0, delay))
+            if fail:
+                raise FakeAPIError(503, "UNAVAILABLE (simulated failure)")
+
+            size = FAKE_IMAGE_SIZES.get(aspect_ratio, FAKE_IMAGE_SIZES["1:1"])
+            saved = []
+            for output_path, color in zip(output_paths, colors):
+                output_file = Path(output_path)
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+                Image.new("RGB", size, color).save(output_file, format="PNG")
+                saved.append(str(output_file))
+            return saved
+        finally:
+            with self.lock:
+                self.in_flight -= 1
@@ -0,0 +1,521 @@
+"""
+FFmpeg filter graphs as data, plus an optimizer.
+
+`FilterGraph` holds chains of `Filter`s connected by pad labels and renders
+to a `-filter_complex` string. The rewrite passes below operate on that
+structure instead of on strings; `optimize` runs them in order and reports
+the estimated pixel operations each one saved.
+"""
+
+import ast
+import operator
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Rough relative cost per output pixel of each filter (per processed frame).
+# Frames a filter only passes through (disabled timeline, xfade outside the
+# transition) cost PASSTHROUGH_WEIGHT.
+FILTER_COST_WEIGHTS = {
+    'zoompan': 4.0,
+    'gblur': 6.0,
+    'scale': 2.0,
+    'xfade': 1.5,
+    'format': 0.5,
+    'crop': 0.2,
+}
+PASSTHROUGH_WEIGHT = 0.05
+FREE_FILTERS = {'setsar', 'sendcmd', 'null', 'split', 'trim', 'setpts', 'settb', 'fps', 'loop'}
+
+# Filters that leave a held still frame still (see `skip_static_supersampling`)
+STILL_SAFE_FILTERS = {'settb', 'setpts', 'fps', 'gblur', 'sendcmd', 'null'}
+
+# xfade transitions that are a per-pixel linear blend and therefore commute with scaling
+LINEAR_TRANSITIONS = {'fade'}
+
+_BETWEEN = re.compile(r"between\(t,([-\d.e]+),([-\d.e]+)\)")
+
+
+def _split_top_level(text: str, sep: str) -> List[str]:
+    """Split on `sep` outside single quotes and brackets."""
+    parts, current, quoted, depth = [], [], False, 0
+    for ch in text:
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == '[':
+            depth += 1
+        elif not quoted and ch == ']':
+            depth -= 1
+        if ch == sep and not quoted and depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append(''.join(current))
+    return parts
+
+
+class Filter:
+    """A single filter: name, optional instance id and ordered options."""
+
+    def __init__(self, name: str, options: Optional[List[Tuple[Optional[str], str]]] = None, instance: Optional[str] = None):
+        self.name = name
+        self.options = options or []  # (key or None for positional, raw value)
+        self.instance = instance
+
+    @classmethod
+    def parse(cls, text: str) -> 'Filter':
+        """Parse 'name[@id]=opt:key=value' (values may be single-quoted)."""
+        head, _, args = text.partition('=')
+        name, _, instance = head.partition('@')
+        options = []
+        if args:
+            for item in _split_top_level(args, ':'):
+                key, eq, value = item.partition('=')
+                if eq and "'" not in key and '(' not in key:
+                    options.append((key, value))
+                else:
+                    options.append((None, item))
+        return cls(name, options, instance or None)
+
+    def get(self, key: str) -> Optional[str]:
+        for k, v in self.options:
+            if k == key:
+                return v
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        for i, (k, _) in enumerate(self.options):
+            if k == key:
+                self.options[i] = (key, value)
+                return
+        self.options.append((key, value))
+
+    def positional(self) -> List[str]:
+        return [v for k, v in self.options if k is None]
+
+    def render(self) -> str:
+        head = f"{self.name}@{self.instance}" if self.instance else self.name
+        if not self.options:
+            return head
+        args = ':'.join(v if k is None else f"{k}={v}" for k, v in self.options)
+        return f"{head}={args}"
+
+
+def parse_filters(text: str) -> List[Filter]:
+    """Parse a comma-separated filter chain (without pad labels)."""
+    return [Filter.parse(part) for part in _split_top_level(text, ',') if part]
+
+
+class FilterChain:
+    """
+    Filters applied in sequence between input and output pad labels.
+
+    `size` is the frame size entering the chain and `frames` the number of
+    frames entering it; `fps` converts timeline windows to frames. They only
+    feed the cost estimate.
+    """
+
+    def __init__(
+        self,
+        inputs: List[str],
+        filters: List[Filter],
+        outputs: List[str],
+        size: Optional[Tuple[int, int]] = None,
+        frames: int = 1,
+        fps: float = 1.0
+    ):
+        self.inputs = inputs
+        self.filters = filters
+        self.outputs = outputs
+        self.size = size
+        self.frames = frames
+        self.fps = fps
+
+    def render(self) -> str:
+        ins = ''.join(f"[{label}]" for label in self.inputs)
+        outs = ''.join(f"[{label}]" for label in self.outputs)
+        body = ','.join(f.render() for f in self.filters) or 'null'
+        return f"{ins}{body}{outs}"
+
+
+class FilterGraph:
+    """
+    An ordered list of filter chains forming a -filter_complex graph.
+
+    Pad labels are indexed, so looking up a label's producer or consumers is
+    constant time and building or rewriting a graph stays linear in its size.
+    Change a chain's pads only through `relabel`, `set_outputs` and `remove`.
+    """
+
+    def __init__(self):
+        self.chains: List[FilterChain] = []
+        self._next_id = 0
+        self._producers: Dict[str, FilterChain] = {}
+        self._consumers: Dict[str, List[FilterChain]] = {}
+
+    def add(self, inputs: List[str], filters, outputs: List[str], **meta) -> FilterChain:
+        """Append a chain; `filters` may be a filter string or a list of Filter."""
+        if isinstance(filters, str):
+            filters = parse_filters(filters)
+        chain = FilterChain(inputs, list(filters), outputs, **meta)
+        self.chains.append(chain)
+        self._index(chain)
+        return chain
+
+    def _index(self, chain: FilterChain) -> None:
+        for label in chain.outputs:
+            self._producers[label] = chain
+        for label in chain.inputs:
+            self._consumers.setdefault(label, []).append(chain)
+
+    def _unindex(self, chain: FilterChain) -> None:
+        for label in chain.outputs:
+            if self._producers.get(label) is chain:
+                del self._producers[label]
+        for label in chain.inputs:
+            consumers = self._consumers.get(label, [])
+            if chain in consumers:
+                consumers.remove(chain)
+
+    def unique_id(self, prefix: str) -> str:
+        self._next_id += 1
+        return f"{prefix}{self._next_id}"
+
+    def producer(self, label: str) -> Optional[FilterChain]:
+        return self._producers.get(label)
+
+    def consumers(self, label: str) -> List[FilterChain]:
+        return list(self._consumers.get(label, []))
+
+    def relabel(self, old: str, new: str) -> None:
+        """Point every consumer of `old` at `new`."""
+        for chain in self._consumers.pop(old, []):
+            chain.inputs = [new if label == old else label for label in chain.inputs]
+            self._consumers.setdefault(new, []).append(chain)
+
+    def set_outputs(self, chain: FilterChain, outputs: List[str]) -> None:
+        """Change the output pads of a chain."""
+        self._unindex(chain)
+        chain.outputs = outputs
+        self._index(chain)
+
+    def remove(self, *chains: FilterChain) -> None:
+        """Remove chains from the graph (one pass over the chain list)."""
+        removed = {id(chain) for chain in chains}
+        for chain in chains:
+            self._unindex(chain)
+        self.chains = [chain for chain in self.chains if id(chain) not in removed]
+
+    def upstream(self, label: str) -> List[FilterChain]:
+        """Chains feeding `label` through single-input links, source first."""
+        path = []
+        chain = self.producer(label)
+        while chain is not None:
+            path.append(chain)
+            if len(chain.inputs) != 1:
+                break
+            chain = self.producer(chain.inputs[0])
+        return list(reversed(path))
+
+    def render(self, separator: str = ';') -> str:
+        """Render the graph; use ';\\n' for one chain per line (filter script files)."""
+        return separator.join(chain.render() for chain in self.chains)
+
+    def write_script(self, path: Path) -> Path:
+        """Write the graph for `-filter_complex_script`, one chain per line."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.render(';\n') + '\n', encoding='utf-8')
+        return path
+
+    def estimate_cost(self) -> float:
+        """Estimated pixel operations needed to evaluate the whole graph."""
+        return sum(chain_cost(chain) for chain in self.chains)
+
+
+def _parse_size(f: Filter) -> Optional[Tuple[int, int]]:
+    """Output size of a filter that sets it with plain numbers, else None."""
+    if f.name == 'zoompan':
+        s = f.get('s')
+        if s and 'x' in s:
+            w, h = s.split('x')
+            return int(w), int(h)
+    elif f.name in ('scale', 'crop'):
+        pos = f.positional()
+        if len(pos) >= 2 and pos[0].isdigit() and pos[1].isdigit():
+            return int(pos[0]), int(pos[1])
+    return None
+
+
+def _active_frames(f: Filter, frames: int, fps: float) -> int:
+    """Frames a filter actually processes (timeline windows, xfade duration)."""
+    enable = f.get('enable')
+    if enable:
+        windows = _BETWEEN.findall(enable)
+        if windows:
+            seconds = sum(float(b) - float(a) for a, b in windows)
+            return min(frames, int(round(seconds * fps)))
+    if f.name == 'xfade':
+        duration = f.get('duration')
+        if duration:
+            return min(frames, int(round(float(duration) * fps)))
+    return frames
+
+
+def chain_cost(chain: FilterChain) -> float:
+    size = chain.size
+    frames = chain.frames
+    cost = 0.0
+    for f in chain.filters:
+        if f.name == 'zoompan':
+            d = f.get('d')
+            frames = int(d) if d and d.isdigit() else frames
+        elif f.name == 'loop':
+            loop = f.get('loop')
+            frames = frames * (int(loop) + 1) if loop and loop.isdigit() else frames
+        size = _parse_size(f) or size
+        if size is None or f.name in FREE_FILTERS:
+            continue
+        pixels = size[0] * size[1]
+        weight = FILTER_COST_WEIGHTS.get(f.name, 1.0)
+        active = _active_frames(f, frames, chain.fps)
+        cost += pixels * (active * weight + (frames - active) * PASSTHROUGH_WEIGHT)
+    return cost
+
+
+# --- Rewrite passes --------------------------------------------------------
+# Each pass mutates the graph and returns the number of rewrites it made.
+
+def drop_noops(graph: FilterGraph) -> int:
+    """Remove `null` filters; chains that become empty are bypassed entirely."""
+    rewrites = 0
+    bypassed = []
+    for chain in graph.chains:
+        kept = [f for f in chain.filters if f.name != 'null']
+        rewrites += len(chain.filters) - len(kept)
+        chain.filters = kept
+        if not kept and len(chain.inputs) == 1 and len(chain.outputs) == 1:
+            # Downstream chains read the input directly. A graph output label
+            # (no consumers) keeps its passthrough so -map still finds it.
+            if graph.consumers(chain.outputs[0]):
+                graph.relabel(chain.outputs[0], chain.inputs[0])
+                bypassed.append(chain)
+            else:
+                chain.filters = [Filter('null')]
+                rewrites -= 1
+    graph.remove(*bypassed)
+    return rewrites
+
+
+def push_downscale(graph: FilterGraph) -> int:
+    """
+    Move a final `scale` that follows an xfade tree onto every clip feeding it.
+    A linear cross-fade commutes with scaling, so the transitions can be
+    blended at the output resolution instead of the supersampled one.
+    """
+    rewrites = 0
+    for final in list(graph.chains):
+        if len(final.filters) != 1 or final.filters[0].name != 'scale' or len(final.inputs) != 1:
+            continue
+        size = _parse_size(final.filters[0])
+        root = graph.producer(final.inputs[0])
+        if size is None or root is None or not _is_xfade(root):
+            continue
+
+        # Collect the xfade tree and the clip chains at its leaves
+        xfades, leaves, pending = [], [], [root]
+        while pending:
+            chain = pending.pop()
+            if _is_xfade(chain):
+                if chain.filters[0].get('transition') not in LINEAR_TRANSITIONS:
+                    break
+                xfades.append(chain)
+                pending.extend(graph.producer(label) for label in chain.inputs)
+            elif chain is not None and len(chain.outputs) == 1:
+                leaves.append(chain)
+            else:
+                break
+        else:
+            for leaf in leaves:
+                leaf.filters.append(Filter.parse(final.filters[0].render()))
+            for chain in xfades:
+                chain.size = size
+            graph.remove(final)
+            graph.set_outputs(root, final.outputs)
+            rewrites += 1
+    return rewrites
+
+
+def skip_static_supersampling(graph: FilterGraph) -> int:
+    """
+    Render clips without motion directly at the output resolution.
+    Supersampling only hides zoompan's whole-pixel jitter, which a still
+    viewport doesn't have. That covers zoompan moves that don't move and
+    frames held by `loop`. Needs the per-clip downscale from `push_downscale`.
+    """
+    rewrites = 0
+    for chain in graph.chains:
+        if _is_xfade(chain):
+            continue
+        path = graph.upstream(chain.outputs[0]) if len(chain.outputs) == 1 else []
+        filters = [(c, f) for c in path for f in c.filters]
+        if not filters or filters[-1][1].name != 'scale':
+            continue
+        zoompans = [(c, f) for c, f in filters if f.name == 'zoompan']
+        loops = [(c, f) for c, f in filters if f.name == 'loop']
+        if len(zoompans) == 1 and not loops and _is_still(zoompans[0][1]):
+            hold_chain, hold = zoompans[0]
+            ss_size = _parse_size(hold)
+        elif len(loops) == 1 and not zoompans and _is_held_still(filters, loops[0][1]):
+            hold_chain, hold = loops[0]
+            ss_size = _size_before(hold_chain, hold)
+        else:
+            continue
+        last_chain, downscale = filters[-1]
+        out_size = _parse_size(downscale)
+        if ss_size is None or out_size is None or ss_size == out_size:
+            continue
+
+        factor = out_size[0] / ss_size[0]
+        if hold.name == 'zoompan':
+            hold.set('s', f"{out_size[0]}x{out_size[1]}")
+        hold_chain.filters.insert(hold_chain.filters.index(hold), Filter.parse(downscale.render()))
+        last_chain.filters.remove(downscale)
+        for c, f in filters:
+            if f.name == 'gblur' and f.get('sigma'):
+                f.set('sigma', f"{float(f.get('sigma')) * factor:g}")
+        rewrites += 1
+    return rewrites
+
+
+def merge_stepped_blurs(graph: FilterGraph) -> int:
+    """
+    Replace runs of `gblur` filters that differ only in sigma and timeline
+    window with one gblur whose sigma is switched by `sendcmd`.
+    """
+    rewrites = 0
+    for chain in graph.chains:
+        merged: List[Filter] = []
+        run: List[Filter] = []
+        for f in chain.filters + [None]:
+            if f is not None and f.name == 'gblur' and f.get('enable') and _BETWEEN.fullmatch(f.get('enable').strip("'")):
+                run.append(f)
+                continue
+            if len(run) > 1:
+                merged.extend(_merge_blur_run(graph, run))
+                rewrites += len(run) - 1
+            else:
+                merged.extend(run)
+            run = []
+            if f is not None:
+                merged.append(f)
+        chain.filters = merged
+    return rewrites
+
+
+def _merge_blur_run(graph: FilterGraph, run: List[Filter]) -> List[Filter]:
+    windows = []
+    for f in run:
+        start, end = _BETWEEN.fullmatch(f.get('enable').strip("'")).groups()
+        windows.append((float(start), start, end, f.get('sigma')))
+    windows.sort()
+    instance = graph.unique_id('kb_blur')
+    commands = ';'.join(f"{start} gblur@{instance} sigma {sigma}" for _, start, _, sigma in windows)
+    enable = '+'.join(f"between(t,{start},{end})" for _, start, end, _ in windows)
+    return [
+        Filter('sendcmd', [('c', f"'{commands}'")]),
+        Filter('gblur', [('sigma', windows[0][3]), ('enable', f"'{enable}'")], instance),
+    ]
+
+
+_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def _eval_expr(expr: str, variables: Dict[str, float]) -> Optional[float]:
+    """
+    Evaluate a simple arithmetic ffmpeg expression (numbers, variables, + - * /
+    and parentheses), or None if it uses anything else (functions, comparisons).
+    """
+    try:
+        tree = ast.parse(expr.strip("'"), mode='eval')
+        return float(_eval_node(tree.body, variables))
+    except (SyntaxError, ValueError, KeyError, ZeroDivisionError):
+        return None
+
+
+def _eval_node(node: ast.AST, variables: Dict[str, float]) -> float:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.Name):
+        return variables[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _BINARY_OPS[type(node.op)](_eval_node(node.left, variables), _eval_node(node.right, variables))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_node(node.operand, variables))
+    raise ValueError(f"unsupported expression: {ast.dump(node)}")
+
+
+def _is_still(zoompan: Filter) -> bool:
+    """True if the zoompan viewport is the same on its first and last frame and in between."""
+    d = zoompan.get('d')
+    frames = int(d) if d and d.isdigit() else 1
+    samples = []
+    for on in (0, frames // 2, max(frames - 1, 0)):
+        z = _eval_expr(zoompan.get('z') or '1', {'on': on, 'in': on})
+        if z is None:
+            return False
+        variables = {'on': on, 'in': on, 'iw': 1000.0, 'ih': 1000.0, 'zoom': z}
+        x = _eval_expr(zoompan.get('x') or '0', variables)
+        y = _eval_expr(zoompan.get('y') or '0', variables)
+        if x is None or y is None:
+            return False
+        samples.append((round(z, 9), round(x, 6), round(y, 6)))
+    return len(set(samples)) == 1
+
+
+def _is_held_still(filters: List[Tuple[FilterChain, Filter]], loop: Filter) -> bool:
+    """True if nothing between a single-frame `loop` and the final downscale moves the frame."""
+    names = [f.name for _, f in filters]
+    after = names[names.index('loop') + 1:-1]
+    return loop.get('size') == '1' and all(name in STILL_SAFE_FILTERS for name in after)
+
+
+def _size_before(chain: FilterChain, target: Filter) -> Optional[Tuple[int, int]]:
+    """Frame size entering `target`, from the chain's input size and the filters before it."""
+    size = chain.size
+    for f in chain.filters[:chain.filters.index(target)]:
+        size = _parse_size(f) or size
+    return size
+
+
+def _is_xfade(chain: Optional[FilterChain]) -> bool:
+    return chain is not None and len(chain.filters) == 1 and chain.filters[0].name == 'xfade'
+
+
+# (name, pass, whether the pass removes pixel work). Merging blurs only
+# removes filter instances: the merged gblur still blurs every frame the
+# stepped ones did, so the cost model has no saving to report for it.
+OPTIMIZATION_PASSES = [
+    ('drop no-ops', drop_noops, True),
+    ('push downscale before xfade', push_downscale, True),
+    ('skip supersampling for still clips', skip_static_supersampling, True),
+    ('merge stepped blurs', merge_stepped_blurs, False),
+]
+
+
+def optimize(graph: FilterGraph) -> List[Dict]:
+    """
+    Run every rewrite pass in order. Returns one report entry per pass with
+    the number of rewrites and the estimated pixel operations it saved
+    (None for passes that don't change the pixel work).
+    """
+    report = []
+    cost = graph.estimate_cost()
+    for name, rewrite, costed in OPTIMIZATION_PASSES:
+        rewrites = rewrite(graph)
+        new_cost = graph.estimate_cost()
+        report.append({'pass': name, 'rewrites': rewrites, 'saved': cost - new_cost if costed else None})
+        cost = new_cost
+    return report
@@ -0,0 +1,132 @@
+import shutil
+from pathlib import Path
+from typing import Any, List, Optional
+
+from lib.render_cache import RenderCache, commit, hash_file, partial_path
+
+GENERATION_CACHE_VERSION = 1
+GENERATION_CACHE_DIR_NAME = "cache"
+CACHED_IMAGE_SUFFIX = ".png"
+
+
+class GenerationCache(RenderCache):
+    """
+    Content-addressed store of generated images.
+
+    An entry is keyed by everything sent to the image API: prompt, model,
+    aspect ratio, the bytes of every reference image (so a retouched
+    reference is a new key, while a renamed one is not) and the size the
+    references are downsized to before sending. With `bypass`, every
+    lookup misses, so images are generated again and replace their entries.
+    """
+
+    def __init__(self, cache_dir: Path, bypass: bool = False):
+        super().__init__(cache_dir)
+        self.bypass = bypass
+
+    def image_key(
+        self,
+        prompt: str,
+        model_name: str,
+        aspect_ratio: str,
+        style_reference_paths: Optional[List[str]] = None,
+        reference_max_side: Optional[int] = None
+    ) -> str:
+        references = [hash_file(p) for p in style_reference_paths or []]
+        parts = ['image', GENERATION_CACHE_VERSION, prompt, model_name, aspect_ratio, references]
+        # Only downsized references change the request; keys of full-size ones stay as they were
+        if references and reference_max_side:
+            parts.append({'reference_max_side': reference_max_side})
+        return self.key(*parts)
+
+    def lookup(self, *paths: Path) -> bool:
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return False
+        return super().lookup(*paths)
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits}/{total} cached, {self.misses} to generate"
+
+
+class CachedImageGenerator:
+    def __init__(self, generator: Any, cache: GenerationCache, reference_max_side: Optional[int] = None):
+        """
+        Wraps an image generator (GoogleImageGenerator, FakeImageGenerator, ...)
+        with a GenerationCache.
+
+        Args:
+            generator: Anything with GoogleImageGenerator's generate_images.
+            cache: Where generated images are stored.
+            reference_max_side: The generator's reference_max_side, part of the cache key.
+        """
+        self.generator = generator
+        self.cache = cache
+        self.reference_max_side = reference_max_side
+
+    def entries(
+        self,
+        prompt: str,
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "imagen-4.0-fast-generate-001",
+        count: int = 1
+    ) -> List[Path]:
+        """Cache entries of a generate_images call with these arguments for `count` images."""
+        key = self.cache.image_key(prompt, model_name, aspect_ratio, style_reference_paths, self.reference_max_side)
+        if count == 1:
+            return [self.cache.path(key, CACHED_IMAGE_SUFFIX)]
+        return [self.cache.path(key, f"_v{k}{CACHED_IMAGE_SUFFIX}") for k in range(1, count + 1)]
+
+    def generate_image(
+        self,
+        prompt: str,
+        output_path: str,
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "imagen-4.0-fast-generate-001"
+    ) -> str:
+        """
+        Same signature and result as GoogleImageGenerator.generate_image (and
+        the same defaults). A cached image is copied to `output_path` without
+        calling the generator; a generated one is added to the cache.
+        """
+        return self.generate_images(prompt, [output_path], style_reference_paths, aspect_ratio, model_name)[0]
+
+    def generate_images(
+        self,
+        prompt: str,
+        output_paths: List[str],
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "imagen-4.0-fast-generate-001"
+    ) -> List[str]:
+        """
+        Same as GoogleImageGenerator.generate_images. A set of candidates is
+        cached as a whole: restored if every one is cached, generated otherwise.
+        """
+        entries = self.entries(prompt, style_reference_paths, aspect_ratio, model_name, len(output_paths))
+
+        if self.cache.lookup(*entries):
+            for entry, output_path in zip(entries, output_paths):
+                output_file = Path(output_path)
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry, partial_path(output_file))
+                commit(partial_path(output_file), output_file)
+                print(f"Image restored from cache to {output_path}")
+            return [str(Path(p)) for p in output_paths]
+
+        result_paths = self.generator.generate_images(
+            prompt=prompt,
+            output_paths=output_paths,
+            style_reference_paths=style_reference_paths,
+            aspect_ratio=aspect_ratio,
+            model_name=model_name
+        )
+        for entry, result_path in zip(entries, result_paths):
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(result_path, partial_path(entry))
+            commit(partial_path(entry), entry)
+        return result_paths
@@ -0,0 +1,81 @@
+"""
+Journal of generated scenario images.
+
+The journal is a JSON-lines file in the generations directory. Every line
+records a shot whose image was generated: the hash of the inputs sent to the
+API (see GenerationCache.image_key) and the SHA-256 of the image written.
+Lines are flushed and fsynced as they are written, so a run that crashes
+keeps every shot it finished; a line it cut short is skipped on load, and
+the last line of a shot wins.
+
+On resume, a shot is up to date only if its inputs are unchanged and its
+image still exists with the recorded hash.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+from lib.render_cache import hash_file
+
+GENERATION_JOURNAL_NAME = 'journal.jsonl'
+
+
+class GenerationJournal:
+    """Records generated shots so a rerun can skip the ones that are up to date."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.shots: Dict[str, Dict] = {}  # shot id -> last entry
+        self._torn_tail = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            return
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; the lines after it are still valid
+                continue
+            if entry.get('event') == 'generated':
+                self.shots[entry['shot']] = entry
+        # The next record starts on a fresh line instead of continuing a torn one
+        self._torn_tail = bool(text) and not text.endswith('\n')
+
+    def is_current(self, shot_id: str, inputs: str, output_path: Path) -> bool:
+        """True if the shot was generated from the same inputs and its image is intact."""
+        entry = self.shots.get(shot_id)
+        if entry is None or entry['inputs'] != inputs:
+            return False
+        output_path = Path(output_path)
+        return output_path.exists() and hash_file(output_path) == entry['sha256']
+
+    def record(self, shot_id: str, inputs: str, output_path: Path) -> None:
+        """Record a generated shot with the hash of its inputs and of its image."""
+        entry = {
+            'event': 'generated',
+            'shot': shot_id,
+            'inputs': inputs,
+            'output': str(output_path),
+            'sha256': hash_file(Path(output_path)),
+            'time': time.time(),
+        }
+        with self._lock:
+            self.shots[shot_id] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if self._torn_tail:
+                    f.write('\n')
+                    self._torn_tail = False
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
@@ -0,0 +1,181 @@
+"""
+Pacing and retries for image generation requests.
+
+`RateLimitedGenerator` wraps an image generator so that concurrent shots
+share one request budget: a `TokenBucket` spaces requests out to the API's
+rate limit, and a `CircuitBreaker` pauses every request for a while after
+several quota or server errors in a row. The caller retries failed requests
+that `is_retryable` accepts, waiting `backoff_delay` between attempts.
+"""
+
+import random
+import re
+import threading
+import time
+from typing import Any, List, Optional
+
+# Errors worth retrying: quota (429), timeouts and server-side failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_STATUSES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"}
+RETRYABLE_ERROR_TYPES = {"ConnectionError", "TimeoutError", "TransportError"}
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF_BASE = 2.0  # seconds before the first retry, doubled per attempt
+DEFAULT_BACKOFF_CAP = 60.0
+
+# The circuit opens after this many retryable failures in a row and pauses all requests
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 30.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed request may succeed when sent again: quota and transient
+    server or network errors are, safety blocks and bad requests are not.
+    """
+    if any(cls.__name__ in RETRYABLE_ERROR_TYPES for cls in type(error).__mro__):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    status = getattr(error, "status", None)
+    if isinstance(status, str):
+        return status in RETRYABLE_STATUSES
+    # Errors without a code: only a status name in the message counts, never bare digits
+    return any(word in RETRYABLE_STATUSES for word in re.findall(r"[A-Z_]+", str(error)))
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_BACKOFF_CAP, rng: Optional[random.Random] = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (1-based): exponential
+    backoff with full jitter, so retries of shots that failed together spread out.
+    """
+    return (rng or random).uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        """
+        Rate limiter: requests take a token, tokens refill at `rate_per_minute`
+        up to `burst`, so at most `burst` requests go out back to back.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, cooldown: float = DEFAULT_COOLDOWN):
+        """
+        Stops all requests for `cooldown` seconds after `failure_threshold`
+        retryable failures in a row, instead of letting every worker keep
+        hitting a throttled or failing API. After the pause one more failure
+        opens it again; a success closes it.
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block while the circuit is open."""
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record(self, success: bool) -> None:
+        with self.lock:
+            if success:
+                self.failures = 0
+                return
+            self.failures += 1
+            now = time.monotonic()
+            # Failures of requests sent before the circuit opened don't extend the pause
+            if self.failures >= self.failure_threshold and now >= self.open_until:
+                self.open_until = now + self.cooldown
+                self.trips += 1
+                print(f"Circuit open: {self.failures} failures in a row, pausing requests for {self.cooldown:.0f}s")
+
+
+class RateLimitedGenerator:
+    def __init__(self, generator: Any, bucket: Optional[TokenBucket] = None, breaker: Optional[CircuitBreaker] = None):
+        """
+        Wraps an image generator so every request waits for the circuit breaker
+        and a rate limiter token. Wrap it in the generation cache, so cache hits
+        don't spend tokens.
+        """
+        self.generator = generator
+        self.bucket = bucket
+        self.breaker = breaker
+
+    def generate_image(
+        self,
+        prompt: str,
+        output_path: str,
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "imagen-4.0-fast-generate-001"
+    ) -> str:
+        """Same signature and result as GoogleImageGenerator.generate_image."""
+        return self.generate_images(prompt, [output_path], style_reference_paths, aspect_ratio, model_name)[0]
+
+    def generate_images(
+        self,
+        prompt: str,
+        output_paths: List[str],
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "imagen-4.0-fast-generate-001"
+    ) -> List[str]:
+        """Same as GoogleImageGenerator.generate_images; one token per call."""
+        if self.breaker:
+            self.breaker.wait()
+        if self.bucket:
+            self.bucket.acquire()
+        try:
+            result = self.generator.generate_images(
+                prompt=prompt,
+                output_paths=output_paths,
+                style_reference_paths=style_reference_paths,
+                aspect_ratio=aspect_ratio,
+                model_name=model_name
+            )
+        except Exception as e:
+            # Errors specific to a request (e.g. safety blocks) say nothing about
+            # the API's health, so they neither count as failures nor reset the streak
+            if self.breaker and is_retryable(e):
+                self.breaker.record(False)
+            raise
+        if self.breaker:
+            self.breaker.record(True)
+        return result
+
+    def report(self) -> str:
+        parts = []
+        if self.bucket:
+            parts.append(f"{self.bucket.waited:.1f}s waiting for the rate limit (summed over workers)")
+        if self.breaker:
+            parts.append(f"circuit opened {self.breaker.trips} times")
+        return ", ".join(parts)
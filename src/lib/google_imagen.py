@@ -2,10 +2,22 @@ import os
 from pathlib import Path
 from typing import List, Optional
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+
+from lib.reference_assets import ReferenceAssetCache
+
+# Style references are shared by most shots: every file is loaded and encoded
+# into a request part once per process
+reference_parts = ReferenceAssetCache(lambda data, mime_type: types.Part.from_bytes(data=data, mime_type=mime_type))
+
+# Images per request: the most Imagen returns
+IMAGEN_MAX_IMAGES = 4
+
+# Candidates asked of Gemini per request, for models that accept more than one
+GEMINI_MAX_CANDIDATES = 4
 
 class GoogleImageGenerator:
-    def __init__(self, api_key: Optional[str] = None, project_id: Optional[str] = None, location: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, project_id: Optional[str] = None, location: Optional[str] = None, reference_max_side: Optional[int] = None):
         """
         Initialize the GoogleImageGenerator.
         
@@ -13,7 +25,11 @@ class GoogleImageGenerator:
             api_key: Google API Key. If None, tries to read from GOOGLE_API_KEY env var.
             project_id: Optional project to use (if using Vertex AI instead of AI Studio API key).
             location: Optional location if using Vertex AI.
+            reference_max_side: Downsize style references to this many pixels on their longer side (default: send as is).
         """
+        self.reference_max_side = reference_max_side
+        # Gemini models that rejected several candidates per request, asked for one at a time
+        self.single_candidate_models = set()
         # Try finding API key
         self.api_key = api_key or os.environ.get("GOOGLE_API_KEY")
         self.project_id = project_id or os.environ.get("GOOGLE_CLOUD_PROJECT")
@@ -53,8 +69,31 @@ class GoogleImageGenerator:
         Returns:
             Path to the saved image.
         """
+        return self.generate_images(prompt, [output_path], style_reference_paths, aspect_ratio, model_name)[0]
+
+    def generate_images(
+        self,
+        prompt: str,
+        output_paths: List[str],
+        style_reference_paths: Optional[List[str]] = None,
+        aspect_ratio: str = "1:1",
+        model_name: str = "imagen-4.0-fast-generate-001"
+    ) -> List[str]:
+        """
+        Generate one candidate image per output path for the same prompt, in as
+        few requests as the model allows: Imagen returns up to
+        IMAGEN_MAX_IMAGES images per request, Gemini is asked for up to
+        GEMINI_MAX_CANDIDATES candidates and re-asked for any it didn't return.
+        Gemini models that reject several candidates (INVALID_ARGUMENT) are
+        asked once per missing image instead.
+        
+        Args: as for generate_image, with `output_paths` instead of `output_path`.
         
-        print(f"Generating image with model: {model_name}")
+        Returns:
+            Paths to the saved images.
+        """
+        
+        print(f"Generating {len(output_paths)} image(s) with model: {model_name}")
         print(f"Prompt: {prompt}")
         
         # Prepare contents
@@ -69,6 +108,18 @@ class GoogleImageGenerator:
         # Check if using a Gemini model (which uses generate_content) vs Imagen model (generate_images)
         is_gemini = "gemini" in model_name.lower() or "flash" in model_name.lower() or "pro" in model_name.lower() or "veo" in model_name.lower()
         
+        saved = []
+        
+        def save(image_bytes: bytes) -> None:
+            output_file = Path(output_paths[len(saved)])
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            
+            with open(output_file, "wb") as f:
+                f.write(image_bytes)
+                
+            print(f"Image saved to {output_file}")
+            saved.append(str(output_file))
+        
         try:
             if is_gemini:
                 print(f"Using Gemini-style generation (generate_content) for model: {model_name}")
@@ -82,15 +133,9 @@ class GoogleImageGenerator:
                         # Ensure absolute path resolution
                         p = Path(ref_path).resolve()
                         if p.exists():
-                            # We can pass PIL images or file objects. 
-                            # google-genai supports passing local file paths directly if using File API, 
-                            # or we can read bytes and pass as Part.
-                            # For simplicity with the new SDK, let's try reading as bytes/PIL.
+                            # Passed as pre-encoded Parts, cached across shots (see reference_parts)
                             try:
-                                import PIL
-                                from PIL import Image
-                                img = Image.open(p)
-                                contents.append(img)
+                                contents.append(reference_parts.get(p, self.reference_max_side))
                             except ImportError as e:
                                 print(f"Warning: Could not import PIL: {e}. content not added.")
                             except Exception as e:
@@ -98,96 +143,98 @@ class GoogleImageGenerator:
                         else:
                             print(f"Warning: Reference image not found: {ref_path}")
 
-                # Config for Gemini Image Generation
-                # For Gemini 3 Pro Image, we use generate_content with image_config.
-                # output_mime_type in ImageConfig is apparently not supported by the API yet or for this model.
-                
-                gen_config = types.GenerateContentConfig(
-                    image_config=types.ImageConfig(
-                        aspect_ratio=ratio
+                while len(saved) < len(output_paths):
+                    remaining = len(output_paths) - len(saved)
+                    candidates = 1
+                    if model_name not in self.single_candidate_models:
+                        candidates = min(remaining, GEMINI_MAX_CANDIDATES)
+                    
+                    # Config for Gemini Image Generation
+                    # For Gemini 3 Pro Image, we use generate_content with image_config.
+                    # output_mime_type in ImageConfig is apparently not supported by the API yet or for this model.
+                    # Several candidates are asked for in one request; not every model returns them all.
+                    gen_config = types.GenerateContentConfig(
+                        image_config=types.ImageConfig(
+                            aspect_ratio=ratio
+                        ),
+                        candidate_count=candidates if candidates > 1 else None
                     )
-                )
 
-                response = self.client.models.generate_content(
-                    model=model_name,
-                    contents=contents,
-                    config=gen_config
-                )
-                
-                # Extract image from response
-                # Response -> candidates -> content -> parts -> inline_data / or executable_code etc.
-                # For images, it likely comes as inline_data (base64) or similar.
-                
-                generated_image_bytes = None
-                
-                if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                    for part in response.candidates[0].content.parts:
-                        if part.inline_data and part.inline_data.mime_type and part.inline_data.mime_type.startswith("image/"):
-                            generated_image_bytes = part.inline_data.data
-                            break
-                        # Sometimes it might be in other fields depending on API version, 
-                        # but inline_data is standard for generated media in Gem output.
-                
-                if generated_image_bytes is None:
-                     # Check if it was filtered
-                     if response.prompt_feedback:
-                         print(f"Prompt Feedback: {response.prompt_feedback}")
-                     raise RuntimeError("No image data found in Gemini response.")
-                
-                # Save
-                output_file = Path(output_path)
-                output_file.parent.mkdir(parents=True, exist_ok=True)
-                
-                with open(output_file, "wb") as f:
-                    f.write(generated_image_bytes)
+                    try:
+                        response = self.client.models.generate_content(
+                            model=model_name,
+                            contents=contents,
+                            config=gen_config
+                        )
+                    except errors.ClientError as e:
+                        if candidates == 1 or e.status != "INVALID_ARGUMENT":
+                            raise
+                        print(f"{model_name} rejected {candidates} candidates per request ({e.message}), asking for one at a time.")
+                        self.single_candidate_models.add(model_name)
+                        continue
                     
-                print(f"Image saved to {output_path}")
-                return str(output_file)
+                    # Extract images from response
+                    # Response -> candidates -> content -> parts -> inline_data / or executable_code etc.
+                    # For images, it likely comes as inline_data (base64) or similar.
+                    # One image is taken per candidate.
+                    
+                    found = 0
+                    for candidate in response.candidates or []:
+                        if not (candidate.content and candidate.content.parts):
+                            continue
+                        for part in candidate.content.parts:
+                            if part.inline_data and part.inline_data.mime_type and part.inline_data.mime_type.startswith("image/"):
+                                if len(saved) < len(output_paths):
+                                    save(part.inline_data.data)
+                                    found += 1
+                                break
+                            # Sometimes it might be in other fields depending on API version, 
+                            # but inline_data is standard for generated media in Gem output.
+                    
+                    if found == 0:
+                         # Check if it was filtered
+                         if response.prompt_feedback:
+                             print(f"Prompt Feedback: {response.prompt_feedback}")
+                         raise RuntimeError("No image data found in Gemini response.")
+                
+                return saved
 
             else:
                 # Legacy Imagen generation
-                # Generate image configuration
-                config = types.GenerateImagesConfig(
-                    number_of_images=1,
-                    aspect_ratio=ratio,
-                    include_rai_reason=True,
-                    output_mime_type="image/png"
-                )
+                while len(saved) < len(output_paths):
+                    # Generate image configuration
+                    config = types.GenerateImagesConfig(
+                        number_of_images=min(len(output_paths) - len(saved), IMAGEN_MAX_IMAGES),
+                        aspect_ratio=ratio,
+                        include_rai_reason=True,
+                        output_mime_type="image/png"
+                    )
 
-                response = self.client.models.generate_images(
-                    model=model_name,
-                    prompt=full_prompt,
-                    config=config
-                )
-                
-                if response.generated_images:
-                    generated_image = response.generated_images[0]
+                    response = self.client.models.generate_images(
+                        model=model_name,
+                        prompt=full_prompt,
+                        config=config
+                    )
                     
-                    if not generated_image.image:
-                        # Image was filtered or not returned
-                        failure_reason = "Unknown reason"
-                        if hasattr(generated_image, 'rai_status_code'):
-                             failure_reason = f"RAI Status Code: {generated_image.rai_status_code}"
-                        
-                        # Try to inspect safety attributes if available
-                        raise RuntimeError(f"Image generation returned a response but no image data. This is often due to safety filters. Details: {failure_reason}")
-
-                    image_bytes = generated_image.image.image_bytes
+                    if not response.generated_images:
+                        raise RuntimeError("No images returned from API.")
                     
-                    if image_bytes is None:
-                        raise RuntimeError("Generated image contains no byte data.")
-
-                    # Save the image
-                    output_file = Path(output_path)
-                    output_file.parent.mkdir(parents=True, exist_ok=True)
+                    found = 0
+                    failure_reason = "Unknown reason"
+                    for generated_image in response.generated_images:
+                        if not generated_image.image or generated_image.image.image_bytes is None:
+                            # Image was filtered or not returned
+                            if hasattr(generated_image, 'rai_status_code'):
+                                 failure_reason = f"RAI Status Code: {generated_image.rai_status_code}"
+                            continue
+                        save(generated_image.image.image_bytes)
+                        found += 1
                     
-                    with open(output_file, "wb") as f:
-                        f.write(image_bytes)
-                        
-                    print(f"Image saved to {output_path}")
-                    return str(output_file)
-                else:
-                    raise RuntimeError("No images returned from API.")
+                    if found == 0:
+                        # Try to inspect safety attributes if available
+                        raise RuntimeError(f"Image generation returned a response but no image data. This is often due to safety filters. Details: {failure_reason}")
+                
+                return saved
 
         except Exception as e:
             print(f"Error generating image: {e}")
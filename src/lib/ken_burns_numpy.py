@@ -0,0 +1,152 @@
+"""
+NumPy Ken Burns engine.
+
+Computes every frame of a Ken Burns move as a bilinear resample of the decoded
+image and streams raw RGB frames to an encoder. Unlike ffmpeg's zoompan, the
+viewport position is not rounded to whole pixels, so the motion is smooth
+without rendering at a supersampled resolution first.
+
+The motion curves mirror `generate_ken_burns_filter` in scripts/assemble_video.py
+so both engines can be compared frame for frame.
+"""
+
+from pathlib import Path
+from typing import BinaryIO, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def motion_curve(
+    effect_type: str,
+    num_frames: int,
+    zoom_min: float = 1.0,
+    zoom_max: float = 1.1
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-frame zoom and viewport origin for a Ken Burns effect.
+
+    Returns (zoom, x, y) arrays of length `num_frames`. x and y are the top-left
+    corner of the viewport as a fraction of the image width/height, i.e. the
+    zoompan expressions divided by iw/ih.
+    """
+    # zoompan's 'on' runs 0..d-1 and the filter uses on/d as normalized time
+    t = np.arange(num_frames, dtype=np.float64) / num_frames
+
+    if effect_type == 'zoom_in':
+        zoom = zoom_min + (zoom_max - zoom_min) * t
+        x = 0.5 - 0.5 / zoom
+        y = 0.5 - 0.5 / zoom
+    elif effect_type == 'zoom_out':
+        zoom = zoom_max - (zoom_max - zoom_min) * t
+        x = 0.5 - 0.5 / zoom
+        y = 0.5 - 0.5 / zoom
+    elif effect_type == 'pan_left':
+        zoom = np.full_like(t, zoom_max)
+        x = (1 - 1 / zoom) * (1 - t)
+        y = 0.5 - 0.5 / zoom
+    elif effect_type == 'pan_right':
+        zoom = np.full_like(t, zoom_max)
+        x = (1 - 1 / zoom) * t
+        y = 0.5 - 0.5 / zoom
+    elif effect_type == 'pan_up':
+        zoom = np.full_like(t, zoom_max)
+        x = 0.5 - 0.5 / zoom
+        y = (1 - 1 / zoom) * (1 - t)
+    elif effect_type == 'zoom_pan_combo':
+        zoom = zoom_min + (zoom_max - zoom_min) * t
+        x = (1 - 1 / zoom) * t
+        y = 0.5 - 0.5 / zoom
+    else:
+        # Default: same as the zoompan fallback ("slow zoom in" to zoom_max-0.1)
+        zoom = zoom_min + ((zoom_max - 0.1) - zoom_min) * t
+        x = 0.5 - 0.5 / zoom
+        y = 0.5 - 0.5 / zoom
+
+    return zoom, x, y
+
+
+def load_image(image_path: Path, width: int, height: int) -> np.ndarray:
+    """
+    Decode an image, scale it to cover width x height and center-crop it,
+    like the `scale=...:force_original_aspect_ratio=increase,crop=...` chain.
+    Returns a float32 array of shape (height, width, 3).
+    """
+    with Image.open(image_path) as img:
+        img = img.convert('RGB')
+        scale = max(width / img.width, height / img.height)
+        scaled_w = max(width, round(img.width * scale))
+        scaled_h = max(height, round(img.height * scale))
+        img = img.resize((scaled_w, scaled_h), Image.LANCZOS)
+        left = (scaled_w - width) // 2
+        top = (scaled_h - height) // 2
+        img = img.crop((left, top, left + width, top + height))
+        return np.asarray(img, dtype=np.float32)
+
+
+def _sample_axis(origin: float, span: float, out_size: int, src_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Source indices and weights for resampling one axis of the viewport."""
+    # Map output pixel centers into the viewport
+    coords = origin + (np.arange(out_size) + 0.5) * (span / out_size) - 0.5
+    coords = np.clip(coords, 0, src_size - 1)
+    i0 = np.floor(coords).astype(np.intp)
+    i1 = np.minimum(i0 + 1, src_size - 1)
+    w = (coords - i0).astype(np.float32)
+    return i0, i1, w
+
+
+def render_frame(
+    image: np.ndarray,
+    zoom: float,
+    x: float,
+    y: float,
+    out_width: int,
+    out_height: int
+) -> np.ndarray:
+    """
+    Resample the viewport (x, y, 1/zoom of the image) to out_width x out_height.
+    Bilinear and separable: rows first, then columns. Returns uint8 RGB.
+    """
+    src_h, src_w = image.shape[:2]
+    y0, y1, wy = _sample_axis(y * src_h, src_h / zoom, out_height, src_h)
+    x0, x1, wx = _sample_axis(x * src_w, src_w / zoom, out_width, src_w)
+
+    wy = wy[:, None, None]
+    rows = image[y0] * (1 - wy) + image[y1] * wy
+    wx = wx[None, :, None]
+    frame = rows[:, x0] * (1 - wx) + rows[:, x1] * wx
+    return (frame + 0.5).astype(np.uint8)
+
+
+def iter_frames(
+    image: np.ndarray,
+    effect_type: str,
+    num_frames: int,
+    out_width: int,
+    out_height: int,
+    zoom_min: float = 1.0,
+    zoom_max: float = 1.1
+) -> Iterator[np.ndarray]:
+    """Yield every frame of the Ken Burns move as a uint8 RGB array."""
+    zooms, xs, ys = motion_curve(effect_type, num_frames, zoom_min, zoom_max)
+    for zoom, x, y in zip(zooms, xs, ys):
+        yield render_frame(image, zoom, x, y, out_width, out_height)
+
+
+def stream_frames(
+    image_path: Path,
+    effect_type: str,
+    num_frames: int,
+    width: int,
+    height: int,
+    sink: BinaryIO,
+    zoom_min: float = 1.0,
+    zoom_max: float = 1.1
+) -> None:
+    """
+    Render a shot and write raw rgb24 frames to `sink` (an encoder's stdin).
+    The encoder must be opened with `-f rawvideo -pix_fmt rgb24 -s {width}x{height}`.
+    """
+    image = load_image(image_path, width, height)
+    for frame in iter_frames(image, effect_type, num_frames, width, height, zoom_min, zoom_max):
+        sink.write(frame.tobytes())
@@ -0,0 +1,105 @@
+"""
+Style reference images, prepared once per process.
+
+Most shots of a scenario send the same style references. `encode_reference`
+turns a reference file into the bytes sent to the API, passing supported
+formats through untouched and downsizing larger images to `max_side`, and
+`ReferenceAssetCache` keeps the resulting request parts in a bounded LRU, so
+every reference is read and encoded once however many shots use it.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+# Total encoded bytes kept before the least recently used references are dropped
+DEFAULT_REFERENCE_CACHE_BYTES = 64 * 1024 * 1024
+
+# Re-encoding quality for downsized references
+REFERENCE_JPEG_QUALITY = 90
+
+# Formats the image APIs accept as they are, so references in them are sent without decoding
+PASSTHROUGH_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+}
+
+
+def encode_reference(path: Path, max_side: Optional[int] = None) -> Tuple[bytes, str]:
+    """
+    Bytes and MIME type of a reference image as it should be sent.
+
+    Images in a format the API accepts that already fit `max_side` are sent as
+    stored (only the header is read); others are decoded once, downsized so
+    their longer side is at most `max_side`, and re-encoded as JPEG (PNG if
+    they have transparency).
+    """
+    from PIL import Image
+
+    with Image.open(path) as img:
+        fits = max_side is None or max(img.size) <= max_side
+        if fits and img.format in PASSTHROUGH_MIME_TYPES:
+            return Path(path).read_bytes(), PASSTHROUGH_MIME_TYPES[img.format]
+
+        img.load()
+        if max_side is not None:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(buffer, format="PNG")
+            return buffer.getvalue(), "image/png"
+        img.convert("RGB").save(buffer, format="JPEG", quality=REFERENCE_JPEG_QUALITY)
+        return buffer.getvalue(), "image/jpeg"
+
+
+class ReferenceAssetCache:
+    def __init__(self, make_part: Callable[[bytes, str], Any], max_bytes: int = DEFAULT_REFERENCE_CACHE_BYTES):
+        """
+        Process-wide LRU cache of reference images turned into request parts.
+
+        Every reference is loaded, optionally downsized and encoded once; later
+        shots get the same ready-to-send part. Entries are keyed by the file's
+        path, size and modification time, so an edited reference is reloaded.
+
+        Args:
+            make_part: Builds the part sent to the API from (bytes, mime_type).
+            max_bytes: Encoded bytes to keep; least recently used entries are evicted beyond it.
+        """
+        self.make_part = make_part
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, path: Path, max_side: Optional[int] = None) -> Any:
+        """The part for a reference image. Raises OSError if it can't be read."""
+        path = Path(path).resolve()
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns, max_side)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        # Encoded outside the lock, so concurrent shots don't wait on each other's references
+        data, mime_type = encode_reference(path, max_side)
+        part = self.make_part(data, mime_type)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = (part, len(data))
+                self.size += len(data)
+                while self.size > self.max_bytes and len(self.entries) > 1:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.size -= evicted
+        return part
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits}/{total} reused, {len(self.entries)} cached ({self.size / 1024 / 1024:.1f} MB)"
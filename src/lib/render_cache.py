@@ -0,0 +1,108 @@
+"""
+Content-addressed cache for rendered artifacts.
+
+Segments, prepared inputs, mask clips and audio tracks are stored under a key
+that hashes everything affecting their contents (source file digests, filter
+settings, codec arguments), so a changed input maps to a new entry instead of
+invalidating an old one. Artifacts are written to a partial file and moved
+into place with `commit`, so an interrupted render never leaves an entry that
+looks complete.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the SHA-256 hex digest of a byte string."""
+    return hashlib.sha256(data).hexdigest()
+
+
+# Memoized file digests, keyed by (path, size, mtime) so edited files are re-hashed.
+_file_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_file_hash_lock = threading.Lock()
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents.
+    Results are memoized per process as long as the file's size and mtime don't change.
+    """
+    stat = os.stat(path)
+    memo_key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    with _file_hash_lock:
+        if memo_key in _file_hash_memo:
+            return _file_hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    result = digest.hexdigest()
+
+    with _file_hash_lock:
+        _file_hash_memo[memo_key] = result
+    return result
+
+
+def hash_params(*parts: Any) -> str:
+    """
+    Return a stable SHA-256 key for a set of JSON-serializable parameters.
+    Paths are converted to strings; dict keys are sorted.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hash_bytes(payload.encode('utf-8'))
+
+
+class RenderCache:
+    """
+    Content-addressed store for rendered artifacts.
+
+    Every entry is a file named after the hash of everything that affects its
+    contents, so a changed input simply maps to a new key and stale entries
+    are never reused. Writers render into a partial file and `commit` it, so an
+    interrupted render never leaves an entry that looks complete.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, *parts: Any) -> str:
+        """Build a cache key from the given parameters."""
+        return hash_params(*parts)
+
+    def path(self, key: str, suffix: str) -> Path:
+        """Location of the entry for `key`; `suffix` includes the extension (e.g. '_body.mp4')."""
+        return self.cache_dir / f"{key}{suffix}"
+
+    def lookup(self, *paths: Path) -> bool:
+        """Return True (and count a hit) if all given entries exist, otherwise count a miss."""
+        found = all(Path(p).exists() for p in paths)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits}/{total} cached, {self.misses} to render"
+
+
+def partial_path(path: Path) -> Path:
+    """Temporary path an artifact is written to before it is committed (keeps the extension)."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.partial{path.suffix}")
+
+
+def commit(partial: Path, final: Path) -> None:
+    """Atomically move a finished partial artifact into place."""
+    os.replace(partial, final)
@@ -0,0 +1,149 @@
+"""
+Checkpoint journal for resumable renders.
+
+The journal is a JSON-lines file next to the render outputs. The first line
+describes the render it belongs to (plan hash, mode, ...); every following
+line records a finished job together with the SHA-256 of each file it
+produced and the key of its inputs (see `assign_keys`). Lines are flushed
+and fsynced as they are written, so a render that is killed (OOM,
+preemption, Ctrl-C) loses at most the jobs that were still running; a line
+it cut short is skipped on load.
+
+On resume, a job counts as done only if the journal belongs to the same
+render, the job's inputs have the same key and every output it recorded
+still exists with the same hash. The header leaves out the source images,
+so replacing one image only re-runs the jobs that read it.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from lib.render_cache import hash_file, hash_params
+
+
+class RenderJournal:
+    """Records finished render jobs so an interrupted render can pick up where it stopped."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.done: Dict[str, Dict[str, str]] = {}  # job name -> {output path: sha256}
+        self.keys: Dict[str, Optional[str]] = {}  # job name -> input key
+        self.resumed = 0
+        self._torn_tail = False
+        self._lock = threading.Lock()
+
+    def start(self, header: Dict, resume: bool = False) -> bool:
+        """
+        Begin journaling the render described by `header`.
+        With `resume`, keep the entries of an existing journal for the same
+        render and return True; otherwise start a fresh journal.
+        """
+        if resume and self._load(header):
+            return True
+        self.done = {}
+        self.keys = {}
+        self._torn_tail = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            self._write_line(f, {'event': 'start', 'render': header, 'time': time.time()})
+        return False
+
+    def _load(self, header: Dict) -> bool:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            return False
+
+        entries = []
+        for line in text.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A line cut short by an interruption; the lines after it are still valid
+                continue
+        if not entries or entries[0].get('event') != 'start' or entries[0].get('render') != header:
+            return False
+
+        done = [entry for entry in entries[1:] if entry.get('event') == 'done']
+        self.done = {entry['job']: entry['outputs'] for entry in done}
+        self.keys = {entry['job']: entry.get('key') for entry in done}
+        # The next record starts on a fresh line instead of continuing a torn one
+        self._torn_tail = not text.endswith('\n')
+        return True
+
+    def is_done(self, job: Dict) -> bool:
+        """True if the job finished in the journaled render and its outputs are intact."""
+        outputs = self.done.get(job['name'])
+        if outputs is None or job.get('key') is None or self.keys.get(job['name']) != job['key']:
+            return False
+        for path, digest in outputs.items():
+            if not Path(path).exists() or hash_file(Path(path)) != digest:
+                print(f"  {job['name']}: checkpoint doesn't match {Path(path).name}, re-rendering")
+                return False
+        with self._lock:
+            self.resumed += 1
+        return True
+
+    def record(self, job: Dict) -> None:
+        """Record a finished job and the hashes of the files it committed."""
+        outputs = {str(final): hash_file(final) for _, final in job.get('commit', [])}
+        with self._lock:
+            self.done[job['name']] = outputs
+            self.keys[job['name']] = job.get('key')
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if self._torn_tail:
+                    f.write('\n')
+                    self._torn_tail = False
+                self._write_line(f, {
+                    'event': 'done', 'job': job['name'], 'key': job.get('key'),
+                    'outputs': outputs, 'time': time.time()
+                })
+
+    @staticmethod
+    def _write_line(f, entry: Dict) -> None:
+        f.write(json.dumps(entry, sort_keys=True) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def job_inputs(job: Dict) -> List[str]:
+    """Files a job reads: its ffmpeg inputs and the images its frame feed reads ('sources')."""
+    cmd = job.get('cmd', [])
+    inputs = [cmd[i + 1] for i, arg in enumerate(cmd[:-1]) if arg == '-i']
+    return inputs + [str(path) for path in job.get('sources', [])]
+
+
+def assign_keys(stages: List[List[Dict]]) -> None:
+    """
+    Set job['key'] to a hash of everything the job reads, in stage order:
+    the contents of existing input files and the keys of the earlier jobs
+    that produce the others. A job reading the output of a job that isn't
+    checkpointed gets no key, so it always runs.
+    """
+    produced: Dict[str, Optional[str]] = {}
+    for stage in stages:
+        for job in stage:
+            parts = []
+            for path in job_inputs(job):
+                if path in produced:
+                    parts.append(produced[path])
+                elif Path(path).is_file():
+                    parts.append(hash_file(Path(path)))
+                else:
+                    parts.append(path)
+            job['key'] = None if None in parts else hash_params(parts)
+            if job.get('commit'):
+                for _, final in job['commit']:
+                    produced[str(final)] = job['key']
+            elif job.get('cmd'):
+                produced[str(job['cmd'][-1])] = None
+
+
+def resumable(job: Dict, journal: Optional[RenderJournal]) -> bool:
+    """Jobs that commit files are checkpointed; the rest always run."""
+    return journal is not None and bool(job.get('commit'))
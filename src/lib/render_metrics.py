@@ -0,0 +1,248 @@
+"""
+Live progress and resource metrics for ffmpeg render jobs.
+
+ffmpeg is run with `-progress pipe:1`, which makes it print blocks of
+`key=value` lines (frame, fps, out_time_us, speed, ...) terminated by a
+`progress=continue|end` line. `RenderMonitor` aggregates those blocks over all
+running jobs into one status line with frames/s, speed multiple, the shot
+being rendered and an ETA.
+
+Each finished process is reaped with `os.wait4` to get its own CPU time and
+peak RSS, and the monitor writes them per job, per stage and per Ken Burns
+effect to a metrics JSON file.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+PROGRESS_ARGS = ['-progress', 'pipe:1']
+
+
+def with_progress(cmd: List[str]) -> List[str]:
+    """
+    Ask ffmpeg for machine-readable progress on stdout instead of its stats
+    line (global options go first).
+    """
+    nostats = [] if '-nostats' in cmd else ['-nostats']
+    return [cmd[0], *PROGRESS_ARGS, *nostats, *cmd[1:]]
+
+
+def read_progress(stream: IO[bytes], on_block: Callable[[Dict[str, str]], None]) -> None:
+    """Parse an ffmpeg `-progress` stream, calling `on_block` once per report."""
+    block: Dict[str, str] = {}
+    for raw in stream:
+        key, _, value = raw.decode('utf-8', 'replace').strip().partition('=')
+        if not key:
+            continue
+        block[key] = value.strip()
+        if key == 'progress':
+            on_block(block)
+            block = {}
+
+
+def wait_rusage(proc: subprocess.Popen) -> Optional[Dict[str, float]]:
+    """
+    Wait for `proc` and return its own resource usage (CPU seconds, peak RSS in MB),
+    or None where os.wait4 is not available.
+    """
+    if not hasattr(os, 'wait4'):
+        proc.wait()
+        return None
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss_bytes = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return {
+        'cpu_user': usage.ru_utime,
+        'cpu_system': usage.ru_stime,
+        'peak_rss_mb': rss_bytes / (1024 * 1024),
+    }
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class RenderMonitor:
+    """
+    Progress display and metrics collection shared by all jobs of a render.
+
+    Jobs may carry 'frames' (frames ffmpeg will report for them), 'stage',
+    'effect' and 'shots', a list of (first frame, shot label) used to show
+    which shot a job is on.
+    """
+
+    def __init__(self, fps: int, interval: float = 0.5, stream: IO[str] = sys.stdout):
+        self.total_frames = 0
+        self.fps = fps
+        self.stream = stream
+        # Redraw in place on a terminal; in logs, print a line every few seconds
+        self.interactive = stream.isatty()
+        self.interval = interval if self.interactive else 10.0
+        self.jobs: List[Dict] = []
+        self.stages: List[Dict] = []
+        self._frames: Dict[str, int] = {}
+        self._running: Dict[str, Dict] = {}
+        self._first_frame_time: Optional[float] = None
+        self._last_draw = 0.0
+        self._line_width = 0
+        self._lock = threading.Lock()
+
+    # Jobs
+
+    def expect(self, jobs: List[Dict]) -> None:
+        """Add the frames of jobs that are about to run to the progress total."""
+        self.total_frames += sum(job.get('frames', 0) for job in jobs)
+
+    def job_started(self, job: Dict) -> None:
+        with self._lock:
+            self._running[job['name']] = job
+            self._frames[job['name']] = 0
+
+    def job_progress(self, job: Dict, block: Dict[str, str]) -> None:
+        expected = job.get('frames')
+        if not expected:
+            # Not counted in the total (e.g. stream-copy concat)
+            return
+        try:
+            frame = int(block.get('frame', 0))
+        except ValueError:
+            return
+        with self._lock:
+            if frame and self._first_frame_time is None:
+                self._first_frame_time = time.monotonic()
+            self._frames[job['name']] = min(frame, expected)
+            self._draw()
+
+    def job_finished(self, job: Dict, wall: float, usage: Optional[Dict[str, float]], feed_cpu: float = 0.0) -> None:
+        record = {
+            'name': job['name'],
+            'stage': job.get('stage', 'render'),
+            'effect': job.get('effect'),
+            'frames': job.get('frames', 0),
+            'wall': wall,
+            'feed_cpu': feed_cpu,
+        }
+        record.update(usage or {})
+        with self._lock:
+            self._running.pop(job['name'], None)
+            if job.get('frames'):
+                self._frames[job['name']] = job['frames']
+            self.jobs.append(record)
+            self._draw(force=True)
+
+    # Stages
+
+    def stage_finished(self, name: str, wall: float) -> None:
+        with self._lock:
+            self.stages.append({'stage': name, 'wall': wall})
+
+    # Output
+
+    def log(self, message: str) -> None:
+        """Print a line without garbling the status line."""
+        with self._lock:
+            self._clear()
+            print(message, file=self.stream)
+            self._draw(force=True)
+
+    def done(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _current_shots(self) -> str:
+        labels = []
+        for name, job in self._running.items():
+            shots = job.get('shots')
+            if not shots:
+                continue
+            frame = self._frames.get(name, 0)
+            label = shots[0][1]
+            for first, shot in shots:
+                if first <= frame:
+                    label = shot
+            labels.append(label)
+        if len(labels) > 3:
+            return ','.join(labels[:3]) + ',...'
+        return ','.join(labels) or '-'
+
+    def _draw(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not self.total_frames:
+            return
+        # Forced redraws (after a job or a log line) only make sense in place on a terminal
+        if not (force and self.interactive) and now - self._last_draw < self.interval:
+            return
+        self._last_draw = now
+        done = sum(self._frames.values())
+        elapsed = now - self._first_frame_time if self._first_frame_time else 0.0
+        rate = done / elapsed if elapsed > 0 else 0.0
+        speed = rate / self.fps if self.fps else 0.0
+        eta = _format_eta((self.total_frames - done) / rate) if rate > 0 else '--:--:--'
+        line = (
+            f"  {100 * done / self.total_frames:5.1f}%  frame {done}/{self.total_frames}  "
+            f"{rate:6.1f} fps  {speed:5.2f}x  shot {self._current_shots()}  ETA {eta}"
+        )
+        if self.interactive:
+            self.stream.write('\r' + line.ljust(self._line_width))
+            self._line_width = len(line)
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def _clear(self) -> None:
+        if self.interactive and self._line_width:
+            self.stream.write('\r' + ' ' * self._line_width + '\r')
+            self._line_width = 0
+
+    # Metrics
+
+    def metrics(self) -> Dict:
+        """Wall time, CPU time and peak RSS per job, stage and effect."""
+        def summarize(records: List[Dict]) -> Dict:
+            return {
+                'jobs': len(records),
+                'job_wall': sum(r['wall'] for r in records),
+                'cpu': sum(r.get('cpu_user', 0) + r.get('cpu_system', 0) + r['feed_cpu'] for r in records),
+                'peak_rss_mb': max((r.get('peak_rss_mb', 0) for r in records), default=0),
+                'frames': sum(r['frames'] for r in records),
+            }
+
+        stages = []
+        for stage in self.stages:
+            summary = summarize([r for r in self.jobs if r['stage'] == stage['stage']])
+            summary.update(stage)
+            stages.append(summary)
+
+        effects = {}
+        for effect in sorted({r['effect'] for r in self.jobs if r['effect']}):
+            effects[effect] = summarize([r for r in self.jobs if r['effect'] == effect])
+
+        total = summarize(self.jobs)
+        total['wall'] = sum(stage['wall'] for stage in self.stages)
+        return {'total': total, 'stages': stages, 'effects': effects, 'jobs': self.jobs}
+
+    def write(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.metrics(), f, indent=2, sort_keys=True)
+            f.write('\n')
+        return path
+
+
+def job_timeline(durations: List[float], labels: List[str], fps: int) -> List[Tuple[int, str]]:
+    """(first frame, label) for consecutive clips that are visible for the given durations."""
+    timeline = []
+    start = 0.0
+    for duration, label in zip(durations, labels):
+        timeline.append((int(round(start * fps)), label))
+        start += duration
+    return timeline
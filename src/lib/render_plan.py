@@ -0,0 +1,66 @@
+"""
+Serialized render plans.
+
+A render plan is everything the assembler decided before invoking ffmpeg:
+render settings, the random seed, every shot with its resolved duration and
+Ken Burns effect, and the transitions between shots. It is written as
+pretty-printed JSON with sorted keys so two plans can be compared with a
+plain `diff`, and it can be fed back into the assembler to repeat a render.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from lib.render_cache import commit, partial_path
+
+RENDER_PLAN_VERSION = 1
+
+
+def save_plan(plan: Dict, path: Path) -> None:
+    """Write a plan as stable, diff-friendly JSON (atomically)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = partial_path(path)
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2, sort_keys=True, default=str)
+        f.write('\n')
+    commit(partial, path)
+
+
+def load_plan(path: Path) -> Dict:
+    """Read a plan written by `save_plan`. Raises ValueError if it isn't one."""
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if not isinstance(plan, dict) or plan.get('version') != RENDER_PLAN_VERSION:
+        raise ValueError(f"Not a version {RENDER_PLAN_VERSION} render plan: {path}")
+    return plan
+
+
+def without_image_hashes(plan: Dict) -> Dict:
+    """A copy of a plan without the source image hashes of its shots."""
+    shots = [{k: v for k, v in shot.items() if k != 'image_sha256'} for shot in plan['shots']]
+    return dict(plan, shots=shots)
+
+
+def diff_plans(old: Dict, new: Dict) -> List[str]:
+    """Human-readable list of what changed between two plans."""
+    changes = []
+    for key in ('seed', 'settings'):
+        if old.get(key) != new.get(key):
+            changes.append(f"{key}: {old.get(key)} -> {new.get(key)}")
+
+    old_shots = {s['shot_id']: s for s in old.get('shots', [])}
+    new_shots = {s['shot_id']: s for s in new.get('shots', [])}
+    for shot_id, shot in new_shots.items():
+        before = old_shots.get(shot_id)
+        if before is None:
+            changes.append(f"shot {shot_id}: added")
+            continue
+        fields = sorted(k for k in set(before) | set(shot) if before.get(k) != shot.get(k))
+        if fields:
+            changes.append(f"shot {shot_id}: {', '.join(fields)} changed")
+    for shot_id in old_shots:
+        if shot_id not in new_shots:
+            changes.append(f"shot {shot_id}: removed")
+    return changes
@@ -0,0 +1,94 @@
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from lib.generation_journal import GenerationJournal
+from lib.render_cache import commit, partial_path
+
+# Shot ids are zero-padded to this many digits in file names (shot_01.png)
+SHOT_ID_PADDING = 2
+
+# Candidates of a shot sit next to it in generations/: shot_XX.png <- shot_XX_vK.png
+VARIANT_RE = re.compile(r"^shot_(?P<shot>.+)_v(?P<variant>\d+)\.png$")
+
+# Contact sheet layout (thumbnail width in pixels, gap and label height)
+THUMBNAIL_WIDTH = 480
+SHEET_GAP = 8
+LABEL_HEIGHT = 28
+
+
+def shot_path(generations_dir: Path, shot_id: str) -> Path:
+    """The image the assembler uses for a shot."""
+    return Path(generations_dir) / f"shot_{shot_id}.png"
+
+
+def variant_path(generations_dir: Path, shot_id: str, variant: int) -> Path:
+    """Candidate number `variant` (1-based) of a shot."""
+    return Path(generations_dir) / f"shot_{shot_id}_v{variant}.png"
+
+
+def variant_number(path: Path) -> int:
+    """The variant number K of a candidate shot_XX_vK.png."""
+    return int(VARIANT_RE.match(Path(path).name).group("variant"))
+
+
+def find_variants(generations_dir: Path) -> Dict[str, List[Path]]:
+    """Candidates in a generations directory by shot id, in variant order."""
+    found: Dict[str, List] = {}
+    for path in Path(generations_dir).glob("shot_*_v*.png"):
+        match = VARIANT_RE.match(path.name)
+        if match:
+            found.setdefault(match.group("shot"), []).append((int(match.group("variant")), path))
+    return {shot_id: [path for _, path in sorted(variants)] for shot_id, variants in sorted(found.items())}
+
+
+def sharpness(path: Path) -> float:
+    """
+    Cheap focus score: the spread of the edge response of a downscaled
+    grayscale copy. Blurry or flat candidates score low.
+    """
+    from PIL import Image, ImageFilter, ImageStat
+
+    with Image.open(path) as img:
+        img = img.convert("L")
+        img.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH))
+        return ImageStat.Stat(img.filter(ImageFilter.FIND_EDGES)).stddev[0]
+
+
+def contact_sheet(variants: List[Path], output_path: Path) -> Path:
+    """Write the candidates of a shot side by side, labelled with their variant number."""
+    from PIL import Image, ImageDraw
+
+    thumbnails = []
+    for path in variants:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            img.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 4))
+            thumbnails.append(img)
+    height = max(t.height for t in thumbnails) + LABEL_HEIGHT
+    width = sum(t.width for t in thumbnails) + SHEET_GAP * (len(thumbnails) + 1)
+    sheet = Image.new("RGB", (width, height + SHEET_GAP), (24, 24, 24))
+    draw = ImageDraw.Draw(sheet)
+    x = SHEET_GAP
+    for path, thumbnail in zip(variants, thumbnails):
+        sheet.paste(thumbnail, (x, SHEET_GAP))
+        draw.text((x, SHEET_GAP + thumbnail.height + 6), f"v{variant_number(path)}", fill=(230, 230, 230))
+        x += thumbnail.width + SHEET_GAP
+    sheet.save(output_path)
+    return Path(output_path)
+
+
+def promote(candidate: Path, target: Path, journal: Optional[GenerationJournal] = None) -> Path:
+    """
+    Copy a candidate over the shot image atomically, so a watching assembler
+    never reads half a file. With the generation journal, the shot image is
+    recorded with the candidate's inputs, so `--resume` keeps it.
+    """
+    shutil.copyfile(candidate, partial_path(target))
+    commit(partial_path(target), target)
+    if journal:
+        entry = journal.shots.get(Path(candidate).stem[len("shot_"):])
+        if entry:
+            journal.record(Path(target).stem[len("shot_"):], entry['inputs'], target)
+    return Path(target)
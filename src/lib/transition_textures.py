@@ -0,0 +1,168 @@
+"""
+Textures for mask-based transitions.
+
+A transition texture is a grayscale map that decides the order in which the
+pixels of the next shot are revealed: value noise for a cloudy dissolve,
+gradients for wipes and an iris. Textures are rank-equalized, so every frame
+of a transition reveals the same share of the picture whatever its shape.
+
+A texture is turned into a mask clip with one frame per transition frame
+(`mask_frames`) and written as a raw monochrome YUV4MPEG stream, which ffmpeg
+reads directly and scales to the render resolution. Clips are rendered at a
+fraction of the output size and cached by their parameters, so a render only
+pays for NumPy once per transition type.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from lib.render_cache import RenderCache, commit, partial_path
+
+TEXTURE_VERSION = 2
+MASK_SUFFIX = '_mask.y4m'
+
+# Width of the soft edge between revealed and hidden pixels, as a share of the texture range
+DEFAULT_SOFTNESS = 0.1
+
+# Masks are smooth, so they are generated this many times smaller than the output
+MASK_DOWNSCALE = 4
+
+
+def _grid(width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel centers as fractions of the image width (row vector) and height (column vector)."""
+    x = (np.arange(width, dtype=np.float64) + 0.5) / width
+    y = (np.arange(height, dtype=np.float64) + 0.5) / height
+    return x[np.newaxis, :], y[:, np.newaxis]
+
+
+def _smoothstep(t: np.ndarray) -> np.ndarray:
+    return t * t * (3 - 2 * t)
+
+
+def value_noise(width: int, height: int, seed: int = 0, cells: int = 3, octaves: int = 5) -> np.ndarray:
+    """
+    Fractal value noise: random lattices of doubling density, each interpolated
+    with a smoothstep and added at half the weight of the previous octave.
+    """
+    rng = np.random.default_rng(seed)
+    x, y = _grid(width, height)
+    noise = np.zeros((height, width))
+    weight = 1.0
+    for octave in range(octaves):
+        ny = cells * 2 ** octave
+        nx = max(1, round(ny * width / height))  # square lattice cells
+        lattice = rng.random((ny + 1, nx + 1))
+        gx, gy = x[0] * nx, y[:, 0] * ny
+        x0, y0 = np.minimum(gx.astype(int), nx - 1), np.minimum(gy.astype(int), ny - 1)
+        fx, fy = _smoothstep(gx - x0)[np.newaxis, :], _smoothstep(gy - y0)[:, np.newaxis]
+        rows, cols = y0[:, np.newaxis], x0[np.newaxis, :]
+        top = lattice[rows, cols] * (1 - fx) + lattice[rows, cols + 1] * fx
+        bottom = lattice[rows + 1, cols] * (1 - fx) + lattice[rows + 1, cols + 1] * fx
+        noise += weight * (top * (1 - fy) + bottom * fy)
+        weight /= 2
+    return noise
+
+
+def iris(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Distance from the center, so the next shot opens as a growing circle."""
+    x, y = _grid(width, height)
+    return np.hypot((x - 0.5) * width / height, y - 0.5)
+
+
+def _linear(fx: float, fy: float) -> Callable[..., np.ndarray]:
+    def gradient(width: int, height: int, seed: int = 0) -> np.ndarray:
+        x, y = _grid(width, height)
+        return np.broadcast_to(fx * x + fy * y, (height, width))
+    return gradient
+
+
+# Transition type -> texture generator (width, height, seed) -> float array
+TEXTURES: Dict[str, Callable[..., np.ndarray]] = {
+    'noise': value_noise,
+    'iris': iris,
+    'diagonal': _linear(1, 1),
+    'wipe_left': _linear(-1, 0),
+    'wipe_right': _linear(1, 0),
+    'wipe_up': _linear(0, -1),
+    'wipe_down': _linear(0, 1),
+}
+
+
+def equalize(values: np.ndarray) -> np.ndarray:
+    """Replace every value by its rank as a fraction in [0, 1); equal values share a rank."""
+    flat = values.ravel()
+    ranks = np.searchsorted(np.sort(flat), flat, side='left')
+    return (ranks / flat.size).reshape(values.shape)
+
+
+def texture(name: str, width: int, height: int, seed: int = 0) -> np.ndarray:
+    """The equalized texture of a transition type. Raises ValueError for unknown types."""
+    if name not in TEXTURES:
+        raise ValueError(f"Unknown transition texture: {name} (expected one of {', '.join(TEXTURES)})")
+    return equalize(TEXTURES[name](width, height, seed))
+
+
+def mask_frames(values: np.ndarray, frames: int, softness: float = DEFAULT_SOFTNESS) -> Iterator[np.ndarray]:
+    """
+    8-bit masks for each frame of a transition: 0 keeps the outgoing shot,
+    255 shows the incoming one. Pixels are revealed in texture order, each
+    ramping up over `softness` of the transition, from an all-0 first mask to
+    an all-255 last one.
+    """
+    for k in range(frames):
+        progress = k / max(1, frames - 1)
+        alpha = np.clip((progress * (1 + softness) - values) / softness, 0, 1)
+        yield np.rint(alpha * 255).astype(np.uint8)
+
+
+def write_pgm(values: np.ndarray, path: Path) -> Path:
+    """Write a [0, 1] texture as a binary (P5) graymap, e.g. to preview it."""
+    height, width = values.shape
+    with open(path, 'wb') as f:
+        f.write(f"P5\n{width} {height}\n255\n".encode('ascii'))
+        f.write(np.rint(np.clip(values, 0, 1) * 255).astype(np.uint8).tobytes())
+    return Path(path)
+
+
+def write_mask_clip(values: np.ndarray, frames: int, fps: int, path: Path, softness: float = DEFAULT_SOFTNESS) -> Path:
+    """Write the masks of a transition as a monochrome YUV4MPEG stream."""
+    height, width = values.shape
+    with open(path, 'wb') as f:
+        f.write(f"YUV4MPEG2 W{width} H{height} F{fps}:1 Ip A1:1 Cmono\n".encode('ascii'))
+        for mask in mask_frames(values, frames, softness):
+            f.write(b"FRAME\n")
+            f.write(mask.tobytes())
+    return Path(path)
+
+
+def transition_mask(
+    name: str,
+    width: int,
+    height: int,
+    frames: int,
+    fps: int,
+    work_dir: Path,
+    cache: Optional[RenderCache] = None,
+    softness: float = DEFAULT_SOFTNESS,
+    seed: int = 0
+) -> Path:
+    """
+    Mask clip for a transition of `frames` frames into a `width`x`height` render.
+
+    With a cache, the clip is keyed by its parameters and only generated once;
+    otherwise it is regenerated into `work_dir`.
+    """
+    size = (max(1, width // MASK_DOWNSCALE), max(1, height // MASK_DOWNSCALE))
+    if cache:
+        key = cache.key('mask', TEXTURE_VERSION, name, size, frames, fps, softness, seed)
+        path = cache.path(key, MASK_SUFFIX)
+        if cache.lookup(path):
+            return path
+    else:
+        path = Path(work_dir) / f"{name}{MASK_SUFFIX}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_mask_clip(texture(name, *size, seed), frames, fps, partial_path(path), softness)
+    commit(partial_path(path), path)
+    return path
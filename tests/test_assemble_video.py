@@ -0,0 +1,514 @@
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+import pytest
+
+import assemble_video
+from assemble_video import (
+    DEFAULT_SS_FACTOR, DRAFT_HEIGHT, DRAFT_MAX_FPS, build_ffmpeg_command, build_renditions_job,
+    AUDIO_CODEC_ARGS, KEN_BURNS_EFFECTS, build_mux_job, chunk_cuts, build_segment_jobs, clip_geometry, draft_settings, fit_aspect, generate_crop_path_filter,
+    image_state, output_codec_args, parse_rendition, plan_audio_track, plan_segment_render, plan_windows, run_job,
+    watch_ready, window_frame_count
+)
+from lib.filter_graph import _eval_expr, parse_filters
+from lib.render_cache import RenderCache
+
+FPS = 24
+
+
+def _shots(tmp_path, durations, effect='zoom_in'):
+    shots = []
+    for i, duration in enumerate(durations):
+        shot_id = f"{i + 1:02d}"
+        image_path = tmp_path / f"shot_{shot_id}.png"
+        image_path.write_bytes(b'image')
+        shots.append({
+            'shot': {'scene': shot_id},
+            'shot_id': shot_id,
+            'image_path': image_path,
+            'duration': duration,
+            'index': i,
+            'effect': effect,
+        })
+    return shots
+
+
+def _parts(segment):
+    return {name: (start, end) for name, start, end, _ in segment['parts']}
+
+
+# Segments mode
+
+def test_segment_parts_cover_every_generated_frame(tmp_path):
+    plan = plan_segment_render(_shots(tmp_path, [5.0, 6.0, 4.0]), FPS, 640, 360, 1.0, tmp_path)
+    first, middle, last = [_parts(seg) for seg in plan['shots']]
+    assert first == {'body': (0, 120), 'tail': (120, 144)}
+    assert middle == {'head': (0, 24), 'body': (24, 144), 'tail': (144, 168)}
+    assert last == {'head': (0, 24), 'body': (24, 120)}
+    for seg in plan['shots']:
+        parts = sorted(_parts(seg).values())
+        # Contiguous, from the first to the last generated frame
+        assert parts[0][0] == 0 and parts[-1][1] == seg['num_frames']
+        assert all(a[1] == b[0] for a, b in zip(parts, parts[1:]))
+        assert seg['num_frames'] == int((seg['shot']['duration'] + 1.0) * FPS)
+
+
+def test_single_shot_is_all_body(tmp_path):
+    plan = plan_segment_render(_shots(tmp_path, [5.0]), FPS, 640, 360, 1.0, tmp_path)
+    assert _parts(plan['shots'][0]) == {'body': (0, 144)}
+    assert plan['transitions'] == []
+
+
+def test_transitions_pair_tail_with_next_head(tmp_path):
+    plan = plan_segment_render(_shots(tmp_path, [5.0, 6.0, 4.0]), FPS, 640, 360, 1.0, tmp_path)
+    shots, transitions = plan['shots'], plan['transitions']
+    assert len(transitions) == 2
+    for i, tr in enumerate(transitions):
+        assert tr['inputs'] == [shots[i]['outputs']['tail'], shots[i + 1]['outputs']['head']]
+        assert tr['duration'] * FPS == _parts(shots[i])['tail'][1] - _parts(shots[i])['tail'][0]
+    assert plan['concat_list'] == [
+        shots[0]['outputs']['body'], transitions[0]['output'],
+        shots[1]['outputs']['body'], transitions[1]['output'],
+        shots[2]['outputs']['body'],
+    ]
+
+
+def test_shot_shorter_than_its_transitions_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        plan_segment_render(_shots(tmp_path, [5.0, 1.0, 5.0]), FPS, 640, 360, 1.0, tmp_path)
+
+
+def test_segment_jobs_trim_and_pair_the_parts(tmp_path):
+    plan = plan_segment_render(_shots(tmp_path, [5.0, 6.0, 4.0]), FPS, 640, 360, 1.0, tmp_path)
+    shot_jobs, transition_jobs, [concat] = build_segment_jobs(plan, tmp_path / 'out.mp4', FPS, 640, 360, 1.0, 1)
+    middle = ' '.join(shot_jobs[1]['cmd'])
+    assert 'split=3' in middle
+    assert 'trim=start_frame=0:end_frame=24,setpts=PTS-STARTPTS[head]' in middle
+    assert 'trim=start_frame=24:end_frame=144,setpts=PTS-STARTPTS[body]' in middle
+    assert 'trim=start_frame=144:end_frame=168,setpts=PTS-STARTPTS[tail]' in middle
+    assert [job['frames'] for job in shot_jobs] == [120, 120, 96]
+    for i, job in enumerate(transition_jobs):
+        inputs = [job['cmd'][k + 1] for k, arg in enumerate(job['cmd']) if arg == '-i']
+        assert inputs == [str(plan['shots'][i]['outputs']['tail']), str(plan['shots'][i + 1]['outputs']['head'])]
+        assert job['frames'] == 24
+    assert concat['name'] == 'concat'
+
+
+# Windowed mode
+
+# Frame-aligned at 24 fps, as graph mode and windows count frames per clip
+WINDOW_DURATIONS = [5.0, 6.0, 4.0, 3.5, 5.0, 2.25, 4.0]
+
+
+def _clip_frames(clip, transition_frames):
+    return clip.get('frame_count') or int(clip['duration'] * FPS) + transition_frames - clip.get('start_frame', 0)
+
+
+@pytest.mark.parametrize('window_size', [1, 2, 3, len(WINDOW_DURATIONS) - 1, len(WINDOW_DURATIONS), 100])
+def test_windows_join_without_duplicated_or_dropped_frames(tmp_path, window_size):
+    shots = _shots(tmp_path, WINDOW_DURATIONS)
+    windows = plan_windows(shots, window_size, FPS, 640, 360, 1.0, tmp_path)
+    indices = [[c['index'] for c in window['clips']] for window in windows]
+    assert indices[0][0] == 0 and indices[-1][-1] == len(shots) - 1
+    assert all(len(window) <= window_size + 1 for window in indices)
+    # Consecutive windows share exactly one shot
+    assert all(a[-1] == b[0] and len(set(a) & set(b)) == 1 for a, b in zip(indices, indices[1:]))
+
+    # The shot at a join ends one window with its head and starts the next right after it
+    for a, b in zip(windows, windows[1:]):
+        assert a['clips'][-1]['frame_count'] == 24
+        assert b['clips'][0]['start_frame'] == 24
+    # So every frame of every shot is rendered exactly once
+    rendered = {}
+    for window in windows:
+        for clip in window['clips']:
+            rendered[clip['index']] = rendered.get(clip['index'], 0) + _clip_frames(clip, 24)
+    assert rendered == {vs['index']: int((vs['duration'] + 1.0) * FPS) for vs in shots}
+
+    graph_total = int((sum(WINDOW_DURATIONS) + 1.0) * FPS)
+    assert sum(window_frame_count(window, FPS, 1.0) for window in windows) == graph_total
+
+
+def test_window_size_covering_the_timeline_is_one_window(tmp_path):
+    shots = _shots(tmp_path, WINDOW_DURATIONS)
+    [window] = plan_windows(shots, len(shots), FPS, 640, 360, 1.0, tmp_path)
+    assert len(window['clips']) == len(shots)
+    assert not any('start_frame' in c or 'frame_count' in c for c in window['clips'])
+
+
+def test_single_shot_window(tmp_path):
+    [window] = plan_windows(_shots(tmp_path, [5.0]), 1, FPS, 640, 360, 1.0, tmp_path)
+    assert window_frame_count(window, FPS, 1.0) == 144
+
+
+# Chunked mode
+
+def _chunks(tmp_path, durations, chunk_seconds, max_shots=8):
+    """Plan the chunks of a timeline and check they tile it like windows do."""
+    shots = _shots(tmp_path, durations)
+    cuts = chunk_cuts(shots, chunk_seconds, max_shots)
+    windows = plan_windows(shots, max_shots, FPS, 640, 360, 1.0, tmp_path, cuts=cuts)
+    indices = [[c['index'] for c in window['clips']] for window in windows]
+    assert indices[0][0] == 0 and indices[-1][-1] == len(shots) - 1
+    assert all(b - a == 1 for window in indices for a, b in zip(window, window[1:]))
+    assert all(a[-1] == b[0] and len(set(a) & set(b)) == 1 for a, b in zip(indices, indices[1:]))
+    graph_total = int((sum(durations) + 1.0) * FPS)
+    assert sum(window_frame_count(window, FPS, 1.0) for window in windows) == graph_total
+    return cuts, indices
+
+
+def test_single_shot_is_one_chunk(tmp_path):
+    cuts, chunks = _chunks(tmp_path, [5.0], 1.0)
+    assert cuts == [0]
+    assert chunks == [[0]]
+
+
+def test_two_shots_are_one_chunk(tmp_path):
+    assert _chunks(tmp_path, [5.0, 5.0], 1.0)[1] == [[0, 1]]
+
+
+def test_more_chunks_than_shots_cuts_at_every_shot(tmp_path):
+    cuts, chunks = _chunks(tmp_path, [5.0, 6.0, 4.0, 5.0, 3.0], 0.5)
+    assert cuts == [0, 1, 2, 3, 4]
+    assert chunks == [[0, 1], [1, 2], [2, 3], [3, 4]]
+
+
+def test_chunks_balance_durations(tmp_path):
+    cuts, _ = _chunks(tmp_path, [5.0] * 8, 10.0)
+    assert cuts == [0, 2, 4, 6, 7]
+
+
+def test_one_long_shot_fills_a_chunk_of_its_own(tmp_path):
+    cuts, chunks = _chunks(tmp_path, [5.0, 5.0, 60.0, 5.0, 5.0, 5.0], 15.0)
+    assert cuts == [0, 2, 3, 5]
+    # The long shot gets a chunk of its own: only its head ends the chunk before
+    assert chunks == [[0, 1, 2], [2, 3], [3, 4, 5]]
+
+
+def test_chunks_are_capped_at_max_shots(tmp_path):
+    cuts, chunks = _chunks(tmp_path, [2.0] * 10, 100.0, max_shots=3)
+    assert cuts == [0, 3, 6, 9]
+    assert all(len(chunk) <= 4 for chunk in chunks)
+
+
+# Jobs
+
+# Stands in for an ffmpeg that rejects its arguments before reading any input
+EXITS_EARLY = [sys.executable, '-c', 'import sys; sys.exit(3)']
+
+
+def _flood(sink):
+    for _ in range(1000):
+        sink.write(b'\0' * 65536)
+
+
+def _write_then_wait(sink):
+    sink.write(b'\0' * 16)
+    time.sleep(0.5)
+
+
+@pytest.mark.parametrize('feed', [_flood, _write_then_wait])
+def test_encoder_exiting_early_fails_the_job_with_its_exit_status(tmp_path, monkeypatch, feed):
+    # The stand-in doesn't take ffmpeg's progress options
+    monkeypatch.setattr(assemble_video, 'with_progress', lambda cmd: cmd)
+    output = tmp_path / 'out.mp4'
+    job = {'name': 'shot_01', 'cmd': EXITS_EARLY, 'feed': feed, 'commit': [(tmp_path / 'out.partial.mp4', output)]}
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        run_job(job)
+    assert error.value.returncode == 3
+    assert error.value.cmd == EXITS_EARLY
+    assert not output.exists()
+
+
+# Draft quality
+
+def test_draft_lowers_resolution_frame_rate_supersampling_and_preset():
+    draft = draft_settings(1920, 1080, 30)
+    assert (draft['width'], draft['height']) == (640, DRAFT_HEIGHT)
+    assert draft['fps'] == DRAFT_MAX_FPS
+    assert draft['ss_factor'] == 1 < DEFAULT_SS_FACTOR
+    assert draft['blur'] == {'filter': 'box', 'scale': DRAFT_HEIGHT / 1080}
+    if 'libx264' in output_codec_args():
+        assert output_codec_args(draft['preset'])[-2:] == ['-preset', 'ultrafast']
+        assert '-preset' not in output_codec_args()
+
+
+def test_draft_keeps_the_aspect_ratio_at_even_sizes():
+    draft = draft_settings(1080, 1920, 24)
+    assert (draft['width'], draft['height']) == (202, DRAFT_HEIGHT)
+    # Never upscales, and keeps lower frame rates
+    draft = draft_settings(640, 240, 10)
+    assert (draft['width'], draft['height'], draft['fps']) == (640, 240, 10)
+
+
+def test_draft_segments_are_cached_apart_from_final_ones(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    shots = _shots(tmp_path, [5.0, 6.0])
+    final = plan_segment_render(shots, FPS, 1920, 1080, 1.0, tmp_path, cache)
+    draft = draft_settings(1920, 1080, FPS)
+    draft_plan = plan_segment_render(
+        shots, draft['fps'], draft['width'], draft['height'], 1.0, tmp_path, cache,
+        ss_factor=draft['ss_factor'], codec_args=output_codec_args(draft['preset']), blur=draft['blur']
+    )
+    final_paths = {p for seg in final['shots'] for p in seg['outputs'].values()}
+    draft_paths = {p for seg in draft_plan['shots'] for p in seg['outputs'].values()}
+    assert len(final_paths) == len(draft_paths) == 4
+    assert not final_paths & draft_paths
+    assert final['transitions'][0]['output'] != draft_plan['transitions'][0]['output']
+
+
+# Renditions
+
+X264_ARGS = ['-c:v', 'libx264', '-b:v', '2M', '-pix_fmt', 'yuv420p']
+TUNED_ARGS = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23', '-pix_fmt', 'yuv420p']
+
+
+def test_rendition_size_only_keeps_the_main_encoder_settings(tmp_path):
+    rendition = parse_rendition('1280x720', tmp_path / 'video.mp4', X264_ARGS)
+    assert (rendition['width'], rendition['height']) == (1280, 720)
+    assert rendition['codec_args'] == X264_ARGS
+    assert rendition['output'] == tmp_path / 'video_720p.mp4'
+
+
+def test_rendition_bitrate_and_preset(tmp_path):
+    rendition = parse_rendition('854X480:1M:veryfast', tmp_path / 'video.mp4', X264_ARGS)
+    assert rendition['codec_args'] == ['-c:v', 'libx264', '-b:v', '1M', '-pix_fmt', 'yuv420p', '-preset', 'veryfast']
+    # The main output's arguments are left alone
+    assert X264_ARGS[3] == '2M'
+
+
+def test_rendition_bitrate_replaces_a_tuned_crf(tmp_path):
+    rendition = parse_rendition('1280x720:3M:fast', tmp_path / 'video.mp4', TUNED_ARGS)
+    assert rendition['codec_args'] == ['-c:v', 'libx264', '-preset', 'fast', '-b:v', '3M', '-pix_fmt', 'yuv420p']
+
+
+def test_rendition_is_named_after_its_height_next_to_the_output(tmp_path):
+    output = tmp_path / 'out' / 'story.final.mov'
+    assert parse_rendition('720x1280', output, X264_ARGS)['output'] == tmp_path / 'out' / 'story.final_1280p.mov'
+
+
+@pytest.mark.parametrize('spec', ['', '1280', '1280x', 'x720', '1280x720x2', 'wide', '1281x720', '1280x0', '-2x720', '1280x720:3M:warp'])
+def test_malformed_renditions_are_rejected(tmp_path, spec):
+    with pytest.raises(ValueError, match='Invalid rendition'):
+        parse_rendition(spec, tmp_path / 'video.mp4', X264_ARGS)
+
+
+def _outputs(cmd):
+    """(mapped label, output file) of every output of an ffmpeg command."""
+    return [(cmd[i + 1], cmd[next(j for j in range(i, len(cmd)) if cmd[j].endswith('.mp4'))])
+            for i, arg in enumerate(cmd) if arg == '-map']
+
+
+def test_graph_mode_writes_renditions_as_extra_outputs(tmp_path):
+    output = tmp_path / 'video.mp4'
+    renditions = [parse_rendition(spec, output, X264_ARGS) for spec in ('1280x720', '640x360:800k')]
+    cmd, _, _ = build_ffmpeg_command(
+        [], tmp_path, output, FPS, 1920, 1080, 1.0,
+        valid_shots=_shots(tmp_path, [5.0, 6.0]), codec_args=X264_ARGS, renditions=renditions
+    )
+    assert _outputs(cmd) == [
+        ('[out0]', str(output)),
+        ('[rendition1]', str(tmp_path / 'video_720p.mp4')),
+        ('[rendition2]', str(tmp_path / 'video_360p.mp4')),
+    ]
+    graph = cmd[cmd.index('-filter_complex') + 1]
+    assert '[final]split=3[out0][out1][out2]' in graph
+    assert '[out2]scale=640:360,setsar=1[rendition2]' in graph
+
+
+def test_other_modes_derive_renditions_from_the_assembled_video(tmp_path):
+    output = tmp_path / 'video.mp4'
+    renditions = [parse_rendition(spec, output, X264_ARGS) for spec in ('1280x720', '640x360:800k')]
+    job = build_renditions_job(output, renditions, 264)
+    cmd = job['cmd']
+    assert cmd[cmd.index('-i') + 1] == str(output)
+    assert _outputs(cmd) == [
+        ('[rendition1]', str(tmp_path / 'video_720p.mp4')),
+        ('[rendition2]', str(tmp_path / 'video_360p.mp4')),
+    ]
+    assert job['frames'] == 264
+
+
+# Reframing
+
+# The supersampled inputs of a 1920x1080 render
+LANDSCAPE = (3840, 2160)
+
+
+def test_fit_aspect_portrait_window_in_a_landscape_frame():
+    width, height = fit_aspect(*LANDSCAPE, 1080, 1920)
+    assert (width, height) == (1214, 2160)
+    assert width / height == pytest.approx(9 / 16, rel=0.01)
+    assert fit_aspect(*LANDSCAPE, 1920, 1080) == LANDSCAPE
+    # A frame wider than the output is cropped at the sides, a taller one at the top and bottom
+    assert fit_aspect(1000, 1000, 1920, 1080) == (1000, 562)
+    assert fit_aspect(1001, 1001, 1080, 1920) == (562, 1000)
+
+
+def test_portrait_geometry_works_at_the_source_density():
+    reframe = {'source': LANDSCAPE}
+    assert clip_geometry(1080, 1920, 2, reframe) == {'source': LANDSCAPE, 'work': (1214, 2160), 'density': 1.0}
+    # Capped at the supersampled output size for very large sources
+    geometry = clip_geometry(540, 960, 2, {'source': (7680, 4320)})
+    assert geometry['work'] == (1080, 1920)
+    assert geometry['density'] == pytest.approx(1920 / 4320)
+    assert clip_geometry(1920, 1080, 2) == {'source': LANDSCAPE, 'work': LANDSCAPE, 'density': 1.0}
+
+
+def _crop_windows(effect, frames, start_frame=0, frame_count=None):
+    """(x, y, width, height) of the source window shown at every frame of a reframed move."""
+    src_width, src_height = LANDSCAPE
+    filters = parse_filters(generate_crop_path_filter(
+        effect, frames / FPS, FPS, src_width, src_height, 1080, 1920, start_frame, frame_count
+    ))
+    count = frame_count or frames - start_frame
+    crop = next(f for f in filters if f.name == 'crop')
+    if effect in ('pan_left', 'pan_right', 'pan_up'):
+        assert [f.name for f in filters] == ['loop', 'settb', 'setpts', 'fps', 'crop', 'scale']
+        width, height = float(crop.get('w')), float(crop.get('h'))
+        return [
+            (_eval_expr(crop.get('x'), {'n': n}), _eval_expr(crop.get('y'), {'n': n}), width, height)
+            for n in range(count)
+        ]
+    # Zooms run zoompan inside a centered window
+    assert [f.name for f in filters] == ['crop', 'zoompan']
+    crop_width, crop_height = (float(v) for v in crop.positional())
+    left, top = (src_width - crop_width) / 2, (src_height - crop_height) / 2
+    zoompan = filters[1]
+    assert zoompan.get('s') == '1080x1920'
+    windows = []
+    for on in range(count):
+        zoom = _eval_expr(zoompan.get('z'), {'on': on, 'in': on})
+        variables = {'on': on, 'iw': crop_width, 'ih': crop_height, 'zoom': zoom}
+        windows.append((
+            left + _eval_expr(zoompan.get('x'), variables), top + _eval_expr(zoompan.get('y'), variables),
+            crop_width / zoom, crop_height / zoom
+        ))
+    return windows
+
+
+@pytest.mark.parametrize('effect', KEN_BURNS_EFFECTS)
+def test_portrait_crop_path_stays_inside_the_frame(effect):
+    frames = 6 * FPS
+    for window in (_crop_windows(effect, frames), _crop_windows(effect, frames, 24), _crop_windows(effect, frames, 0, 24)):
+        for x, y, width, height in window:
+            assert width / height == pytest.approx(9 / 16, rel=0.01)
+            assert -1e-6 <= x and x + width <= LANDSCAPE[0] + 1e-6
+            assert -1e-6 <= y and y + height <= LANDSCAPE[1] + 1e-6
+
+
+@pytest.mark.parametrize('effect', ['pan_left', 'pan_right', 'pan_up'])
+def test_portrait_pan_moves_over_the_landscape_travel(effect):
+    frames = 6 * FPS
+    windows = _crop_windows(effect, frames)
+    axis = 1 if effect == 'pan_up' else 0
+    positions = [window[axis] for window in windows]
+    assert positions[0] != positions[-1]
+    steps = [b - a for a, b in zip(positions, positions[1:])]
+    assert all(step > 0 for step in steps) or all(step < 0 for step in steps)
+    # A window starting mid-shot continues the same path
+    assert _crop_windows(effect, frames, 24)[0] == windows[24]
+
+
+# Audio
+
+def test_audio_track_is_encoded_once_and_cached_by_content(tmp_path):
+    audio = tmp_path / 'voice.wav'
+    audio.write_bytes(b'voice')
+    cache = RenderCache(tmp_path / 'inputs')
+    track, job = plan_audio_track(audio, tmp_path / 'render', cache)
+    assert track.parent == tmp_path / 'inputs' and track.name.endswith('_audio.m4a')
+    assert job['cmd'] == [
+        'ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-i', str(audio),
+        '-map', '0:a:0', *AUDIO_CODEC_ARGS, str(tmp_path / 'inputs' / f"{track.stem}.partial.m4a")
+    ]
+    assert job['commit'] == [(tmp_path / 'inputs' / f"{track.stem}.partial.m4a", track)]
+
+    track.parent.mkdir()
+    track.write_bytes(b'encoded')
+    assert plan_audio_track(audio, tmp_path / 'render', cache) == (track, None)
+    audio.write_bytes(b'new voice')
+    new_track, new_job = plan_audio_track(audio, tmp_path / 'render', cache)
+    assert new_track != track and new_job is not None
+
+
+def test_audio_track_without_cache_goes_to_the_render_dir(tmp_path):
+    audio = tmp_path / 'voice.wav'
+    audio.write_bytes(b'voice')
+    track, job = plan_audio_track(audio, tmp_path / 'render')
+    assert track == tmp_path / 'render' / 'audio_audio.m4a'
+    assert job['cmd'][-1] == str(tmp_path / 'render' / 'audio_audio.partial.m4a')
+
+
+def test_mux_stream_copies_and_cuts_the_soundtrack(tmp_path):
+    job = build_mux_job(tmp_path / 'render' / 'video_video.mp4', tmp_path / 'track.m4a', tmp_path / 'video.mp4', 61.5)
+    assert job['name'] == 'mux_video'
+    assert job['cmd'] == [
+        'ffmpeg', '-y', '-loglevel', 'error', '-nostats',
+        '-i', str(tmp_path / 'render' / 'video_video.mp4'), '-i', str(tmp_path / 'track.m4a'),
+        '-map', '0:v', '-map', '1:a', '-c', 'copy', '-t', '61.5',
+        str(tmp_path / 'video.partial.mp4')
+    ]
+    assert job['commit'] == [(tmp_path / 'video.partial.mp4', tmp_path / 'video.mp4')]
+
+
+# Watch mode
+
+def test_image_state_sees_only_finished_images(tmp_path):
+    shots = _shots(tmp_path, [5.0, 5.0, 5.0])
+    shots[2]['image_path'].unlink()
+    # The generator writes next to the image and renames it when done
+    (tmp_path / 'shot_03.partial.png').write_bytes(b'half an ima')
+    state = image_state(shots)
+    assert sorted(state) == ['01', '02']
+    shots[1]['image_path'].write_bytes(b'regenerated image')
+    assert image_state(shots)['02'] != state['02']
+    assert image_state(shots)['01'] == state['01']
+
+
+def test_watch_waits_for_images_to_settle():
+    one = {'01': (100, 10)}
+    two = {'01': (100, 10), '02': (200, 20)}
+    # First poll: nothing to compare against yet
+    assert not watch_ready(one, None, {})
+    assert watch_ready(one, one, {})
+    # Shot 02 appeared (or is still being written) since the last poll
+    assert not watch_ready(two, one, one)
+    assert watch_ready(two, two, one)
+    # Nothing new since the last render
+    assert not watch_ready(two, two, two)
+    assert not watch_ready({}, {}, {})
+
+
+def test_watch_renders_a_regenerated_image_again():
+    rendered = {'01': (100, 10), '02': (200, 20)}
+    regenerated = {'01': (100, 10), '02': (300, 20)}
+    assert not watch_ready(regenerated, rendered, rendered)
+    assert watch_ready(regenerated, regenerated, rendered)
+    # A deleted image counts as a change too
+    assert watch_ready({'01': (100, 10)}, {'01': (100, 10)}, rendered)
+
+
+def test_changed_image_only_rerenders_its_own_segments(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    shots = _shots(tmp_path, [5.0, 5.0, 5.0])
+    shots[2]['image_path'].unlink()
+    plan = plan_segment_render(shots, FPS, 640, 360, 1.0, tmp_path, cache)
+    assert [seg['pending'] for seg in plan['shots']] == [False, False, True]
+    assert [tr['pending'] for tr in plan['transitions']] == [False, True]
+    for seg in plan['shots'][:2]:
+        for path in seg['outputs'].values():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b'segment')
+    plan['transitions'][0]['output'].write_bytes(b'transition')
+
+    shots[2]['image_path'].write_bytes(b'image')
+    shots[1]['image_path'].write_bytes(b'regenerated image')
+    plan = plan_segment_render(shots, FPS, 640, 360, 1.0, tmp_path, cache)
+    assert [seg['cached'] for seg in plan['shots']] == [True, False, False]
+    assert [tr['cached'] for tr in plan['transitions']] == [False, False]
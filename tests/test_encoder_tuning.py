@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.encoder_tuning import CRF_RANGE, TUNING_PRESETS, highest_crf, tune_encoder, x264_args
+
+PRESET_SPEED = {preset: i + 1 for i, preset in enumerate(TUNING_PRESETS)}
+
+
+class ProbeStub:
+    """Probe results from a formula instead of encodes: SSIM falls and bits drop as CRF rises."""
+
+    def __init__(self, fastest_threads=None):
+        self.fastest_threads = fastest_threads
+        self.calls = []
+
+    def run(self, preset, crf, tune=None, threads=None):
+        self.calls.append((preset, crf, tune, threads))
+        wall = PRESET_SPEED[preset] * (0.5 if threads and threads == self.fastest_threads else 1.0)
+        return {
+            'preset': preset,
+            'crf': crf,
+            'tune': tune,
+            'threads': threads,
+            'wall': wall,
+            'predicted_encode': wall * 100,
+            'kbps': 1000 / crf * (1.2 if tune else 1.0),
+            'ssim': 1.0 - crf * 0.0004 + (0.0001 if tune else 0.0),
+        }
+
+
+def test_x264_args():
+    assert x264_args('fast', 20) == ['-c:v', 'libx264', '-preset', 'fast', '-crf', '20', '-pix_fmt', 'yuv420p']
+    assert x264_args('fast', 20, 'stillimage', 4) == [
+        '-c:v', 'libx264', '-preset', 'fast', '-crf', '20', '-tune', 'stillimage', '-pix_fmt', 'yuv420p', '-threads', '4'
+    ]
+
+
+def test_highest_crf_binary_search():
+    probe = ProbeStub()
+    # SSIM >= 0.99 up to CRF 25
+    assert highest_crf(probe, 'medium', None, 0.99)['crf'] == 25
+    assert len(probe.calls) <= 4
+
+
+def test_highest_crf_falls_back_to_lowest():
+    assert highest_crf(ProbeStub(), 'medium', None, 0.9999)['crf'] == CRF_RANGE[0]
+
+
+def test_tune_encoder_picks_slowest_preset_in_budget():
+    profile = tune_encoder(ProbeStub(), budget=350, target_ssim=0.99)
+    assert profile['preset'] == 'veryfast'
+    assert profile['budget_met']
+    assert profile['target_met']
+
+
+def test_tune_encoder_keeps_threads_out_of_codec_args():
+    profile = tune_encoder(ProbeStub(fastest_threads=2), target_ssim=0.99, cpu_count=4)
+    assert profile['threads'] == 2
+    assert '-threads' not in profile['codec_args']
+    assert profile['codec_args'] == x264_args(profile['preset'], profile['crf'], profile['tune'])
+
+
+def test_tune_encoder_single_core_probes_no_threads():
+    probe = ProbeStub()
+    profile = tune_encoder(probe, target_ssim=0.99)
+    assert profile['threads'] is None
+    assert all(threads is None for *_, threads in probe.calls)
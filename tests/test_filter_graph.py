@@ -0,0 +1,136 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.filter_graph import (
+    Filter, FilterGraph, _eval_expr, _is_still, chain_cost, drop_noops, merge_stepped_blurs, optimize,
+    parse_filters, push_downscale, skip_static_supersampling
+)
+
+ZOOM_IN = "zoompan=z='1+0.2*on/99':d=100:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s=3840x2160:fps=25"
+HOLD = "zoompan=z='1.1':d=100:x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s=3840x2160:fps=25"
+
+
+def test_filter_parse_round_trip():
+    text = "gblur@kb_blur1=sigma=4:enable='between(t,0,1.5)'"
+    f = Filter.parse(text)
+    assert f.name == 'gblur'
+    assert f.instance == 'kb_blur1'
+    assert f.get('enable') == "'between(t,0,1.5)'"
+    assert f.render() == text
+
+
+def test_parse_filters_keeps_quoted_commas():
+    filters = parse_filters("sendcmd=c='0 gblur sigma 1;2 gblur sigma 2',gblur=sigma=1,null")
+    assert [f.name for f in filters] == ['sendcmd', 'gblur', 'null']
+
+
+def test_eval_expr_arithmetic():
+    assert _eval_expr("'1+0.2*on/99'", {'on': 99}) == 1.2
+    assert _eval_expr('iw/2-(iw/zoom/2)', {'iw': 1000.0, 'zoom': 2.0}) == 250.0
+    assert _eval_expr('-on', {'on': 3}) == -3.0
+
+
+def test_eval_expr_rejects_everything_else():
+    assert _eval_expr('__import__("os").getcwd()', {}) is None
+    assert _eval_expr('min(1,2)', {}) is None
+    assert _eval_expr('on**2', {'on': 2}) is None
+    assert _eval_expr('on>1', {'on': 2}) is None
+    assert _eval_expr('zoom+1', {}) is None
+    assert _eval_expr('1/0', {}) is None
+    assert _eval_expr("'abc'", {}) is None
+
+
+def test_is_still():
+    assert _is_still(Filter.parse(HOLD))
+    assert not _is_still(Filter.parse(ZOOM_IN))
+    assert not _is_still(Filter.parse("zoompan=z='if(on,1,2)':d=100:s=3840x2160"))
+
+
+def test_drop_noops_bypasses_empty_chains():
+    graph = FilterGraph()
+    graph.add(['0:v'], 'null', ['a'])
+    consumer = graph.add(['a'], 'scale=1920:1080', ['out'])
+    assert drop_noops(graph) == 1
+    assert graph.chains == [consumer]
+    assert consumer.inputs == ['0:v']
+
+
+def test_drop_noops_keeps_graph_outputs():
+    graph = FilterGraph()
+    graph.add(['0:v'], 'null', ['out'])
+    assert drop_noops(graph) == 0
+    assert graph.render() == '[0:v]null[out]'
+
+
+def _two_clip_fade(second_clip: str = HOLD) -> FilterGraph:
+    graph = FilterGraph()
+    graph.add(['0:v'], ZOOM_IN, ['c0'], size=(3840, 2160), frames=1, fps=25)
+    graph.add(['1:v'], second_clip, ['c1'], size=(3840, 2160), frames=1, fps=25)
+    graph.add(['c0', 'c1'], 'xfade=transition=fade:duration=1:offset=3', ['x'], size=(3840, 2160), frames=200, fps=25)
+    graph.add(['x'], 'scale=1920:1080', ['final'], size=(3840, 2160), frames=200, fps=25)
+    return graph
+
+
+def test_push_downscale_moves_scale_onto_clips():
+    graph = _two_clip_fade()
+    cost = graph.estimate_cost()
+    assert push_downscale(graph) == 1
+    assert [c.render() for c in graph.chains][:2] == [
+        f"[0:v]{ZOOM_IN},scale=1920:1080[c0]",
+        f"[1:v]{HOLD},scale=1920:1080[c1]",
+    ]
+    assert graph.chains[-1].outputs == ['final']
+    assert graph.estimate_cost() < cost
+
+
+def test_push_downscale_leaves_non_linear_transitions():
+    graph = _two_clip_fade()
+    graph.chains[2].filters[0].set('transition', 'wipeleft')
+    assert push_downscale(graph) == 0
+
+
+def test_skip_static_supersampling_renders_still_clips_at_output_size():
+    graph = _two_clip_fade()
+    push_downscale(graph)
+    assert skip_static_supersampling(graph) == 1
+    moving, still = graph.chains[0], graph.chains[1]
+    assert moving.filters[-1].name == 'scale'
+    assert [f.name for f in still.filters] == ['scale', 'zoompan']
+    assert still.filters[1].get('s') == '1920x1080'
+
+
+def test_merge_stepped_blurs():
+    graph = FilterGraph()
+    chain = graph.add(
+        ['c0'],
+        "gblur=sigma=4:enable='between(t,1,2)',gblur=sigma=2:enable='between(t,0,1)',format=yuv420p",
+        ['out'], size=(1920, 1080), frames=75, fps=25
+    )
+    assert merge_stepped_blurs(graph) == 1
+    sendcmd, gblur, fmt = chain.filters
+    assert sendcmd.get('c') == "'0 gblur@kb_blur1 sigma 2;1 gblur@kb_blur1 sigma 4'"
+    assert gblur.instance == 'kb_blur1'
+    assert gblur.get('sigma') == '2'
+    assert gblur.get('enable') == "'between(t,0,1)+between(t,1,2)'"
+    assert fmt.name == 'format'
+
+
+def test_chain_cost_counts_active_frames():
+    graph = FilterGraph()
+    blurred = graph.add(['a'], "gblur=sigma=2:enable='between(t,0,1)'", ['b'], size=(100, 100), frames=50, fps=25)
+    always = graph.add(['c'], 'gblur=sigma=2', ['d'], size=(100, 100), frames=50, fps=25)
+    assert chain_cost(blurred) < chain_cost(always)
+
+
+def test_optimize_reports_no_saving_for_merged_blurs():
+    graph = FilterGraph()
+    graph.add(
+        ['c0'], "gblur=sigma=4:enable='between(t,1,2)',gblur=sigma=2:enable='between(t,0,1)'",
+        ['out'], size=(1920, 1080), frames=75, fps=25
+    )
+    report = {entry['pass']: entry for entry in optimize(graph)}
+    assert report['merge stepped blurs']['rewrites'] == 1
+    assert report['merge stepped blurs']['saved'] is None
+    assert report['drop no-ops']['saved'] == 0
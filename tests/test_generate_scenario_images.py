@@ -0,0 +1,113 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+import pytest
+
+import generate_scenario_images
+from generate_scenario_images import generate_shots
+from lib.fake_imagen import FakeAPIError, FakeImageGenerator
+from lib.generation_journal import GenerationJournal
+
+
+class FailingGenerator:
+    """Fails the first `failures` requests of every prompt with `code`, then defers to a fake."""
+
+    def __init__(self, code, failures, fake):
+        self.code = code
+        self.failures = failures
+        self.fake = fake
+        self.attempts = {}
+
+    def generate_images(self, prompt, output_paths, **kwargs):
+        self.attempts[prompt] = self.attempts.get(prompt, 0) + 1
+        if self.attempts[prompt] <= self.failures:
+            raise FakeAPIError(self.code, f"simulated failure of {prompt}")
+        return self.fake.generate_images(prompt, output_paths, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(generate_scenario_images, 'backoff_delay', lambda attempt: 0.0)
+
+
+def _jobs(tmp_path, count):
+    return [
+        {
+            'shot_id': f"{i:02d}",
+            'prompt': f"prompt {i}",
+            'reference_images': [],
+            'output_paths': [tmp_path / f"shot_{i:02d}.png"],
+            'journal_ids': [f"{i:02d}"],
+            'inputs': f"inputs {i}",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def _fake():
+    return FakeImageGenerator(latency=0.05, jitter=0.0, seed=1)
+
+
+def test_requests_run_concurrently(tmp_path):
+    fake = _fake()
+    results = generate_shots(_jobs(tmp_path, 6), fake, 3, '16:9', 'fake')
+    assert fake.max_in_flight == 3
+    assert fake.calls == 6
+    assert sorted(r['shot_id'] for r in results) == ['01', '02', '03', '04', '05', '06']
+    assert all(r['error'] is None and r['attempts'] == 1 for r in results)
+    assert all((tmp_path / f"shot_{i:02d}.png").exists() for i in range(1, 7))
+
+
+def test_concurrency_one_is_sequential(tmp_path):
+    fake = _fake()
+    generate_shots(_jobs(tmp_path, 3), fake, 1, '16:9', 'fake')
+    assert fake.max_in_flight == 1
+
+
+def test_quota_errors_are_retried(tmp_path):
+    generator = FailingGenerator(429, 2, _fake())
+    results = generate_shots(_jobs(tmp_path, 2), generator, 2, '16:9', 'fake', max_attempts=4)
+    assert all(r['error'] is None and r['attempts'] == 3 for r in results)
+    assert all(Path(path).exists() for r in results for path in r['paths'])
+
+
+def test_gives_up_after_max_attempts(tmp_path):
+    generator = FailingGenerator(429, 10, _fake())
+    [result] = generate_shots(_jobs(tmp_path, 1), generator, 1, '16:9', 'fake', max_attempts=3)
+    assert result['attempts'] == 3
+    assert generator.attempts['prompt 1'] == 3
+    assert 'simulated failure' in result['error']
+    assert result['paths'] == []
+
+
+def test_failures_are_reported_without_retry(tmp_path, capsys):
+    generator = FailingGenerator(400, 1, _fake())
+    [result] = generate_shots(_jobs(tmp_path, 1), generator, 1, '16:9', 'fake', max_attempts=4)
+    assert result['attempts'] == 1
+    assert result['retryable'] is False
+    assert result['error'] == '400 simulated failure of prompt 1'
+    assert 'Shot 01 FAILED after 1 attempts: 400 simulated failure of prompt 1' in capsys.readouterr().out
+
+
+def test_one_failure_does_not_stop_the_others(tmp_path):
+    fake = _fake()
+    generator = FailingGenerator(400, 1, fake)
+    jobs = _jobs(tmp_path, 3)
+    generator.attempts['prompt 1'] = 1
+    generator.attempts['prompt 3'] = 1
+    results = {r['shot_id']: r for r in generate_shots(jobs, generator, 2, '16:9', 'fake')}
+    assert results['02']['error'] is not None
+    assert results['01']['error'] is None and results['03']['error'] is None
+
+
+def test_generated_shots_are_journaled(tmp_path):
+    journal = GenerationJournal(tmp_path / 'journal.jsonl')
+    generator = FailingGenerator(400, 1, _fake())
+    generator.attempts['prompt 1'] = 1
+    generate_shots(_jobs(tmp_path, 2), generator, 2, '16:9', 'fake', journal=journal)
+    assert journal.is_current('01', 'inputs 1', tmp_path / 'shot_01.png')
+    assert '02' not in journal.shots
@@ -0,0 +1,86 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.fake_imagen import FakeImageGenerator
+from lib.generation_cache import CachedImageGenerator, GenerationCache
+
+
+def _reference(tmp_path, content=b'reference'):
+    path = tmp_path / 'style.png'
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_covers_every_api_input(tmp_path):
+    cache = GenerationCache(tmp_path / 'cache')
+    reference = _reference(tmp_path)
+    key = cache.image_key('a cat', 'imagen', '16:9', [reference])
+    assert cache.image_key('a cat', 'imagen', '16:9', [reference]) == key
+    assert cache.image_key('a dog', 'imagen', '16:9', [reference]) != key
+    assert cache.image_key('a cat', 'gemini', '16:9', [reference]) != key
+    assert cache.image_key('a cat', 'imagen', '1:1', [reference]) != key
+    assert cache.image_key('a cat', 'imagen', '16:9') != key
+    assert cache.image_key('a cat', 'imagen', '16:9', [reference], reference_max_side=512) != key
+
+
+def test_key_follows_reference_content_not_name(tmp_path):
+    cache = GenerationCache(tmp_path / 'cache')
+    reference = _reference(tmp_path)
+    key = cache.image_key('a cat', 'imagen', '16:9', [reference])
+    renamed = tmp_path / 'renamed.png'
+    renamed.write_bytes(b'reference')
+    assert cache.image_key('a cat', 'imagen', '16:9', [str(renamed)]) == key
+    renamed.write_bytes(b'retouched reference')
+    assert cache.image_key('a cat', 'imagen', '16:9', [str(renamed)]) != key
+
+
+def test_reference_max_side_without_references_keeps_the_key(tmp_path):
+    cache = GenerationCache(tmp_path / 'cache')
+    assert cache.image_key('a cat', 'imagen', '16:9', [], 512) == cache.image_key('a cat', 'imagen', '16:9')
+
+
+def test_cached_images_are_restored_without_a_request(tmp_path):
+    fake = FakeImageGenerator(latency=0.0, seed=1)
+    generator = CachedImageGenerator(fake, GenerationCache(tmp_path / 'cache'))
+    first = tmp_path / 'first.png'
+    second = tmp_path / 'second.png'
+    generator.generate_image('a cat', str(first), aspect_ratio='16:9')
+    generator.generate_image('a cat', str(second), aspect_ratio='16:9')
+    assert fake.calls == 1
+    assert first.read_bytes() == second.read_bytes()
+    assert generator.cache.hits == 1 and generator.cache.misses == 1
+
+
+def test_downsized_references_are_a_different_entry(tmp_path):
+    fake = FakeImageGenerator(latency=0.0, seed=1)
+    cache = GenerationCache(tmp_path / 'cache')
+    reference = _reference(tmp_path)
+    CachedImageGenerator(fake, cache).generate_image('a cat', str(tmp_path / 'a.png'), [reference])
+    CachedImageGenerator(fake, cache, reference_max_side=512).generate_image('a cat', str(tmp_path / 'b.png'), [reference])
+    assert fake.calls == 2
+
+
+def test_bypass_generates_again(tmp_path):
+    fake = FakeImageGenerator(latency=0.0, seed=1)
+    CachedImageGenerator(fake, GenerationCache(tmp_path / 'cache')).generate_image('a cat', str(tmp_path / 'a.png'))
+    bypassed = CachedImageGenerator(fake, GenerationCache(tmp_path / 'cache', bypass=True))
+    bypassed.generate_image('a cat', str(tmp_path / 'a.png'))
+    assert fake.calls == 2
+    assert bypassed.cache.misses == 1
+
+
+def test_candidates_are_cached_as_a_set(tmp_path):
+    fake = FakeImageGenerator(latency=0.0, seed=1)
+    generator = CachedImageGenerator(fake, GenerationCache(tmp_path / 'cache'))
+    paths = [str(tmp_path / f"shot_01_v{k}.png") for k in (1, 2, 3)]
+    generator.generate_images('a cat', paths)
+    for path in paths:
+        os.remove(path)
+    generator.generate_images('a cat', paths)
+    assert fake.calls == 1
+    assert all(os.path.exists(path) for path in paths)
+    # A single image is a different entry than a set of candidates
+    generator.generate_image('a cat', str(tmp_path / 'shot_01.png'))
+    assert fake.calls == 2
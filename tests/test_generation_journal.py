@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.generation_journal import GenerationJournal
+
+
+def _image(tmp_path, name, content=b'image'):
+    path = tmp_path / f"shot_{name}.png"
+    path.write_bytes(content)
+    return path
+
+
+def test_recorded_shot_is_current(tmp_path):
+    image = _image(tmp_path, '01')
+    GenerationJournal(tmp_path / 'journal.jsonl').record('01', 'inputs', image)
+    journal = GenerationJournal(tmp_path / 'journal.jsonl')
+    assert journal.is_current('01', 'inputs', image)
+
+
+def test_changed_inputs_or_image_are_not_current(tmp_path):
+    image = _image(tmp_path, '01')
+    GenerationJournal(tmp_path / 'journal.jsonl').record('01', 'inputs', image)
+    journal = GenerationJournal(tmp_path / 'journal.jsonl')
+    assert not journal.is_current('01', 'other inputs', image)
+    assert not journal.is_current('02', 'inputs', image)
+    image.write_bytes(b'edited image')
+    assert not journal.is_current('01', 'inputs', image)
+    image.unlink()
+    assert not journal.is_current('01', 'inputs', image)
+
+
+def test_last_entry_of_a_shot_wins(tmp_path):
+    image = _image(tmp_path, '01')
+    journal = GenerationJournal(tmp_path / 'journal.jsonl')
+    journal.record('01', 'old inputs', image)
+    journal.record('01', 'new inputs', image)
+    assert GenerationJournal(tmp_path / 'journal.jsonl').shots['01']['inputs'] == 'new inputs'
+
+
+def test_torn_line_keeps_later_entries(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    GenerationJournal(path).record('01', 'inputs', _image(tmp_path, '01'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "generated", "shot": "0')
+
+    journal = GenerationJournal(path)
+    journal.record('02', 'inputs', _image(tmp_path, '02'))
+    journal.record('03', 'inputs', _image(tmp_path, '03'))
+    assert sorted(GenerationJournal(path).shots) == ['01', '02', '03']
@@ -0,0 +1,115 @@
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import pytest
+
+from lib.fake_imagen import FakeAPIError
+from lib.generation_scheduler import CircuitBreaker, RateLimitedGenerator, TokenBucket, backoff_delay, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status, message=""):
+        super().__init__(message)
+        self.status = status
+
+
+class ScriptedGenerator:
+    """Raises the scripted errors in order, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+
+    def generate_images(self, prompt, output_paths, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return list(output_paths)
+
+
+def test_retryable_by_status_code():
+    assert is_retryable(FakeAPIError(429, "RESOURCE_EXHAUSTED"))
+    assert is_retryable(FakeAPIError(503, "UNAVAILABLE"))
+    assert not is_retryable(FakeAPIError(400, "INVALID_ARGUMENT"))
+    # The code decides, whatever the message says
+    assert not is_retryable(FakeAPIError(400, "UNAVAILABLE"))
+
+
+def test_retryable_by_status_name():
+    assert is_retryable(StatusError("RESOURCE_EXHAUSTED"))
+    assert not is_retryable(StatusError("PERMISSION_DENIED"))
+    assert is_retryable(RuntimeError("Service UNAVAILABLE, try again"))
+
+
+def test_digits_in_messages_are_not_status_codes():
+    assert not is_retryable(RuntimeError("Image 4290 x 1503 is too large"))
+    assert not is_retryable(ValueError("request id 503-429"))
+
+
+def test_network_errors_are_retryable():
+    assert is_retryable(ConnectionError("reset by peer"))
+    assert is_retryable(TimeoutError())
+
+
+def test_backoff_delay_full_jitter():
+    rng = random.Random(1)
+    for attempt in range(1, 8):
+        delays = [backoff_delay(attempt, base=2.0, cap=10.0, rng=rng) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= min(10.0, 2.0 * 2 ** (attempt - 1))
+    # Spread over the whole window, not clustered at its end
+    assert min(delays) < 2.0 < 8.0 < max(delays)
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate_per_minute=600, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.08
+    assert bucket.waited > 0
+
+
+def test_circuit_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.1)
+    breaker.record(False)
+    assert breaker.trips == 0
+    breaker.record(False)
+    assert breaker.trips == 1
+    start = time.monotonic()
+    breaker.wait()
+    assert time.monotonic() - start >= 0.05
+
+
+def test_circuit_breaker_success_resets_streak():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.trips == 0
+
+
+def test_rate_limited_generator_ignores_request_errors_for_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    generator = RateLimitedGenerator(
+        ScriptedGenerator(FakeAPIError(503, "UNAVAILABLE"), FakeAPIError(400, "blocked"), FakeAPIError(503, "UNAVAILABLE")),
+        breaker=breaker
+    )
+    for _ in range(3):
+        with pytest.raises(FakeAPIError):
+            generator.generate_images("a cat", ["a.png"])
+    # The safety block between the two 503s neither counted nor reset the streak
+    assert breaker.failures == 2
+    assert breaker.trips == 1
+
+
+def test_rate_limited_generator_success_closes_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    generator = RateLimitedGenerator(ScriptedGenerator(FakeAPIError(429, "RESOURCE_EXHAUSTED")), breaker=breaker)
+    with pytest.raises(FakeAPIError):
+        generator.generate_images("a cat", ["a.png"])
+    assert generator.generate_images("a cat", ["a.png"]) == ["a.png"]
+    assert breaker.failures == 0
@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
 from lib.google_imagen import GoogleImageGenerator
+from lib.generation_cache import CachedImageGenerator, GenerationCache
 
 def main():
     parser = argparse.ArgumentParser(description="Test Google Image Generation")
@@ -14,6 +15,8 @@ def main():
     parser.add_argument("--output", default="output.png", help="Output file path")
     parser.add_argument("--style-refs", nargs="+", help="Paths to style reference images")
     parser.add_argument("--model", default="imagen-4.0-fast-generate-001", help="Model name (e.g. imagen-4.0-fast-generate-001)")
+    parser.add_argument("--cache-dir", help="Reuse images generated before with the same inputs from this directory")
+    parser.add_argument("--no-cache", action="store_true", help="With --cache-dir: always call the API and refresh the cached image")
     
     args = parser.parse_args()
     
@@ -27,6 +30,10 @@ def main():
 
     try:
         generator = GoogleImageGenerator(api_key=api_key)
+        cache = None
+        if args.cache_dir:
+            cache = GenerationCache(args.cache_dir, bypass=args.no_cache)
+            generator = CachedImageGenerator(generator, cache)
         
         print(f"Generating image for prompt: '{args.prompt}'")
         if args.style_refs:
@@ -40,6 +47,8 @@ def main():
         )
         
         print(f"Successfully generated image at: {output_path}")
+        if cache:
+            print(f"Generation cache: {cache.report()}")
         
     except Exception as e:
         print(f"Failed to generate image: {e}")
@@ -0,0 +1,88 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import pytest
+from google.genai import errors
+
+from lib.google_imagen import GEMINI_MAX_CANDIDATES, GoogleImageGenerator
+
+MODEL = "gemini-2.5-flash-image"
+
+
+def _rejection():
+    return errors.ClientError(400, {"error": {"code": 400, "message": "Multiple candidates is not enabled", "status": "INVALID_ARGUMENT"}})
+
+
+def _response(count):
+    image = SimpleNamespace(inline_data=SimpleNamespace(mime_type="image/png", data=b"png"))
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[image]))
+    return SimpleNamespace(candidates=[candidate] * count, prompt_feedback=None)
+
+
+class FakeModels:
+    """Answers generate_content like a Gemini image model, optionally without multi-candidate support."""
+
+    def __init__(self, multi_candidate=True, error=None):
+        self.multi_candidate = multi_candidate
+        self.error = error
+        self.requested = []
+
+    def generate_content(self, model, contents, config):
+        count = config.candidate_count or 1
+        self.requested.append(count)
+        if self.error:
+            raise self.error
+        if count > 1 and not self.multi_candidate:
+            raise _rejection()
+        return _response(count)
+
+
+def _generator(models):
+    generator = GoogleImageGenerator(api_key="test")
+    generator.client = SimpleNamespace(models=models)
+    return generator
+
+
+def _paths(tmp_path, count):
+    return [str(tmp_path / f"shot_01_v{k}.png") for k in range(1, count + 1)]
+
+
+def test_candidates_are_asked_for_in_one_request(tmp_path):
+    models = FakeModels()
+    saved = _generator(models).generate_images("a cat", _paths(tmp_path, 3), model_name=MODEL)
+    assert saved == _paths(tmp_path, 3)
+    assert models.requested == [3]
+
+
+def test_candidates_are_capped_per_request(tmp_path):
+    models = FakeModels()
+    _generator(models).generate_images("a cat", _paths(tmp_path, GEMINI_MAX_CANDIDATES + 1), model_name=MODEL)
+    assert models.requested == [GEMINI_MAX_CANDIDATES, 1]
+
+
+def test_rejected_candidate_count_falls_back_to_single_requests(tmp_path):
+    models = FakeModels(multi_candidate=False)
+    generator = _generator(models)
+    saved = generator.generate_images("a cat", _paths(tmp_path, 3), model_name=MODEL)
+    assert saved == _paths(tmp_path, 3)
+    assert all(os.path.exists(path) for path in saved)
+    assert models.requested == [3, 1, 1, 1]
+    # The model is remembered, so the next shot doesn't ask for several again
+    generator.generate_images("a dog", _paths(tmp_path, 2), model_name=MODEL)
+    assert models.requested[4:] == [1, 1]
+
+
+def test_other_request_errors_are_raised(tmp_path):
+    models = FakeModels(error=_rejection())
+    with pytest.raises(errors.ClientError):
+        _generator(models).generate_images("a cat", _paths(tmp_path, 1), model_name=MODEL)
+    assert models.requested == [1]
+
+    blocked = errors.ClientError(403, {"error": {"code": 403, "message": "denied", "status": "PERMISSION_DENIED"}})
+    models = FakeModels(error=blocked)
+    with pytest.raises(errors.ClientError):
+        _generator(models).generate_images("a cat", _paths(tmp_path, 2), model_name=MODEL)
+    assert models.requested == [2]
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+import numpy as np
+import pytest
+
+from assemble_video import KEN_BURNS_ZOOM_MAX, KEN_BURNS_ZOOM_MIN, generate_ken_burns_filter
+from lib.filter_graph import Filter, _eval_expr
+from lib.ken_burns_numpy import iter_frames, motion_curve, render_frame
+
+EFFECTS = ['zoom_in', 'zoom_out', 'pan_left', 'pan_right', 'pan_up', 'zoom_pan_combo']
+
+
+@pytest.mark.parametrize('effect', EFFECTS)
+def test_motion_curve_matches_zoompan(effect):
+    fps, duration = 24, 5.0
+    frames = int(duration * fps)
+    zoompan = Filter.parse(generate_ken_burns_filter(effect, duration, fps, 1920, 1080))
+    zooms, xs, ys = motion_curve(effect, frames, KEN_BURNS_ZOOM_MIN, KEN_BURNS_ZOOM_MAX)
+    for on in (0, frames // 2, frames - 1):
+        zoom = _eval_expr(zoompan.get('z'), {'on': on, 'in': on})
+        variables = {'on': on, 'iw': 1000.0, 'ih': 1000.0, 'zoom': zoom}
+        assert zooms[on] == pytest.approx(zoom)
+        assert xs[on] == pytest.approx(_eval_expr(zoompan.get('x'), variables) / 1000.0)
+        assert ys[on] == pytest.approx(_eval_expr(zoompan.get('y'), variables) / 1000.0)
+
+
+@pytest.mark.parametrize('effect', EFFECTS + ['unknown'])
+def test_viewport_stays_inside_the_image(effect):
+    zooms, xs, ys = motion_curve(effect, 100)
+    assert len(zooms) == len(xs) == len(ys) == 100
+    assert np.all(zooms >= 1.0)
+    assert np.all(xs >= -1e-12) and np.all(xs <= 1 - 1 / zooms + 1e-12)
+    assert np.all(ys >= -1e-12) and np.all(ys <= 1 - 1 / zooms + 1e-12)
+
+
+def test_full_viewport_is_the_image():
+    image = np.random.default_rng(1).integers(0, 256, size=(36, 64, 3)).astype(np.float32)
+    frame = render_frame(image, 1.0, 0.0, 0.0, 64, 36)
+    assert frame.dtype == np.uint8
+    assert np.array_equal(frame, image.astype(np.uint8))
+
+
+def test_zoomed_viewport_samples_its_window():
+    image = np.zeros((100, 100, 3), dtype=np.float32)
+    image[:, 50:] = 255
+    # The right half of the image, scaled to the output
+    frame = render_frame(image, 2.0, 0.5, 0.0, 20, 20)
+    assert frame.min() == 255
+
+
+def test_iter_frames():
+    image = np.full((90, 160, 3), 128, dtype=np.float32)
+    frames = list(iter_frames(image, 'zoom_in', 5, 32, 18))
+    assert len(frames) == 5
+    assert all(f.shape == (18, 32, 3) and f.dtype == np.uint8 for f in frames)
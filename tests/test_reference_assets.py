@@ -0,0 +1,110 @@
+import io
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from PIL import Image
+
+from lib.reference_assets import ReferenceAssetCache, encode_reference
+
+
+def _image(path, size=(400, 200), mode='RGB', format=None):
+    Image.new(mode, size, (10, 20, 30, 40)[:len(mode)]).save(path, format=format)
+    return path
+
+
+def _size(data):
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
+
+
+def test_supported_image_that_fits_is_sent_as_stored(tmp_path):
+    path = _image(tmp_path / 'style.png')
+    assert encode_reference(path) == (path.read_bytes(), 'image/png')
+    assert encode_reference(path, max_side=400) == (path.read_bytes(), 'image/png')
+
+
+def test_large_image_is_downsized_to_max_side(tmp_path):
+    data, mime_type = encode_reference(_image(tmp_path / 'style.jpg'), max_side=100)
+    assert mime_type == 'image/jpeg'
+    assert _size(data) == (100, 50)
+    data, _ = encode_reference(_image(tmp_path / 'tall.jpg', size=(200, 400)), max_side=100)
+    assert _size(data) == (50, 100)
+
+
+def test_transparent_image_stays_png(tmp_path):
+    data, mime_type = encode_reference(_image(tmp_path / 'logo.png', mode='RGBA'), max_side=100)
+    assert mime_type == 'image/png'
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (100, 50) and img.mode == 'RGBA'
+
+
+def test_unsupported_format_is_reencoded(tmp_path):
+    data, mime_type = encode_reference(_image(tmp_path / 'style.bmp'))
+    assert mime_type == 'image/jpeg'
+    assert _size(data) == (400, 200)
+
+
+def _cache(max_bytes=10 ** 9):
+    parts = []
+
+    def make_part(data, mime_type):
+        parts.append(mime_type)
+        return (len(data), mime_type)
+    cache = ReferenceAssetCache(make_part, max_bytes)
+    return cache, parts
+
+
+def test_references_are_encoded_once(tmp_path):
+    cache, parts = _cache()
+    path = _image(tmp_path / 'style.png')
+    first = cache.get(path)
+    assert cache.get(path) is first
+    assert cache.get(str(path)) is first
+    assert parts == ['image/png']
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache.size == path.stat().st_size
+
+
+def test_each_max_side_is_an_entry(tmp_path):
+    cache, parts = _cache()
+    path = _image(tmp_path / 'style.png')
+    cache.get(path)
+    cache.get(path, max_side=100)
+    cache.get(path, max_side=100)
+    assert len(parts) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_edited_reference_is_reloaded(tmp_path):
+    cache, parts = _cache()
+    path = _image(tmp_path / 'style.png')
+    cache.get(path)
+    _image(path, size=(300, 300))
+    cache.get(path)
+    assert len(parts) == 2 and cache.misses == 2
+
+
+def test_least_recently_used_references_are_evicted(tmp_path):
+    paths = [_image(tmp_path / f"style_{k}.png", size=(100 + k, 100)) for k in range(3)]
+    sizes = [path.stat().st_size for path in paths]
+    cache, parts = _cache(max_bytes=sizes[0] + sizes[1] + sizes[2] - 1)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # style_1 is now the least recently used
+    cache.get(paths[2])
+    assert [key[0] for key in cache.entries] == [str(paths[0].resolve()), str(paths[2].resolve())]
+    assert cache.size == sizes[0] + sizes[2]
+    cache.get(paths[1])
+    assert len(parts) == 4
+
+
+def test_oversized_reference_is_still_kept(tmp_path):
+    cache, _ = _cache(max_bytes=1)
+    path = _image(tmp_path / 'style.png')
+    cache.get(path)
+    assert len(cache.entries) == 1
+    cache.get(path)
+    assert cache.hits == 1
+    assert '1/2 reused, 1 cached' in cache.report()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.render_cache import RenderCache, commit, hash_bytes, hash_file, hash_params, partial_path
+
+
+def test_hash_params_is_stable_and_order_independent_for_dicts():
+    assert hash_params({'a': 1, 'b': 2}) == hash_params({'b': 2, 'a': 1})
+    assert hash_params('x', 1) != hash_params('x', 2)
+    assert hash_params([1, 2]) != hash_params([2, 1])
+
+
+def test_hash_file_follows_content(tmp_path):
+    path = tmp_path / 'image.png'
+    path.write_bytes(b'first')
+    assert hash_file(path) == hash_bytes(b'first')
+    path.write_bytes(b'second version')
+    assert hash_file(path) == hash_bytes(b'second version')
+
+
+def test_lookup_counts_hits_and_misses(tmp_path):
+    cache = RenderCache(tmp_path)
+    body = cache.path(cache.key('shot', 1), '_body.mp4')
+    tail = cache.path(cache.key('shot', 1), '_tail.mkv')
+    assert body.parent == tmp_path and body.name.endswith('_body.mp4')
+    body.write_bytes(b'body')
+    assert not cache.lookup(body, tail)
+    tail.write_bytes(b'tail')
+    assert cache.lookup(body, tail)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.report() == '1/2 cached, 1 to render'
+
+
+def test_partial_files_are_committed_atomically(tmp_path):
+    final = tmp_path / 'segment.mp4'
+    partial = partial_path(final)
+    assert partial.name == 'segment.partial.mp4'
+    partial.write_bytes(b'rendered')
+    commit(partial, final)
+    assert final.read_bytes() == b'rendered'
+    assert not partial.exists()
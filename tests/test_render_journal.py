@@ -0,0 +1,117 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.render_journal import RenderJournal, assign_keys, job_inputs, resumable
+
+HEADER = {'plan': 'abc', 'mode': 'segments'}
+
+
+def _job(tmp_path, name, inputs=(), content=b'out'):
+    final = tmp_path / f"{name}.mp4"
+    final.write_bytes(content)
+    cmd = ['ffmpeg']
+    for path in inputs:
+        cmd += ['-i', str(path)]
+    return {'name': name, 'cmd': cmd + [str(final)], 'commit': [(final, final)]}
+
+
+def _finish(journal, *jobs):
+    assign_keys([list(jobs)])
+    for job in jobs:
+        journal.record(job)
+
+
+def test_resume_skips_finished_jobs(tmp_path):
+    image = tmp_path / 'shot_01.png'
+    image.write_bytes(b'image')
+    job = _job(tmp_path, 'shot_01', [image])
+    journal = RenderJournal(tmp_path / 'journal.jsonl')
+    assert not journal.start(HEADER)
+    _finish(journal, job)
+
+    resumed = RenderJournal(tmp_path / 'journal.jsonl')
+    assert resumed.start(HEADER, resume=True)
+    assign_keys([[job]])
+    assert resumed.is_done(job)
+    assert resumed.resumed == 1
+
+
+def test_other_render_starts_fresh(tmp_path):
+    job = _job(tmp_path, 'shot_01')
+    journal = RenderJournal(tmp_path / 'journal.jsonl')
+    journal.start(HEADER)
+    _finish(journal, job)
+
+    other = RenderJournal(tmp_path / 'journal.jsonl')
+    assert not other.start(dict(HEADER, mode='windowed'), resume=True)
+    assert other.done == {}
+    assert not RenderJournal(tmp_path / 'journal.jsonl').start(HEADER)
+
+
+def test_changed_output_is_not_done(tmp_path):
+    job = _job(tmp_path, 'shot_01')
+    journal = RenderJournal(tmp_path / 'journal.jsonl')
+    journal.start(HEADER)
+    _finish(journal, job)
+    (tmp_path / 'shot_01.mp4').write_bytes(b'truncated')
+
+    resumed = RenderJournal(tmp_path / 'journal.jsonl')
+    resumed.start(HEADER, resume=True)
+    assign_keys([[job]])
+    assert not resumed.is_done(job)
+
+
+def test_changed_input_reruns_only_its_jobs(tmp_path):
+    first, second = tmp_path / 'shot_01.png', tmp_path / 'shot_02.png'
+    first.write_bytes(b'one')
+    second.write_bytes(b'two')
+    shot_1 = _job(tmp_path, 'shot_01', [first])
+    shot_2 = _job(tmp_path, 'shot_02', [second])
+    transition = _job(tmp_path, 'transition_01_02', [tmp_path / 'shot_01.mp4', tmp_path / 'shot_02.mp4'])
+    stages = [[shot_1, shot_2], [transition]]
+    journal = RenderJournal(tmp_path / 'journal.jsonl')
+    journal.start(HEADER)
+    assign_keys(stages)
+    for job in shot_1, shot_2, transition:
+        journal.record(job)
+
+    second.write_bytes(b'retouched')
+    resumed = RenderJournal(tmp_path / 'journal.jsonl')
+    resumed.start(HEADER, resume=True)
+    assign_keys(stages)
+    assert resumed.is_done(shot_1)
+    assert not resumed.is_done(shot_2)
+    assert not resumed.is_done(transition)
+
+
+def test_jobs_reading_unjournaled_outputs_have_no_key(tmp_path):
+    concat = {'name': 'concat', 'cmd': ['ffmpeg', '-i', 'list.txt', str(tmp_path / 'video.mp4')]}
+    mux = _job(tmp_path, 'mux', [tmp_path / 'video.mp4'])
+    assign_keys([[concat], [mux]])
+    assert mux['key'] is None
+    assert not resumable(concat, RenderJournal(tmp_path / 'journal.jsonl'))
+
+
+def test_job_inputs_include_feed_sources(tmp_path):
+    job = {'cmd': ['ffmpeg', '-f', 'rawvideo', '-i', 'pipe:0', 'out.mp4'], 'sources': [tmp_path / 'shot_01.png']}
+    assert job_inputs(job) == ['pipe:0', str(tmp_path / 'shot_01.png')]
+
+
+def test_torn_line_keeps_later_entries(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    jobs = [_job(tmp_path, f"shot_0{i}") for i in (1, 2, 3)]
+    journal = RenderJournal(path)
+    journal.start(HEADER)
+    _finish(journal, jobs[0])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "done", "job": "shot_0')
+
+    resumed = RenderJournal(path)
+    assert resumed.start(HEADER, resume=True)
+    _finish(resumed, jobs[1], jobs[2])
+
+    reloaded = RenderJournal(path)
+    assert reloaded.start(HEADER, resume=True)
+    assert sorted(reloaded.done) == ['shot_01', 'shot_02', 'shot_03']
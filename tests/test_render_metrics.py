@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from lib.render_metrics import RenderMonitor, job_timeline, read_progress, with_progress
+
+PROGRESS = b"""frame=12
+fps=24.0
+out_time_us=500000
+speed=1.0x
+progress=continue
+frame=48
+fps=24.0
+out_time_us=2000000
+speed=1.5x
+
+progress=end
+"""
+
+
+def test_with_progress_puts_global_options_first():
+    cmd = with_progress(['ffmpeg', '-y', '-i', 'in.png', 'out.mp4'])
+    assert cmd == ['ffmpeg', '-progress', 'pipe:1', '-nostats', '-y', '-i', 'in.png', 'out.mp4']
+
+
+def test_with_progress_keeps_a_single_nostats():
+    cmd = with_progress(['ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-i', 'in.png', 'out.mp4'])
+    assert cmd.count('-nostats') == 1
+    assert cmd[:3] == ['ffmpeg', '-progress', 'pipe:1']
+
+
+def test_read_progress_yields_one_block_per_report():
+    blocks = []
+    read_progress(io.BytesIO(PROGRESS), blocks.append)
+    assert blocks == [
+        {'frame': '12', 'fps': '24.0', 'out_time_us': '500000', 'speed': '1.0x', 'progress': 'continue'},
+        {'frame': '48', 'fps': '24.0', 'out_time_us': '2000000', 'speed': '1.5x', 'progress': 'end'},
+    ]
+
+
+def test_read_progress_ignores_an_unfinished_block():
+    blocks = []
+    read_progress(io.BytesIO(b"frame=1\nprogress=continue\nframe=2\n"), blocks.append)
+    assert [b['frame'] for b in blocks] == ['1']
+
+
+def _monitor():
+    return RenderMonitor(fps=24, stream=io.StringIO())
+
+
+def test_progress_is_capped_at_the_expected_frames():
+    monitor = _monitor()
+    job = {'name': 'shot_01', 'frames': 100, 'shots': [(0, '01')]}
+    concat = {'name': 'concat'}
+    monitor.expect([job, concat])
+    assert monitor.total_frames == 100
+    monitor.job_started(job)
+    monitor.job_progress(job, {'frame': '40'})
+    assert monitor._frames['shot_01'] == 40
+    monitor.job_progress(job, {'frame': '120'})
+    assert monitor._frames['shot_01'] == 100
+    # Jobs without frames (stream copies) and garbled blocks don't count
+    monitor.job_started(concat)
+    monitor.job_progress(concat, {'frame': '500'})
+    monitor.job_progress(job, {'frame': 'N/A'})
+    assert sum(monitor._frames.values()) == 100
+    # In a log, the status line is printed at most every few seconds
+    assert monitor.stream.getvalue().count('\n') == 1
+    assert 'frame 40/100' in monitor.stream.getvalue()
+
+
+def test_current_shot_follows_the_job_timeline():
+    monitor = _monitor()
+    job = {'name': 'window_01_03', 'frames': 300, 'shots': [(0, '01'), (120, '02'), (240, '03')]}
+    monitor.expect([job])
+    monitor.job_started(job)
+    monitor.job_progress(job, {'frame': '130'})
+    assert monitor._current_shots() == '02'
+    monitor.job_finished(job, 1.0, None)
+    assert monitor._current_shots() == '-'
+
+
+def test_metrics_per_stage_and_effect(tmp_path):
+    monitor = _monitor()
+    jobs = [
+        ({'name': 'shot_01', 'stage': 'shots', 'effect': 'zoom_in', 'frames': 120}, 2.0,
+         {'cpu_user': 3.0, 'cpu_system': 1.0, 'peak_rss_mb': 200.0}),
+        ({'name': 'shot_02', 'stage': 'shots', 'effect': 'pan_left', 'frames': 96}, 1.0,
+         {'cpu_user': 1.5, 'cpu_system': 0.5, 'peak_rss_mb': 300.0}),
+        ({'name': 'concat', 'stage': 'concat'}, 0.5, None),
+    ]
+    for job, wall, usage in jobs:
+        monitor.job_started(job)
+        monitor.job_finished(job, wall, usage, feed_cpu=0.5 if job['name'] == 'shot_02' else 0.0)
+    monitor.stage_finished('shots', 2.5)
+    monitor.stage_finished('concat', 0.5)
+
+    metrics = monitor.metrics()
+    shots, concat = metrics['stages']
+    assert shots == {
+        'stage': 'shots', 'wall': 2.5, 'jobs': 2, 'job_wall': 3.0,
+        'cpu': 6.5, 'peak_rss_mb': 300.0, 'frames': 216,
+    }
+    assert concat['jobs'] == 1 and concat['cpu'] == 0 and concat['frames'] == 0
+    assert sorted(metrics['effects']) == ['pan_left', 'zoom_in']
+    assert metrics['effects']['pan_left']['cpu'] == 2.5
+    assert metrics['total']['wall'] == 3.0
+    assert metrics['total']['jobs'] == 3
+
+    path = monitor.write(tmp_path / 'render' / 'metrics.json')
+    assert json.loads(path.read_text(encoding='utf-8'))['total'] == metrics['total']
+
+
+def test_job_timeline():
+    assert job_timeline([5.0, 4.5, 6.0], ['01', '02', '03'], 24) == [(0, '01'), (120, '02'), (228, '03')]
+    assert job_timeline([], [], 24) == []
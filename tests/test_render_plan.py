@@ -0,0 +1,63 @@
+import copy
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import pytest
+
+from lib.render_plan import RENDER_PLAN_VERSION, diff_plans, load_plan, save_plan, without_image_hashes
+
+PLAN = {
+    'version': RENDER_PLAN_VERSION,
+    'seed': 7,
+    'settings': {'fps': 24, 'width': 1920, 'height': 1080},
+    'shots': [
+        {'shot_id': '01', 'image': 'shot_01.png', 'image_sha256': 'aaa', 'duration': 5.0, 'effect': 'zoom_in'},
+        {'shot_id': '02', 'image': 'shot_02.png', 'image_sha256': 'bbb', 'duration': 6.0, 'effect': 'pan_left'},
+    ],
+    'transitions': [],
+}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / 'render' / 'render_plan.json'
+    save_plan(PLAN, path)
+    assert load_plan(path) == PLAN
+    # Stable, diff-friendly output
+    text = path.read_text(encoding='utf-8')
+    save_plan(copy.deepcopy(PLAN), path)
+    assert path.read_text(encoding='utf-8') == text
+
+
+def test_load_rejects_other_versions(tmp_path):
+    path = tmp_path / 'render_plan.json'
+    save_plan(dict(PLAN, version=RENDER_PLAN_VERSION + 1), path)
+    with pytest.raises(ValueError):
+        load_plan(path)
+
+
+def test_identical_plans_have_no_changes():
+    assert diff_plans(PLAN, copy.deepcopy(PLAN)) == []
+
+
+def test_diff_names_changed_fields_and_shots():
+    new = copy.deepcopy(PLAN)
+    new['seed'] = 8
+    new['shots'][0]['effect'] = 'zoom_out'
+    new['shots'][0]['image_sha256'] = 'ccc'
+    del new['shots'][1]
+    new['shots'].append({'shot_id': '03', 'image': 'shot_03.png', 'image_sha256': 'ddd', 'duration': 4.0, 'effect': 'pan_up'})
+    assert diff_plans(PLAN, new) == [
+        'seed: 7 -> 8',
+        'shot 01: effect, image_sha256 changed',
+        'shot 03: added',
+        'shot 02: removed',
+    ]
+
+
+def test_without_image_hashes():
+    stripped = without_image_hashes(PLAN)
+    assert all('image_sha256' not in shot for shot in stripped['shots'])
+    assert stripped['shots'][0]['effect'] == 'zoom_in'
+    assert PLAN['shots'][0]['image_sha256'] == 'aaa'
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+import pytest
+from PIL import Image
+
+import select_variants
+from lib.shot_variants import shot_path, variant_path
+
+
+def test_parse_picks_pads_shot_ids():
+    assert select_variants.parse_picks('1=2, 03=1,,12=4') == {'01': 2, '03': 1, '12': 4}
+
+
+def test_parse_picks_rejects_malformed_picks():
+    with pytest.raises(ValueError):
+        select_variants.parse_picks('01')
+    with pytest.raises(ValueError):
+        select_variants.parse_picks('01=v2')
+
+
+def _run(monkeypatch, tmp_path, *args):
+    monkeypatch.setattr(sys, 'argv', ['select_variants.py', str(tmp_path / 'scenario.json'), *args])
+    select_variants.main()
+
+
+@pytest.fixture
+def generations(tmp_path):
+    generations_dir = tmp_path / 'generations'
+    generations_dir.mkdir()
+    # v2 of shot 01 is missing
+    for k, color in ((1, (255, 0, 0)), (3, (0, 0, 255))):
+        Image.new('RGB', (32, 18), color).save(variant_path(generations_dir, '01', k))
+    return generations_dir
+
+
+def test_pick_promotes_the_numbered_variant(monkeypatch, tmp_path, generations, capsys):
+    _run(monkeypatch, tmp_path, '--pick', '1=3')
+    assert shot_path(generations, '01').read_bytes() == variant_path(generations, '01', 3).read_bytes()
+    out = capsys.readouterr().out
+    assert 'v1:' in out and 'v3:' in out and 'v2:' not in out
+    assert 'Promoted v3 -> shot_01.png' in out
+
+
+def test_pick_of_a_missing_variant_is_rejected(monkeypatch, tmp_path, generations, capsys):
+    with pytest.raises(SystemExit):
+        _run(monkeypatch, tmp_path, '--pick', '01=2')
+    assert 'Shot 01 has no variant 2' in capsys.readouterr().out
+    assert not shot_path(generations, '01').exists()
@@ -0,0 +1,74 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from PIL import Image, ImageDraw
+
+from lib.generation_journal import GenerationJournal
+from lib.shot_variants import contact_sheet, find_variants, promote, sharpness, shot_path, variant_number, variant_path
+
+
+def _flat(path, color=(120, 120, 120)):
+    Image.new("RGB", (320, 180), color).save(path)
+    return path
+
+
+def _checkered(path):
+    img = Image.new("RGB", (320, 180), (0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for x in range(0, 320, 20):
+        for y in range(0, 180, 20):
+            if (x + y) // 20 % 2:
+                draw.rectangle([x, y, x + 19, y + 19], fill=(255, 255, 255))
+    img.save(path)
+    return path
+
+
+def test_paths(tmp_path):
+    assert shot_path(tmp_path, '01') == tmp_path / 'shot_01.png'
+    assert variant_path(tmp_path, '01', 2) == tmp_path / 'shot_01_v2.png'
+    assert variant_number(variant_path(tmp_path, '01', 12)) == 12
+
+
+def test_find_variants_in_numeric_order(tmp_path):
+    for k in (10, 2, 1):
+        _flat(variant_path(tmp_path, '01', k))
+    _flat(variant_path(tmp_path, '02', 1))
+    _flat(shot_path(tmp_path, '01'))
+    found = find_variants(tmp_path)
+    assert list(found) == ['01', '02']
+    assert [p.name for p in found['01']] == ['shot_01_v1.png', 'shot_01_v2.png', 'shot_01_v10.png']
+
+
+def test_sharpness_prefers_detail(tmp_path):
+    assert sharpness(_checkered(tmp_path / 'sharp.png')) > sharpness(_flat(tmp_path / 'flat.png'))
+
+
+def test_contact_sheet(tmp_path):
+    variants = [_flat(variant_path(tmp_path, '01', k)) for k in (1, 2, 3)]
+    sheet = contact_sheet(variants, tmp_path / 'sheet.jpg')
+    with Image.open(sheet) as img:
+        assert img.width > 3 * 320
+
+
+def test_promote_copies_the_candidate(tmp_path):
+    candidate = _checkered(variant_path(tmp_path, '01', 2))
+    target = promote(candidate, shot_path(tmp_path, '01'))
+    assert target.read_bytes() == candidate.read_bytes()
+    assert not (tmp_path / 'shot_01.partial.png').exists()
+
+
+def test_promote_journals_the_shot_with_the_candidate_inputs(tmp_path):
+    journal = GenerationJournal(tmp_path / 'journal.jsonl')
+    candidate = _checkered(variant_path(tmp_path, '01', 2))
+    journal.record('01_v2', 'inputs of shot 01', candidate)
+    promote(candidate, shot_path(tmp_path, '01'), journal)
+    reloaded = GenerationJournal(tmp_path / 'journal.jsonl')
+    assert reloaded.is_current('01', 'inputs of shot 01', shot_path(tmp_path, '01'))
+
+
+def test_promote_without_journaled_candidate_records_nothing(tmp_path):
+    journal = GenerationJournal(tmp_path / 'journal.jsonl')
+    promote(_flat(variant_path(tmp_path, '01', 1)), shot_path(tmp_path, '01'), journal)
+    assert journal.shots == {}
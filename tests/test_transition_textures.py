@@ -0,0 +1,110 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import numpy as np
+import pytest
+
+from lib import transition_textures
+from lib.render_cache import RenderCache
+from lib.transition_textures import (
+    MASK_DOWNSCALE, TEXTURES, equalize, iris, mask_frames, texture, transition_mask, value_noise, write_mask_clip
+)
+
+
+def test_noise_is_deterministic_per_seed():
+    noise = value_noise(64, 36, seed=1)
+    assert noise.shape == (36, 64)
+    assert np.array_equal(value_noise(64, 36, seed=1), noise)
+    assert not np.array_equal(value_noise(64, 36, seed=2), noise)
+
+
+def test_iris_opens_from_the_center():
+    values = iris(64, 36)
+    assert np.array_equal(iris(64, 36, seed=5), values)
+    assert np.unravel_index(values.argmin(), values.shape) in {(17, 31), (17, 32), (18, 31), (18, 32)}
+    assert values[0, 0] == values.max()
+
+
+@pytest.mark.parametrize('name', sorted(TEXTURES))
+def test_textures_are_equalized_ranks(name):
+    values = texture(name, 64, 36, seed=3)
+    assert values.shape == (36, 64)
+    assert 0 <= values.min() and values.max() < 1
+    # Rank fractions: every share of the range holds as many pixels as any other
+    counts, _ = np.histogram(values, bins=8, range=(0, 1))
+    assert counts.max() - counts.min() <= counts.mean() * 0.35
+
+
+def test_equalize_gives_distinct_values_evenly_spaced_ranks():
+    values = np.array([[0.9, 0.1], [0.5, 0.3]])
+    assert np.array_equal(equalize(values), [[0.75, 0.0], [0.5, 0.25]])
+    # Equal values share a rank
+    assert np.array_equal(equalize(np.array([2.0, 1.0, 2.0, 3.0])), [0.25, 0.0, 0.25, 0.75])
+
+
+def test_unknown_texture_is_rejected():
+    with pytest.raises(ValueError):
+        texture('spiral', 8, 8)
+
+
+def test_mask_ramp_reaches_both_shots():
+    masks = list(mask_frames(texture('noise', 64, 36), 24))
+    assert len(masks) == 24
+    assert all(mask.dtype == np.uint8 and mask.shape == (36, 64) for mask in masks)
+    assert masks[0].max() == 0
+    assert masks[-1].min() == 255
+    # Pixels only ever get revealed further
+    assert all(np.all(b >= a) for a, b in zip(masks, masks[1:]))
+
+
+def test_every_pixel_reveals_over_an_equal_share_of_frames():
+    frames, softness = 48, 0.1
+    masks = np.stack(list(mask_frames(texture('noise', 64, 36), frames, softness)))
+    ramping = ((masks > 0) & (masks < 255)).sum(axis=0)
+    expected = softness / (1 + softness) * (frames - 1)
+    assert ramping.min() >= int(expected) - 1 and ramping.max() <= int(expected) + 1
+    # And once pixels start to complete, every frame completes the same share of the picture
+    revealed = (masks == 255).mean(axis=(1, 2))
+    steps = np.diff(revealed[(revealed > 0) & (revealed < 1)])
+    assert len(steps) > frames // 2
+    assert np.allclose(steps, (1 + softness) / (frames - 1), atol=0.001)
+
+
+def test_mask_clip_is_a_monochrome_y4m_stream(tmp_path):
+    path = write_mask_clip(texture('iris', 16, 8), 5, 24, tmp_path / 'iris_mask.y4m')
+    data = path.read_bytes()
+    header, _, body = data.partition(b'\n')
+    assert header == b'YUV4MPEG2 W16 H8 F24:1 Ip A1:1 Cmono'
+    frames = body.split(b'FRAME\n')
+    assert frames[0] == b''
+    assert [len(frame) for frame in frames[1:]] == [16 * 8] * 5
+
+
+def test_mask_clip_is_generated_once_per_cache(tmp_path, monkeypatch):
+    cache = RenderCache(tmp_path / 'cache')
+    path = transition_mask('noise', 640, 360, 24, 24, tmp_path, cache)
+    assert path.parent == tmp_path / 'cache'
+    assert path.read_bytes().startswith(f"YUV4MPEG2 W{640 // MASK_DOWNSCALE} H{360 // MASK_DOWNSCALE} ".encode())
+    mtime = path.stat().st_mtime_ns
+
+    def rewrite(*args, **kwargs):
+        raise AssertionError('cached mask clip was written again')
+    monkeypatch.setattr(transition_textures, 'write_mask_clip', rewrite)
+    assert transition_mask('noise', 640, 360, 24, 24, tmp_path, cache) == path
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert path.stat().st_mtime_ns == mtime
+    assert not list(tmp_path.glob('cache/*.partial*'))
+
+
+def test_mask_clip_parameters_change_the_entry(tmp_path):
+    cache = RenderCache(tmp_path / 'cache')
+    path = transition_mask('noise', 640, 360, 24, 24, tmp_path, cache)
+    assert transition_mask('iris', 640, 360, 24, 24, tmp_path, cache) != path
+    assert transition_mask('noise', 640, 360, 12, 24, tmp_path, cache) != path
+    assert transition_mask('noise', 640, 360, 24, 24, tmp_path, cache, seed=1) != path
+
+
+def test_mask_clip_without_cache_goes_to_the_work_dir(tmp_path):
+    assert transition_mask('wipe_left', 64, 36, 4, 24, tmp_path) == tmp_path / 'wipe_left_mask.y4m'